@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Shared WAV helpers for HearAlert inference tools
+================================================
+Decode PCM WAV files to mono float32 at the model sample rate and cut them
+into the 15600-sample windows the app classifies.
+"""
+
+import os
+import wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 15600
+
+_PCM_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def read_wav(path, target_sr=SAMPLE_RATE):
+    """Read a PCM WAV file as mono float32 in [-1, 1] at ``target_sr``."""
+    with wave.open(str(path), 'rb') as wf:
+        channels = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        sr = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+
+    if sampwidth not in _PCM_DTYPES:
+        raise ValueError(f"Unsupported sample width {sampwidth} in {path}")
+    samples = np.frombuffer(frames, dtype=_PCM_DTYPES[sampwidth]).astype(np.float32)
+    if sampwidth == 1:
+        samples = (samples - 128) / 128
+    else:
+        samples /= float(2 ** (8 * sampwidth - 1))
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return resample(samples, sr, target_sr)
+
+
+def resample(samples, sr, target_sr=SAMPLE_RATE):
+    """
+    Band-limited resampling with soxr at librosa's default quality, trimmed
+    or padded to librosa's length: the same samples ``librosa.load(path,
+    sr=target_sr)`` gives training (train_audio_model.load_clip).
+    """
+    if sr == target_sr or len(samples) == 0:
+        return samples.astype(np.float32)
+    import soxr
+
+    target_len = int(np.ceil(len(samples) * target_sr / sr))
+    resampled = soxr.resample(samples.astype(np.float32), sr, target_sr, quality="soxr_hq")
+    if len(resampled) < target_len:
+        resampled = np.pad(resampled, (0, target_len - len(resampled)))
+    return resampled[:target_len].astype(np.float32)
+
+
+class StreamResampler:
+    """
+    ``resample`` for audio arriving in chunks: one soxr stream, so the
+    anti-alias filter runs across chunk boundaries instead of restarting
+    at every chunk.
+    """
+
+    def __init__(self, sr, target_sr=SAMPLE_RATE):
+        self._stream = None
+        if sr != target_sr:
+            import soxr
+
+            self._stream = soxr.ResampleStream(sr, target_sr, 1, dtype="float32", quality="soxr_hq")
+
+    def __call__(self, samples, last=False):
+        samples = np.asarray(samples, dtype=np.float32)
+        if self._stream is None:
+            return samples
+        return self._stream.resample_chunk(samples, last=last)
+
+
+def frame_windows(samples, window=WINDOW_SAMPLES, hop=None):
+    """Cut ``samples`` into (n, window) overlapping windows, zero-padding short clips."""
+    hop = hop or window
+    if len(samples) < window:
+        samples = np.pad(samples, (0, window - len(samples)))
+    count = 1 + (len(samples) - window) // hop
+    strides = (samples.strides[0] * hop, samples.strides[0])
+    return np.lib.stride_tricks.as_strided(samples, (count, window), strides).copy()
+
+
+def iter_wav_files(root):
+    """Yield WAV files under ``root`` in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.lower().endswith('.wav'):
+                yield Path(dirpath) / filename
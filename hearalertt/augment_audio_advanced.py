@@ -4,6 +4,9 @@ Advanced Audio Augmentation Pipeline for HearAlert
 ===================================================
 Professional-grade audio augmentation for AI/ML training.
 Implements multiple augmentation techniques for robust model training.
+
+Reads ESC-50 and room impulse responses from datasets/ (HEARALERT_BASE_DIR)
+and writes augmented_audio/ (HEARALERT_SCRATCH_DIR); see paths.py.
 """
 
 import os
@@ -14,13 +17,30 @@ from pathlib import Path
 import random
 import shutil
 import csv
+import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-BASE_DIR = Path(__file__).parent
-DATASETS_DIR = BASE_DIR / "datasets"
-ESC50_DIR = DATASETS_DIR / "ESC-50"
-TRAINING_DATA_DIR = BASE_DIR / "training_data"
-AUGMENTED_DIR = BASE_DIR / "augmented_audio"
+from lineage import LineageLog
+from paths import PATHS
+
+try:
+    # scipy's pocketfft keeps float32 and is multithreaded; numpy's works too
+    from scipy import fft as _fft
+    _FFT_KWARGS = {"workers": -1}
+except ImportError:
+    _fft = np.fft
+    _FFT_KWARGS = {}
+
+DATASETS_DIR = PATHS["datasets"]
+ESC50_DIR = PATHS["esc50"]
+TRAINING_DATA_DIR = PATHS["training_data"]
+AUGMENTED_DIR = PATHS["augmented_audio"]
+NOISE_BANK_PATH = AUGMENTED_DIR / "noise_bank.npy"
+RIR_DIR = PATHS["rir"]  # Optional recorded room impulse responses (WAV)
+SKIP_COPY_ENV = "HEARALERT_SKIP_TRAINING_COPY"  # Set by pipeline.py
+
+# ESC-50 ambience classes mixed in as realistic background noise
+NOISE_BANK_CLASSES = ["rain", "wind", "engine", "vacuum_cleaner"]
 
 # ESC-50 classes used for training
 ESC50_CLASSES = {
@@ -40,8 +60,10 @@ ESC50_CLASSES = {
 class AudioAugmenter:
     """Advanced audio augmentation class with multiple techniques."""
     
-    def __init__(self, sample_rate=44100):
+    def __init__(self, sample_rate=44100, noise_bank=None, room_reverb=None):
         self.sample_rate = sample_rate
+        self.noise_bank = noise_bank
+        self.room_reverb = room_reverb
     
     def load_wav(self, filepath):
         """Load WAV file and return samples."""
@@ -96,6 +118,12 @@ class AudioAugmenter:
             return samples + bg_samples * noise_scale
         return samples
     
+    def add_bank_noise(self, samples, snr_db=10, noise_class=None):
+        """Mix with a random noise bank window at specified SNR."""
+        if self.noise_bank is None:
+            return samples
+        return self.noise_bank.mix(samples, snr_db, noise_class)
+    
     def time_stretch(self, samples, rate=1.0):
         """Simple time stretching using resampling."""
         if rate == 1.0:
@@ -134,6 +162,12 @@ class AudioAugmenter:
         output[delay_samples:] += samples * decay
         return output[:len(samples)]
     
+    def add_room_reverb(self, samples, wet=0.5):
+        """Convolve with a random room impulse response."""
+        if self.room_reverb is None:
+            return self.add_reverb(samples, wet)
+        return self.room_reverb.apply(samples, wet=wet)
+    
     def spectral_augment(self, samples, freq_mask_param=10):
         """Simple frequency masking using time-domain approximation."""
         # Apply random bandpass filtering effect
@@ -156,9 +190,11 @@ class AudioAugmenter:
             lambda x: self.pitch_shift(x, random.uniform(-2, 2)),
             lambda x: self.time_shift(x, random.uniform(0.1, 0.3)),
             lambda x: self.volume_change(x, random.uniform(-6, 6)),
-            lambda x: self.add_reverb(x, random.uniform(0.1, 0.4)),
+            lambda x: self.add_room_reverb(x, random.uniform(0.2, 0.6)),
             lambda x: self.spectral_augment(x),
         ]
+        if self.noise_bank is not None:
+            augmentations.append(lambda x: self.add_bank_noise(x, random.uniform(5, 20)))
         
         selected = random.sample(augmentations, min(num_augments, len(augmentations)))
         result = samples.copy()
@@ -167,6 +203,290 @@ class AudioAugmenter:
         return result
 
 
+def read_pcm16(wav_file, sample_rate):
+    """
+    (frames, channels) of a 16-bit WAV at ``sample_rate``; None if it has
+    another format or cannot be read (unreadable files are reported and
+    skipped, so one corrupt file does not abort a whole bank).
+    """
+    try:
+        with wave.open(str(wav_file), 'rb') as wf:
+            if wf.getframerate() != sample_rate or wf.getsampwidth() != 2:
+                return None
+            return wf.readframes(wf.getnframes()), wf.getnchannels()
+    except (wave.Error, EOFError, OSError) as e:
+        print(f"  Skipping unreadable {wav_file}: {e or type(e).__name__}")
+        return None
+
+
+class NoiseBank:
+    """
+    Background noise bank backed by one contiguous memory-mapped array.
+
+    ESC-50 ambience clips are decoded once into ``NOISE_BANK_PATH`` (float32,
+    int16 scale like ``AudioAugmenter.load_wav``) with a JSON sidecar holding
+    the sample rate and each class's span. Later runs map the file read-only,
+    so serving a window is a slice rather than a decode or ``np.tile``.
+    """
+    
+    def __init__(self, samples, spans, sample_rate=44100):
+        self.samples = samples
+        self.spans = spans
+        self.sample_rate = sample_rate
+    
+    @staticmethod
+    def meta_path(path):
+        return Path(path).with_suffix(".json")
+    
+    @classmethod
+    def build(cls, esc50_files, path=NOISE_BANK_PATH, classes=NOISE_BANK_CLASSES,
+              sample_rate=44100):
+        """Decode the ambience classes of ESC-50 into a new noise bank file."""
+        clips = {}
+        total = 0
+        for noise_class in classes:
+            clips[noise_class] = []
+            for wav_file in sorted(esc50_files.get(noise_class, [])):
+                pcm = read_pcm16(wav_file, sample_rate)
+                if pcm is None:
+                    continue
+                frames, _ = pcm
+                # ESC-50 pads short recordings with digital silence
+                samples = np.trim_zeros(np.frombuffer(frames, dtype=np.int16))
+                if len(samples) > 0:
+                    clips[noise_class].append(samples)
+                    total += len(samples)
+        
+        if total == 0:
+            return None
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        bank = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(total,))
+        spans = {}
+        pos = 0
+        for noise_class, class_clips in clips.items():
+            start = pos
+            for samples in class_clips:
+                bank[pos:pos + len(samples)] = samples
+                pos += len(samples)
+            if pos > start:
+                spans[noise_class] = [start, pos]
+        bank.flush()
+        del bank
+        
+        with open(cls.meta_path(path), 'w') as f:
+            json.dump({"sample_rate": sample_rate, "spans": spans}, f, indent=2)
+        
+        return cls.load(path)
+    
+    @classmethod
+    def load(cls, path=NOISE_BANK_PATH):
+        """Map an existing noise bank read-only."""
+        path = Path(path)
+        meta_path = cls.meta_path(path)
+        if not path.exists() or not meta_path.exists():
+            return None
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        samples = np.load(path, mmap_mode='r')
+        spans = {name: tuple(span) for name, span in meta["spans"].items()}
+        return cls(samples, spans, meta["sample_rate"])
+    
+    @classmethod
+    def load_or_build(cls, esc50_files, path=NOISE_BANK_PATH, classes=NOISE_BANK_CLASSES):
+        """Reuse the bank on disk if it covers ``classes``, otherwise rebuild it."""
+        bank = cls.load(path)
+        if bank is not None and all(c in bank.spans for c in classes if c in esc50_files):
+            return bank
+        return cls.build(esc50_files, path, classes)
+    
+    def _span(self, length, noise_class=None):
+        if noise_class is None:
+            noise_class = random.choice(list(self.spans))
+        start, end = self.spans[noise_class]
+        if end - start < length:
+            # Class shorter than the request: fall back to the whole bank
+            start, end = 0, len(self.samples)
+        return start, end
+    
+    def window(self, length, noise_class=None):
+        """Return a random ``length``-sample window (a view into the bank)."""
+        start, end = self._span(length, noise_class)
+        if end - start < length:
+            reps = int(np.ceil(length / (end - start)))
+            return np.tile(self.samples[start:end], reps)[:length]
+        offset = np.random.randint(start, end - length + 1)
+        return self.samples[offset:offset + length]
+    
+    def mix(self, samples, snr_db=10, noise_class=None):
+        """Mix a random background window into ``samples`` at ``snr_db``."""
+        noise = self.window(len(samples), noise_class)
+        signal_power = np.dot(samples, samples) / len(samples)
+        noise_power = np.dot(noise, noise) / len(noise)
+        if noise_power <= 0 or signal_power <= 0:
+            return samples
+        scale = np.sqrt(signal_power / (noise_power * 10 ** (snr_db / 10)))
+        return samples + noise * scale
+    
+    def mix_batch(self, batch, snr_db=10, noise_class=None):
+        """
+        Mix backgrounds into a (clips, samples) batch in one vectorised pass.
+
+        ``snr_db`` may be a scalar or one value per clip.
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        n, length = batch.shape
+        start, end = self._span(length, noise_class)
+        if end - start < length:
+            return np.stack([self.mix(clip, np.broadcast_to(snr_db, n)[i], noise_class)
+                             for i, clip in enumerate(batch)])
+        offsets = np.random.randint(start, end - length + 1, size=n)
+        noise = self.samples[offsets[:, None] + np.arange(length)]
+        signal_power = np.einsum('ij,ij->i', batch, batch) / length
+        noise_power = np.einsum('ij,ij->i', noise, noise) / length
+        snr_linear = 10 ** (np.broadcast_to(snr_db, n) / 10)
+        valid = (noise_power > 0) & (signal_power > 0)
+        scale = np.zeros(n, dtype=np.float32)
+        scale[valid] = np.sqrt(signal_power[valid] / (noise_power[valid] * snr_linear[valid]))
+        return batch + noise * scale[:, None]
+
+
+def synthetic_rir(sample_rate=44100, rt60=0.4, pre_delay_ms=5, early_reflections=6):
+    """
+    Generate a synthetic room impulse response.
+
+    Direct path, a few discrete early reflections, then exponentially
+    decaying noise reaching -60 dB after ``rt60`` seconds.
+    """
+    length = int(sample_rate * rt60)
+    rir = np.zeros(length, dtype=np.float32)
+    rir[0] = 1.0
+    
+    decay = np.exp(-6.9078 * np.arange(length) / length)  # ln(1000) -> -60 dB
+    pre_delay = int(sample_rate * pre_delay_ms / 1000)
+    
+    for _ in range(early_reflections):
+        pos = random.randint(pre_delay + 1, max(pre_delay + 2, length // 8))
+        rir[pos] += random.uniform(-0.6, 0.6) * decay[pos]
+    
+    tail = np.random.normal(0, 0.3, length - pre_delay) * decay[pre_delay:]
+    rir[pre_delay:] += tail.astype(np.float32)
+    return rir
+
+
+class ConvolutionReverb:
+    """
+    Room reverb by overlap-add FFT convolution with a set of RIRs.
+
+    RIR spectra are cached per (RIR, FFT size), so applying reverb costs two
+    real FFTs per block. ``apply_batch`` convolves a whole (clips, samples)
+    batch in one pass. A 5 s 44.1 kHz clip with a synthetic room takes about
+    11 ms on one core with scipy.fft (batching saves little at that length).
+    """
+    
+    def __init__(self, rirs, sample_rate=44100, block_size=16384):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.rirs = []
+        for rir in rirs:
+            rir = np.asarray(rir, dtype=np.float32)
+            norm = np.sqrt(np.dot(rir, rir))
+            if norm > 0:
+                # Unit energy keeps loudness roughly unchanged
+                self.rirs.append(rir / norm)
+        self._spectra = {}
+    
+    @classmethod
+    def synthetic(cls, count=8, sample_rate=44100, rt60_range=(0.2, 0.8)):
+        """Build a reverb with ``count`` random synthetic rooms."""
+        rirs = [synthetic_rir(sample_rate, random.uniform(*rt60_range), random.uniform(2, 15))
+                for _ in range(count)]
+        return cls(rirs, sample_rate)
+    
+    @classmethod
+    def from_directory(cls, rir_dir=RIR_DIR, sample_rate=44100):
+        """Load recorded RIR WAV files matching ``sample_rate``; None if there are no usable ones."""
+        rirs = []
+        rir_dir = Path(rir_dir)
+        if rir_dir.exists():
+            for wav_file in sorted(rir_dir.glob("*.wav")):
+                pcm = read_pcm16(wav_file, sample_rate)
+                if pcm is None:
+                    continue
+                frames, channels = pcm
+                rir = np.frombuffer(frames, dtype=np.int16).astype(np.float32)
+                if channels > 1:
+                    rir = rir.reshape(-1, channels).mean(axis=1)
+                rirs.append(np.trim_zeros(rir, 'f'))
+        reverb = cls(rirs, sample_rate)
+        # Silent (all-zero) files are dropped by the constructor
+        return reverb if reverb.rirs else None
+    
+    @classmethod
+    def load_or_synthesize(cls, rir_dir=RIR_DIR, sample_rate=44100):
+        """Prefer recorded RIRs, falling back to synthetic rooms."""
+        return cls.from_directory(rir_dir, sample_rate) or cls.synthetic(sample_rate=sample_rate)
+    
+    def _fft_size(self, signal_len, rir_len):
+        # A single FFT covers short clips; longer ones are split into blocks
+        full = signal_len + rir_len - 1
+        nfft = 1 << (min(full, self.block_size + rir_len - 1) - 1).bit_length()
+        return nfft
+    
+    def spectrum(self, index, nfft):
+        """Cached real FFT of RIR ``index`` at ``nfft`` points."""
+        key = (index, nfft)
+        if key not in self._spectra:
+            self._spectra[key] = _fft.rfft(self.rirs[index], nfft).astype(np.complex64)
+        return self._spectra[key]
+    
+    def apply_batch(self, batch, index=None, wet=0.5):
+        """
+        Reverberate a (clips, samples) batch, keeping each clip's length.
+
+        ``index`` selects the RIR: one int for the whole batch, one per clip,
+        or None for a random RIR per clip.
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        n, length = batch.shape
+        if index is None:
+            index = np.random.randint(0, len(self.rirs), size=n)
+        indices = np.broadcast_to(index, n)
+        rir_len = max(len(self.rirs[i]) for i in set(indices.tolist()))
+        
+        nfft = self._fft_size(length, rir_len)
+        block = nfft - rir_len + 1
+        n_blocks = -(-length // block)
+        
+        padded = np.zeros((n, n_blocks * block), dtype=np.float32)
+        padded[:, :length] = batch
+        spectra = _fft.rfft(padded.reshape(n, n_blocks, block), nfft, axis=-1, **_FFT_KWARGS)
+        
+        unique = np.unique(indices)
+        if len(unique) == 1:
+            spectra *= self.spectrum(int(unique[0]), nfft)
+        else:
+            spectra *= np.stack([self.spectrum(int(i), nfft) for i in indices])[:, None, :]
+        blocks = _fft.irfft(spectra, nfft, axis=-1, **_FFT_KWARGS)
+        
+        # Overlap-add: each block's tail spills into the following blocks
+        wet_out = np.zeros((n, n_blocks * block + nfft), dtype=np.float32)
+        for j in range(-(-nfft // block)):
+            seg = blocks[:, :, j * block:(j + 1) * block]
+            if seg.shape[-1] < block:
+                seg = np.pad(seg, ((0, 0), (0, 0), (0, block - seg.shape[-1])))
+            wet_out[:, j * block:j * block + n_blocks * block] += seg.reshape(n, -1)
+        
+        return (1 - wet) * batch + wet * wet_out[:, :length]
+    
+    def apply(self, samples, index=None, wet=0.5):
+        """Reverberate a single clip."""
+        if index is None:
+            index = random.randrange(len(self.rirs))
+        return self.apply_batch(np.asarray(samples)[None, :], index, wet)[0]
+
+
 def collect_esc50_files():
     """Collect all ESC-50 files with metadata."""
     esc50_audio_dir = ESC50_DIR / "audio"
@@ -229,6 +549,7 @@ def process_category(category, esc_classes, esc50_files, augmenter, augments_per
     """Process a single category with augmentations."""
     cat_dir = AUGMENTED_DIR / category
     cat_dir.mkdir(parents=True, exist_ok=True)
+    lineage = LineageLog(cat_dir)
     
     count = 0
     
@@ -244,6 +565,7 @@ def process_category(category, esc_classes, esc50_files, augmenter, augments_per
             # Save original
             dest = cat_dir / f"{category}_{count:04d}_orig.wav"
             augmenter.save_wav(samples, sr, dest)
+            lineage.record(dest, wav_file, "orig")
             count += 1
             
             # Generate augmented versions
@@ -252,8 +574,10 @@ def process_category(category, esc_classes, esc50_files, augmenter, augments_per
                 aug_samples = augmenter.normalize(aug_samples) * 32767
                 dest = cat_dir / f"{category}_{count:04d}_aug{i}.wav"
                 augmenter.save_wav(aug_samples, sr, dest)
+                lineage.record(dest, wav_file, f"aug{i}")
                 count += 1
     
+    lineage.save()
     return category, count
 
 
@@ -264,9 +588,6 @@ def main():
     
     AUGMENTED_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Initialize augmenter
-    augmenter = AudioAugmenter()
-    
     # Collect ESC-50 files
     print("\n[1/3] Collecting ESC-50 dataset...")
     esc50_files = collect_esc50_files()
@@ -274,6 +595,19 @@ def main():
     total_esc50 = sum(len(files) for files in esc50_files.values())
     print(f"  Found {total_esc50} ESC-50 files across {len(esc50_files)} classes")
     
+    # Load background noise bank once and share it across all categories
+    noise_bank = NoiseBank.load_or_build(esc50_files)
+    if noise_bank is not None:
+        print(f"  Noise bank: {len(noise_bank.samples) / noise_bank.sample_rate:.0f}s "
+              f"of {', '.join(noise_bank.spans)}")
+    
+    # Recorded RIRs from datasets/rir if present, synthetic rooms otherwise
+    room_reverb = ConvolutionReverb.load_or_synthesize()
+    print(f"  Room reverb: {len(room_reverb.rirs)} impulse responses")
+    
+    # Initialize augmenter
+    augmenter = AudioAugmenter(noise_bank=noise_bank, room_reverb=room_reverb)
+    
     # Process each category
     print("\n[2/3] Generating augmented audio...")
     
@@ -288,18 +622,22 @@ def main():
         total_files += count
         print(f"  {category}: {count} files")
     
-    # Copy to training_data
-    print("\n[3/3] Copying to training_data directory...")
-    for category in CATEGORY_MAPPING.keys():
-        src_dir = AUGMENTED_DIR / category
-        dest_dir = TRAINING_DATA_DIR / category
-        
-        if src_dir.exists():
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            for wav_file in src_dir.glob("*.wav"):
-                dest_file = dest_dir / wav_file.name
-                if not dest_file.exists():
-                    shutil.copy2(wav_file, dest_file)
+    # Copy to training_data (the pipeline runner skips this: train_audio_model
+    # collects augmented_audio itself)
+    if os.environ.get(SKIP_COPY_ENV):
+        print("\n[3/3] Skipping copy to training_data")
+    else:
+        print("\n[3/3] Copying to training_data directory...")
+        for category in CATEGORY_MAPPING.keys():
+            src_dir = AUGMENTED_DIR / category
+            dest_dir = TRAINING_DATA_DIR / category
+            
+            if src_dir.exists():
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                for wav_file in src_dir.glob("*.wav"):
+                    dest_file = dest_dir / wav_file.name
+                    if not dest_file.exists():
+                        shutil.copy2(wav_file, dest_file)
     
     print("\n" + "=" * 70)
     print("AUGMENTATION COMPLETE")
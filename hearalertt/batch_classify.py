@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Offline Batch Classification for HearAlert
+==========================================
+Runs the trained classifier over a directory of recordings (e.g. to audit
+false positives) and writes the top-k predictions of every window to
+Parquet.
+
+    * WAV decoding and resampling run in a process pool
+    * YAMNet runs once per file (TF-Hub), yielding one embedding per
+      0.96 s patch at YAMNet's 0.48 s hop; each patch is one window
+    * the classifier head scores thousands of windows per interpreter call;
+      the fused end-to-end waveform model cannot batch (YAMNet frames its
+      unbatched [15600] input inside the graph, and resizing it fails), so
+      it is invoked once per window - use the embedding head for throughput
+    * results are written as numbered part files, and a checkpoint lists
+      the files already done, so an interrupted run resumes where it stopped
+
+Usage:
+    python batch_classify.py /path/to/recordings --output predictions/
+    python batch_classify.py /path/to/recordings --output predictions/ --top-k 5 --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_io import read_wav, frame_windows, iter_wav_files, SAMPLE_RATE, WINDOW_SAMPLES
+from model_export import TFLiteRunner
+from streaming_classifier import YamnetEmbedder, load_labels, DEFAULT_MODEL
+from yamnet_store import load_yamnet, YAMNET_HANDLE
+
+# YAMNet's patch hop (0.48 s); windows are reported on this grid
+PATCH_HOP_SAMPLES = 7680
+
+CHECKPOINT_NAME = "_checkpoint.json"
+
+_csv_notice_shown = False
+
+
+def decode(path):
+    """Worker: decode one file to 16 kHz mono float32."""
+    try:
+        return str(path), read_wav(path), None
+    except Exception as e:
+        return str(path), None, str(e)
+
+
+class WindowScorer:
+    """Scores a decoded file window by window, batching the head across files."""
+
+    def __init__(self, model_path, yamnet=YAMNET_HANDLE, num_threads=None):
+        self.model = TFLiteRunner(model_path, num_threads=num_threads)
+        self.waveform_model = int(np.prod(self.model.input_shape)) == WINDOW_SAMPLES
+        self._hub = None
+        self._embedder = None
+        if not self.waveform_model:
+            if str(yamnet).endswith(".tflite"):
+                self._embedder = YamnetEmbedder(yamnet, num_threads)
+            else:
+                self._hub = load_yamnet(yamnet)
+
+    def embed(self, samples):
+        """Per-window features: YAMNet patch embeddings, or raw windows for the fused model."""
+        if self.waveform_model:
+            return frame_windows(samples, WINDOW_SAMPLES, PATCH_HOP_SAMPLES)
+        if self._hub is not None:
+            # One pass over the whole file; YAMNet frames patches itself
+            if len(samples) < WINDOW_SAMPLES:
+                samples = np.pad(samples, (0, WINDOW_SAMPLES - len(samples)))
+            _, embeddings, _ = self._hub(samples)
+            return embeddings.numpy()
+        return self._embedder.embed(frame_windows(samples, WINDOW_SAMPLES, PATCH_HOP_SAMPLES))
+
+    def score(self, features):
+        """Class scores for a stack of per-window features."""
+        if self.waveform_model:
+            # Fixed unbatched input: one invoke per window (see module docstring)
+            return np.concatenate([self.model.run(window) for window in features])
+        return self.model.run(features)
+
+
+def top_k(scores, k):
+    """Indices and values of the k best classes per row, best first."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-vals, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def load_checkpoint(output_dir):
+    path = Path(output_dir) / CHECKPOINT_NAME
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {"completed": [], "failed": {}, "parts": 0, "windows": 0, "audio_sec": 0.0}
+
+
+def save_checkpoint(output_dir, checkpoint):
+    path = Path(output_dir) / CHECKPOINT_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def write_part(output_dir, part, columns):
+    """Write one part file (Parquet, or CSV when pyarrow is unavailable)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        import csv
+
+        global _csv_notice_shown
+        if not _csv_notice_shown:
+            print("  pyarrow is not installed (pip install pyarrow); writing CSV parts instead")
+            _csv_notice_shown = True
+        path = Path(output_dir) / f"part-{part:05d}.csv"
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+        return path
+
+    path = Path(output_dir) / f"part-{part:05d}.parquet"
+    tmp_path = path.with_suffix(".tmp")
+    pq.write_table(pa.table(columns), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+def build_columns(pending, scores, labels, k, hop_sec):
+    """Flatten buffered (file, n_windows) entries and their scores into columns."""
+    files, windows = [], []
+    for rel_path, count in pending:
+        files.extend([rel_path] * count)
+        windows.extend(range(count))
+    windows = np.array(windows, dtype=np.int32)
+    idx, vals = top_k(scores, k)
+
+    columns = {
+        "file": files,
+        "window": windows,
+        "start_sec": np.round(windows * hop_sec, 3),
+        "end_sec": np.round(windows * hop_sec + WINDOW_SAMPLES / SAMPLE_RATE, 3),
+    }
+    for rank in range(idx.shape[1]):
+        columns[f"label_{rank + 1}"] = [labels[i] if labels and i < len(labels) else str(i)
+                                        for i in idx[:, rank]]
+        columns[f"score_{rank + 1}"] = vals[:, rank].astype(np.float32)
+    return columns
+
+
+def classify_directory(input_dir, output_dir, model_path=DEFAULT_MODEL, yamnet=YAMNET_HANDLE,
+                       labels_path=None, k=3, workers=None, batch_windows=8192, num_threads=None):
+    """Classify every WAV under ``input_dir``, resuming from any checkpoint in ``output_dir``."""
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    scorer = WindowScorer(model_path, yamnet, num_threads)
+    labels = load_labels(model_path, labels_path)
+    checkpoint = load_checkpoint(output_dir)
+    done = set(checkpoint["completed"]) | set(checkpoint["failed"])
+
+    files = [p for p in iter_wav_files(input_dir) if str(p.relative_to(input_dir)) not in done]
+    print(f"📂 {len(files)} files to classify ({len(done)} already done)")
+
+    hop_sec = PATCH_HOP_SAMPLES / SAMPLE_RATE
+    start = time.perf_counter()
+    audio_sec = 0.0
+    pending, features, buffered, pending_audio = [], [], 0, 0.0
+
+    def flush():
+        nonlocal pending, features, buffered, pending_audio
+        if not pending:
+            return
+        scores = scorer.score(np.concatenate(features))
+        path = write_part(output_dir, checkpoint["parts"], build_columns(pending, scores, labels, k, hop_sec))
+        checkpoint["parts"] += 1
+        checkpoint["windows"] += len(scores)
+        checkpoint["completed"].extend(rel_path for rel_path, _ in pending)
+        checkpoint["audio_sec"] = round(checkpoint["audio_sec"] + pending_audio, 3)
+        save_checkpoint(output_dir, checkpoint)
+        elapsed = time.perf_counter() - start
+        print(f"  ✓ {path.name}: {len(scores)} windows, "
+              f"{len(checkpoint['completed'])} files done, {audio_sec / max(elapsed, 1e-9):.0f}x real time")
+        pending, features, buffered, pending_audio = [], [], 0, 0.0
+
+    # Submit decodes in slices so finished audio does not pile up in memory.
+    # Spawned workers: forking after TensorFlow/TF-Hub are loaded is unsafe
+    slice_size = max(1, (workers or os.cpu_count() or 1) * 16)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        for slice_start in range(0, len(files), slice_size):
+            batch = files[slice_start:slice_start + slice_size]
+            for path, samples, error in pool.map(decode, batch, chunksize=4):
+                rel_path = str(Path(path).relative_to(input_dir))
+                if error is not None:
+                    checkpoint["failed"][rel_path] = error
+                    continue
+                audio_sec += len(samples) / SAMPLE_RATE
+                pending_audio += len(samples) / SAMPLE_RATE
+                file_features = scorer.embed(samples)
+                pending.append((rel_path, len(file_features)))
+                features.append(file_features)
+                buffered += len(file_features)
+                if buffered >= batch_windows:
+                    flush()
+        flush()
+
+    elapsed = time.perf_counter() - start
+    save_checkpoint(output_dir, checkpoint)
+    return {
+        "files": len(files),
+        "failed": len(checkpoint["failed"]),
+        "audio_sec": round(audio_sec, 3),
+        "wall_sec": round(elapsed, 3),
+        "realtime_factor": round(audio_sec / elapsed, 1) if elapsed else None,
+        "parts": checkpoint["parts"],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-classify a directory of recordings")
+    parser.add_argument("input_dir", type=Path, help="directory of WAV recordings (searched recursively)")
+    parser.add_argument("--output", type=Path, required=True, help="output directory for Parquet parts")
+    parser.add_argument("--model", type=Path, default=DEFAULT_MODEL,
+                        help="embedding head or end-to-end waveform TFLite model")
+    parser.add_argument("--labels", type=Path, help="labels file (default: next to the model)")
+    parser.add_argument("--yamnet", default=YAMNET_HANDLE, help="YAMNet SavedModel directory, TF-Hub handle or .tflite")
+    parser.add_argument("--top-k", type=int, default=3, help="predictions kept per window")
+    parser.add_argument("--workers", type=int, help="decode processes (default: CPU count)")
+    parser.add_argument("--batch-windows", type=int, default=8192,
+                        help="windows per head call and per output part")
+    parser.add_argument("--threads", type=int, help="interpreter threads")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summary = classify_directory(args.input_dir, args.output, args.model, args.yamnet, args.labels,
+                                 args.top_k, args.workers, args.batch_windows, args.threads)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
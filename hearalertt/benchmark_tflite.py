@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+TFLite Inference Benchmark for HearAlert
+========================================
+Measures how fast the exported TFLite models run with ``tf.lite.Interpreter``
+at different thread counts: p50/p95/p99 single-window latency, windows per
+second, peak RSS and model size, reported as JSON. Each configuration runs
+in a fresh (spawned) process, so its peak RSS is its own and not the
+largest seen so far in the run.
+
+Waveform-input models are fed 15600-sample windows cut from training_data/.
+Embedding-input models (hearalert_classifier.tflite) are fed cached YAMNet
+embeddings from feature_cache/ when available and as wide as the model's
+input, random features otherwise.
+
+Usage:
+    python benchmark_tflite.py --threads 1 2 4 --output benchmark.json
+    python benchmark_tflite.py --baseline benchmark.json --max-regression 0.15
+"""
+
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_io import read_wav, frame_windows, iter_wav_files, WINDOW_SAMPLES
+from embedding_cache import EmbeddingCache
+from model_export import quantize_input
+from paths import PATHS
+
+TRAINING_DATA_DIR = PATHS["training_data"]
+MODEL_DIR = PATHS["app_models"]
+FEATURE_CACHE_DIR = PATHS["feature_cache"]
+
+DEFAULT_MODELS = [
+    "hearalert_classifier.tflite",
+    "baby_cry_model.tflite",
+    "hearalert_end_to_end.tflite",
+]
+
+
+def load_windows(data_dir, count, window=WINDOW_SAMPLES, per_file=4):
+    """Collect up to ``count`` windows, a few per file for variety."""
+    windows = []
+    for wav_file in iter_wav_files(data_dir):
+        try:
+            samples = read_wav(wav_file)
+        except Exception:
+            continue
+        windows.extend(frame_windows(samples, window)[:per_file])
+        if len(windows) >= count:
+            break
+    return np.array(windows[:count], dtype=np.float32).reshape(-1, window)
+
+
+def load_embeddings(count, dims=1024):
+    """Cached ``dims``-wide YAMNet embeddings, or ReLU-like random features if none are cached."""
+    from train_audio_model import embedding_namespace, EMBEDDING_NAMESPACES
+
+    for embedding_mode in EMBEDDING_NAMESPACES:
+        rows = EmbeddingCache(FEATURE_CACHE_DIR, embedding_namespace(embedding_mode)).matrix()
+        if len(rows) and rows.shape[1] == dims:
+            return rows[np.arange(count) % len(rows)], "feature_cache"
+    rows = np.abs(np.random.default_rng(0).normal(0, 0.5, (count, dims))).astype(np.float32)
+    return rows, "random"
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (over its whole lifetime)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def benchmark_model(model_path, threads, windows, runs=200, warmup=10):
+    """Benchmark one model at one thread count."""
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_path=str(model_path), num_threads=threads)
+    interpreter.allocate_tensors()
+    input_detail = interpreter.get_input_details()[0]
+    shape = [int(d) for d in input_detail["shape"]]
+    size = int(np.prod(shape))
+
+    if size == WINDOW_SAMPLES:
+        inputs, input_source = windows, "training_data"
+    else:
+        inputs, input_source = load_embeddings(max(len(windows), 1), size)
+    if len(inputs) == 0:
+        inputs, input_source = np.zeros((1, size), dtype=np.float32), "silence"
+    inputs = [quantize_input(row.reshape(shape), input_detail) for row in inputs]
+
+    for i in range(warmup):
+        interpreter.set_tensor(input_detail["index"], inputs[i % len(inputs)])
+        interpreter.invoke()
+
+    timings = np.empty(runs)
+    start_all = time.perf_counter()
+    for i in range(runs):
+        start = time.perf_counter()
+        interpreter.set_tensor(input_detail["index"], inputs[i % len(inputs)])
+        interpreter.invoke()
+        timings[i] = (time.perf_counter() - start) * 1000
+    elapsed = time.perf_counter() - start_all
+
+    return {
+        "model": Path(model_path).name,
+        "threads": threads,
+        "input_shape": shape,
+        "input_source": input_source,
+        "runs": runs,
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+        "mean_ms": round(float(timings.mean()), 4),
+        "windows_per_sec": round(runs / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "model_size_kb": round(Path(model_path).stat().st_size / 1024, 1),
+    }
+
+
+def benchmark_isolated(model_path, threads, windows, runs=200):
+    """``benchmark_model`` in a fresh spawned process, so ``peak_rss_mb`` covers this configuration only."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(benchmark_model, model_path, threads, windows, runs).result()
+
+
+def check_regressions(results, baseline=None, max_regression=0.1, max_p95_ms=None):
+    """Return a list of human-readable threshold violations."""
+    failures = []
+    previous = {}
+    if baseline:
+        previous = {(r["model"], r["threads"]): r for r in baseline.get("results", [])}
+
+    for result in results:
+        key = (result["model"], result["threads"])
+        label = f"{result['model']} @ {result['threads']} threads"
+        if max_p95_ms is not None and result["p95_ms"] > max_p95_ms:
+            failures.append(f"{label}: p95 {result['p95_ms']:.3f} ms > {max_p95_ms:.3f} ms")
+        if key in previous:
+            limit = previous[key]["p95_ms"] * (1 + max_regression)
+            if result["p95_ms"] > limit:
+                failures.append(f"{label}: p95 {result['p95_ms']:.3f} ms regressed beyond "
+                                f"{limit:.3f} ms (baseline {previous[key]['p95_ms']:.3f} ms)")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HearAlert TFLite models")
+    parser.add_argument("--models", nargs="+", type=Path,
+                        help="model files (default: exported models in mobile_app/assets/models)")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4],
+                        help="interpreter thread counts to benchmark")
+    parser.add_argument("--data-dir", type=Path, default=TRAINING_DATA_DIR,
+                        help="directory of WAV files used to build input windows")
+    parser.add_argument("--windows", type=int, default=256, help="distinct input windows")
+    parser.add_argument("--runs", type=int, default=200, help="timed invocations per configuration")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="allowed fractional p95 increase over the baseline")
+    parser.add_argument("--max-p95-ms", type=float, help="absolute p95 latency limit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    models = args.models or [MODEL_DIR / name for name in DEFAULT_MODELS if (MODEL_DIR / name).exists()]
+    if not models:
+        print(f"No TFLite models found in {MODEL_DIR}", file=sys.stderr)
+        return 1
+
+    windows = load_windows(args.data_dir, args.windows)
+
+    results = []
+    for model_path in models:
+        for threads in args.threads:
+            result = benchmark_isolated(model_path, threads, windows, runs=args.runs)
+            results.append(result)
+            print(f"  {result['model']} @ {threads} threads: p50 {result['p50_ms']:.3f} ms, "
+                  f"p95 {result['p95_ms']:.3f} ms, {result['windows_per_sec']:.0f} windows/s",
+                  file=sys.stderr)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "input_windows": int(len(windows)),
+        "results": results,
+    }
+
+    baseline = None
+    if args.baseline and args.baseline.exists():
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    failures = check_regressions(results, baseline, args.max_regression, args.max_p95_ms)
+    report["failures"] = failures
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
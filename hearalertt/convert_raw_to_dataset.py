@@ -9,21 +9,29 @@ structured dataset format suitable for real-time audio classification.
 Categories:
 - Baby sounds: belly_pain, burping, cold_hot, discomfort, hungry, tired, silence
 - Animal sounds: Cow, Dog, Frog
+
+YAML goes through yaml_io (libyaml, atomic writes).
+
+Input raw/ is under the base root, processed_dataset/ under the scratch
+root and the YAML under the output root; set HEARALERT_BASE_DIR,
+HEARALERT_SCRATCH_DIR and HEARALERT_OUTPUT_DIR (or hearalert_paths.yaml,
+see paths.py) to move them.
 """
 
 import os
 import shutil
 import wave
 import json
-import yaml
-from pathlib import Path
 from datetime import datetime
 import hashlib
 
+from paths import PATHS
+from yaml_io import write_yaml
+
 # Configuration
-RAW_DIR = Path(__file__).parent / "raw"
-OUTPUT_DIR = Path(__file__).parent / "mobile_app" / "assets" / "datasets"
-PROCESSED_DIR = Path(__file__).parent / "processed_dataset"
+RAW_DIR = PATHS["raw"]
+OUTPUT_DIR = PATHS["app_datasets"]
+PROCESSED_DIR = PATHS["processed_dataset"]
 
 # Category mappings for real-time scenarios
 CATEGORIES = {
@@ -417,10 +425,7 @@ def main():
             
             # Generate individual category YAML
             yaml_content = generate_category_yaml(category_name, category_config, files_info)
-            yaml_path = OUTPUT_DIR / f"{category_name.lower()}_dataset.yaml"
-            
-            with open(yaml_path, 'w') as f:
-                yaml.dump(yaml_content, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+            yaml_path = write_yaml(OUTPUT_DIR / f"{category_name.lower()}_dataset.yaml", yaml_content)
             
             print(f"  ✓ Generated: {yaml_path.name}")
             print(f"  ✓ Files processed: {len(files_info)}")
@@ -430,10 +435,7 @@ def main():
     # Generate master dataset YAML
     if all_categories_info:
         master_yaml = generate_master_dataset_yaml(all_categories_info)
-        master_path = OUTPUT_DIR / "hearalert_dataset.yaml"
-        
-        with open(master_path, 'w') as f:
-            yaml.dump(master_yaml, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        master_path = write_yaml(OUTPUT_DIR / "hearalert_dataset.yaml", master_yaml)
         
         print(f"\n✓ Master dataset config: {master_path.name}")
     
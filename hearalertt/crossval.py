@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Grouped K-Fold Cross-Validation for HearAlert
+=============================================
+A single random 80/10/10 split gives a validation accuracy that moves from
+run to run. This scores the classifier head with stratified k-fold
+cross-validation over the pooled train + validation splits and reports the
+mean and variance of each metric; the test split stays held out.
+
+Folds are grouped by source recording (the manifest's ``group`` field, see
+data_splits.py), so augmented siblings of a recording never straddle train
+and validation. Embeddings are loaded once (from the embedding cache,
+embedding only misses) and shared with k spawned worker processes, one
+fold each.
+
+Usage:
+    python crossval.py
+    python crossval.py --folds 10 --workers 5 --hidden 256,128
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from sweep_heads import share_arrays, _init_worker, _SHARED, parse_floats, block_dropout
+from data_splits import source_group, stratified_group_kfold
+from paths import PATHS
+from dataset_manifest import load_manifest, default_manifest_path
+
+REPORTS_DIR = PATHS["reports"]
+REPORT_NAME = "crossval_report.json"
+
+METRICS = ("accuracy", "macro_recall", "best_epoch")
+
+
+def train_fold(config):
+    """Worker: train a head on every fold but one and score the held-out fold."""
+    from train_audio_model import fit_head
+    from evaluate_model import confusion_matrix, classification_report
+
+    X, y, folds = _SHARED["X"][1], _SHARED["y"][1], _SHARED["folds"][1]
+    held_out = folds == config["fold"]
+    X_train, y_train = X[~held_out], y[~held_out]
+    X_val, y_val = X[held_out], y[held_out]
+    num_classes = int(config["num_classes"])
+
+    model, history, train_sec = fit_head(config, X_train, y_train, X_val, y_val)
+
+    predictions = model.predict(X_val, batch_size=1024, verbose=0).argmax(axis=1)
+    report = classification_report(confusion_matrix(y_val, predictions, num_classes),
+                                   config["categories"])
+    return {
+        "fold": config["fold"],
+        "train_samples": int(len(y_train)),
+        "val_samples": int(len(y_val)),
+        "accuracy": round(report["accuracy"], 4),
+        "macro_recall": round(report["macro_recall"], 4),
+        "per_class_recall": {c: entry["recall"] for c, entry in report["per_class"].items()
+                             if entry["support"]},
+        "best_epoch": int(np.argmax(history.history['val_accuracy'])) + 1,
+        "train_sec": round(train_sec, 2),
+    }
+
+
+def summarize(fold_results):
+    """Mean, standard deviation and variance of each metric across folds."""
+    summary = {}
+    for metric in METRICS:
+        values = np.array([r[metric] for r in fold_results], dtype=np.float64)
+        summary[metric] = {
+            "mean": round(float(values.mean()), 4),
+            "std": round(float(values.std(ddof=1)) if len(values) > 1 else 0.0, 4),
+            "var": round(float(values.var(ddof=1)) if len(values) > 1 else 0.0, 6),
+            "min": round(float(values.min()), 4),
+            "max": round(float(values.max()), 4),
+        }
+    return summary
+
+
+def run_crossval(X, y, folds, config, workers=None):
+    """Train one head per fold in a process pool; returns the per-fold results by fold."""
+    k = int(folds.max()) + 1
+    workers = workers or max(1, min(k, (os.cpu_count() or 2) // 2))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    blocks, specs = share_arrays({
+        "X": np.asarray(X, dtype=np.float32), "y": np.asarray(y, dtype=np.int64),
+        "folds": np.asarray(folds, dtype=np.int64),
+    })
+    print(f"🔁 Training {k} folds on {workers} workers x {threads} threads")
+
+    results = []
+    try:
+        # TensorFlow is not fork-safe, so workers are spawned
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(specs, threads)) as pool:
+            futures = [pool.submit(train_fold, {**config, "fold": fold}) for fold in range(k)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"  fold {result['fold'] + 1}/{k}: accuracy {result['accuracy']:.2%}, "
+                      f"macro recall {result['macro_recall']:.2%} ({result['val_samples']} samples, "
+                      f"{result['train_sec']:.1f}s)")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return sorted(results, key=lambda r: r["fold"])
+
+
+def item_groups(items):
+    """Source-recording group of each manifest item (older manifests lack ``group``)."""
+    missing = sum(1 for item in items if "group" not in item)
+    if missing:
+        print(f"  ⚠️ {missing} items have no source group (manifest predates grouping); "
+              f"they are treated as independent recordings")
+    return [item.get("group") or source_group(item["file"]) for item in items]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grouped stratified k-fold cross-validation of the classifier head")
+    parser.add_argument("--manifest", type=Path, default=default_manifest_path(REPORTS_DIR))
+    parser.add_argument("--embedding-mode", choices=["mean", "frames"], default="mean")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--hidden", default="512,256,128", help="hidden layer sizes, comma separated")
+    parser.add_argument("--dropout", default="0.4,0.3,0.2",
+                        help="dropout per block (comma separated) or one rate for all blocks")
+    parser.add_argument("--lr", type=float, default=0.001)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--patience", type=int, default=10, help="early-stopping patience")
+    parser.add_argument("--seed", type=int, default=0, help="fold assignment and weight init seed")
+    parser.add_argument("--workers", type=int, help="parallel training processes (default: up to one per fold)")
+    parser.add_argument("--output", type=Path, default=REPORTS_DIR / REPORT_NAME)
+    args = parser.parse_args(argv)
+    try:
+        block_dropout(parse_floats(args.dropout), tuple(int(u) for u in args.hidden.split(",")))
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    from evaluate_model import load_split_embeddings
+
+    args = parse_args(argv)
+    manifest = load_manifest(args.manifest)
+
+    print("Loading embeddings (once)...")
+    X, y, groups = [], [], []
+    for split in ("train", "validation"):
+        X_split, y_split, categories, index = load_split_embeddings(
+            manifest, split, args.embedding_mode, return_index=True)
+        split_groups = item_groups(manifest["splits"][split])
+        X.append(X_split)
+        y.append(y_split)
+        groups.extend(split_groups[i] for i in index)
+    X, y = np.concatenate(X), np.concatenate(y)
+
+    folds = stratified_group_kfold(y, groups, args.folds, args.seed)
+    print(f"  {len(X)} samples, {len(set(groups))} source groups, {args.folds} folds "
+          f"of {np.bincount(folds).tolist()} samples")
+
+    hidden = tuple(int(u) for u in args.hidden.split(","))
+    config = {
+        "hidden_units": hidden,
+        "dropout": block_dropout(parse_floats(args.dropout), hidden),
+        "learning_rate": args.lr,
+        "batch_size": args.batch_size,
+        "epochs": args.epochs,
+        "patience": args.patience,
+        "seed": args.seed,
+        "num_classes": len(categories),
+        "categories": categories,
+    }
+
+    start = time.perf_counter()
+    results = run_crossval(X, y, folds, config, args.workers)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+
+    print(f"\n📊 {args.folds}-fold cross-validation ({elapsed:.1f}s)")
+    for metric in ("accuracy", "macro_recall"):
+        entry = summary[metric]
+        print(f"  {metric:<13} {entry['mean']:.2%} ± {entry['std']:.2%} "
+              f"(var {entry['var']:.6f}, range {entry['min']:.2%}-{entry['max']:.2%})")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({"folds": args.folds, "seed": args.seed, "samples": int(len(X)),
+                   "groups": len(set(groups)), "wall_sec": round(elapsed, 1),
+                   "config": {k: v for k, v in config.items() if k != "categories"},
+                   "summary": summary, "per_fold": results}, f, indent=2)
+    print(f"\n✓ Cross-validation report: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
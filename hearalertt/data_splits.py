@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Source-Recording Groups and Grouped Splits for HearAlert
+========================================================
+The augmentation scripts write several files per source recording
+(``_orig``/``_aug{i}``, ``_aug{i}_{type}``, ``_{variation}``), and ESC-50
+cuts several clips from one freesound recording. If siblings land on both
+sides of a split, validation measures memorisation of the recording rather
+than generalisation, so splits here keep every group on one side.
+
+``source_group`` derives a group key from a file name, ``assign_groups``
+combines it with content hashes and the augmentation lineage sidecars
+(lineage.py), ``stratified_group_kfold`` assigns groups to folds while
+keeping each fold's class mix close to the overall one and ``group_split``
+builds the 80/10/10 train/validation/test split from ten such folds
+(fewer when there are fewer groups).
+"""
+
+import re
+import random
+from pathlib import Path
+
+import numpy as np
+
+# ESC-50 clips: {fold}-{freesound clip id}-{take}-{target}.wav
+_ESC50_NAME = re.compile(r"^\d+-(\d+)-[A-Z]-\d+$")
+
+# augment_audio_advanced numbers originals and augmentations with one
+# counter: {category}_{n}_orig is followed by {category}_{n+1+i}_aug{i}
+_COUNTED_AUG_NAME = re.compile(r"^(.*)_(\d{4,})_aug(\d+)$")
+
+# Suffixes added by the augmentation scripts, stripped to reach the parent
+_DERIVED_SUFFIX = re.compile(
+    r"(_orig"                                   # augment_audio_advanced
+    r"|_aug\d+(_[a-z_]+)?"                      # augment_audio_advanced / expand_audio_dataset
+    r"|_(noise|loud_noise|volume_up|volume_down|time_shift|pitch_up|pitch_down"
+    r"|shift_left|shift_right|fade_in|fade_out|compress|speed|pitch|stretch))$"
+)
+
+
+def source_group(path):
+    """
+    Group key of the recording a file was derived from, scoped to its
+    source tree and category (``augmented_audio/dog/dog_0005``): the
+    scripts number files per output directory, so equal names in
+    different trees are unrelated recordings.
+
+    Name-based: files whose names do not encode a parent (e.g.
+    ``{category}_aug_{idx}_{type}`` from expand_dataset_advanced) form
+    their own group.
+    """
+    path = Path(path)
+    stem = path.stem
+    match = _ESC50_NAME.match(stem)
+    if match:
+        return f"esc50:{match.group(1)}"
+    match = _COUNTED_AUG_NAME.match(stem)
+    if match:
+        prefix, count, i = match.group(1), int(match.group(2)), int(match.group(3))
+        stem = f"{prefix}_{count - i - 1:04d}"
+    scope = [part for part in (path.parent.parent.name, path.parent.name) if part]
+    return "/".join(scope + [_DERIVED_SUFFIX.sub('', stem)])
+
+
+def stratified_group_kfold(labels, groups, k=5, seed=0):
+    """
+    Assign samples to ``k`` folds without splitting any group.
+
+    Groups are placed largest/most class-skewed first, each into the fold
+    that keeps the per-class fold proportions most even (ties go to the
+    smallest fold). Returns an int array of fold ids, one per sample.
+    """
+    labels = np.asarray(labels)
+    groups = np.asarray(groups)
+    classes, y = np.unique(labels, return_inverse=True)
+    group_names, g = np.unique(groups, return_inverse=True)
+    if len(group_names) < k:
+        raise ValueError(f"Need at least {k} groups for {k} folds, got {len(group_names)}")
+
+    # (groups, classes) sample counts
+    group_counts = np.zeros((len(group_names), len(classes)), dtype=np.int64)
+    np.add.at(group_counts, (g, y), 1)
+    class_totals = group_counts.sum(axis=0)
+
+    order = list(range(len(group_names)))
+    random.Random(seed).shuffle(order)
+    order.sort(key=lambda i: (-group_counts[i].sum(), -np.std(group_counts[i] / class_totals)))
+
+    fold_counts = np.zeros((k, len(classes)), dtype=np.int64)
+    group_fold = np.empty(len(group_names), dtype=np.int64)
+    for i in order:
+        best, best_key = 0, None
+        for fold in range(k):
+            fold_counts[fold] += group_counts[i]
+            spread = np.std(fold_counts / class_totals, axis=0).mean()
+            fold_counts[fold] -= group_counts[i]
+            key = (spread, fold_counts[fold].sum())
+            if best_key is None or key < best_key:
+                best, best_key = fold, key
+        fold_counts[best] += group_counts[i]
+        group_fold[i] = best
+
+    return group_fold[g]
+
+
+def assign_groups(paths, return_records=False):
+    """
+    Source-recording group of each path.
+
+    Files are linked when they have identical content, when one's lineage
+    sidecar names the other's content as its parent, or when their names
+    share a ``source_group``; each connected set of files is one group.
+
+    With ``return_records`` a second list holds, per path, the content hash
+    (``sha``) and, when its sidecar has one, the lineage ``parent`` hash and
+    ``transform``, so callers need not hash the files again.
+    """
+    from embedding_cache import file_key
+    from lineage import load_lineage
+
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        # Name nodes win as roots, so groups read like "augmented_audio/siren/siren_0005"
+        a, b = sorted((find(a), find(b)), key=lambda n: (not n.startswith("name:"), n))
+        parent[b] = a
+
+    sidecars = {}
+    nodes, records = [], []
+    for path in map(Path, paths):
+        node = f"file:{path}"
+        sha = file_key(path)
+        union(node, f"name:{source_group(path)}")
+        union(node, f"sha:{sha}")
+        if path.parent not in sidecars:
+            sidecars[path.parent] = load_lineage(path.parent)
+        entry = sidecars[path.parent].get(path.name)
+        record = {"sha": sha}
+        if entry:
+            union(node, f"sha:{entry['parent']}")
+            record.update(parent=entry["parent"], transform=entry["transform"])
+        nodes.append(node)
+        records.append(record)
+    groups = [find(node).split(":", 1)[1] for node in nodes]
+    if return_records:
+        return groups, records
+    return groups
+
+
+def group_split(labels, groups, seed=0):
+    """
+    Split names ("train"/"validation"/"test") per sample, whole groups at a time.
+
+    Ten folds (80/10/10) when there are at least ten groups; with fewer the
+    fold count drops to the number of groups, keeping one fold each for
+    validation and test, down to three groups. One or two groups all go to
+    train, and no samples give an empty array.
+    """
+    n_groups = len(np.unique(np.asarray(groups)))
+    if n_groups < 3:
+        return np.full(len(groups), "train", dtype="<U10")
+    k = min(10, n_groups)
+    folds = stratified_group_kfold(labels, groups, k, seed)
+    return np.where(folds < k - 2, "train", np.where(folds == k - 2, "validation", "test"))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Dataset Manifest Versioning for HearAlert
+=========================================
+Version 2 training manifests identify every file by content, not just by
+its relative path:
+
+    * each item carries its content hash (``sha``, the same md5 the
+      embedding cache keys on), the ``source`` file it was copied from and,
+      for derived files, the lineage ``parent`` hash and ``transform``
+    * ``metadata.merkle`` is a hash tree over the items - one hash per
+      (split, category), one per split and the dataset ``root`` (also
+      ``metadata.dataset_hash``) - so two manifests with the same root hold
+      exactly the same data and unchanged subtrees can be skipped
+
+``diff_manifests`` compares two manifests and lists which files need
+re-embedding (content the old manifest never had) and which need
+re-splitting (same content, different split, category or group), so
+caches and checkpoints can be invalidated file by file.
+
+Manifests are stored packed (``training_manifest.bin``, see
+packed_manifest.py) in the reports directory, outside the app assets;
+``load_manifest`` reads both packed and JSON ones.
+
+Usage:
+    python dataset_manifest.py old_manifest.bin new_manifest.bin
+    python dataset_manifest.py old.bin new.json --list --output manifest_diff.json
+    python dataset_manifest.py --stamp training_manifest.json    # upgrade a version 1 manifest
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+from paths import PATHS
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = "training_manifest.bin"  # Packed; JSON is an export format only
+JSON_MANIFEST_NAME = "training_manifest.json"
+SPLITS = ("train", "validation", "test")
+
+
+def _md5(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def leaf_hash(item, split):
+    """Hash of everything about one item that affects embeddings or splits."""
+    return _md5(json.dumps([split, item["file"], item["category"], item.get("sha"), item.get("group")]))
+
+
+def merkle_tree(manifest):
+    """{"root", "splits": {split: {"hash", "categories": {category: hash}}}} of a manifest."""
+    splits = {}
+    for split in SPLITS:
+        leaves = {}
+        for item in manifest["splits"].get(split, []):
+            leaves.setdefault(item["category"], []).append(leaf_hash(item, split))
+        categories = {category: _md5("".join(sorted(hashes))) for category, hashes in sorted(leaves.items())}
+        splits[split] = {
+            "hash": _md5("".join(f"{category}:{h}" for category, h in categories.items())),
+            "categories": categories,
+        }
+    return {"root": _md5("".join(f"{split}:{splits[split]['hash']}" for split in SPLITS)), "splits": splits}
+
+
+def stamp(manifest, data_dir=None):
+    """
+    Bring a JSON-style manifest to version 2 in place: hash items that lack
+    a ``sha`` (reading them from ``data_dir``, default training_data) and
+    store the Merkle tree. Returns the manifest.
+    """
+    from embedding_cache import file_key
+
+    data_dir = Path(data_dir or PATHS["training_data"])
+    missing = 0
+    for split in SPLITS:
+        for item in manifest["splits"].get(split, []):
+            if item.get("sha"):
+                continue
+            path = data_dir / item["file"]
+            if path.exists():
+                item["sha"] = file_key(path)
+            else:
+                missing += 1
+    if missing:
+        print(f"  ⚠️ {missing} manifest files not found in {data_dir}; left unhashed")
+
+    tree = merkle_tree(manifest)
+    manifest["metadata"]["version"] = MANIFEST_VERSION
+    manifest["metadata"]["dataset_hash"] = tree["root"]
+    manifest["metadata"]["merkle"] = tree
+    return manifest
+
+
+def _tree(manifest):
+    # Trust a stored tree only when it is for this manifest version
+    metadata = manifest["metadata"]
+    if metadata.get("version", 1) >= MANIFEST_VERSION and "merkle" in metadata:
+        return metadata["merkle"]
+    return merkle_tree(manifest)
+
+
+def diff_manifests(old, new):
+    """
+    What changed from manifest ``old`` to ``new``:
+
+        * ``re_embed``: files whose content the old manifest did not have;
+          they miss the embedding cache. ``changed`` are edits in place (the
+          path's old content is gone), ``added`` everything else
+        * ``re_split``: files with content the old manifest had, now in a
+          different split, category or group
+        * ``renamed``: known content under a new path (cache hits, but
+          path-keyed state such as extraction checkpoints is stale)
+        * ``removed``: old paths that are gone
+
+    Only (split, category) subtrees whose Merkle hashes differ are walked.
+    """
+    old_tree, new_tree = _tree(old), _tree(new)
+    result = {"old_hash": old_tree["root"], "new_hash": new_tree["root"],
+              "identical": old_tree["root"] == new_tree["root"], "changed_subtrees": [],
+              "added": [], "changed": [], "re_split": [], "renamed": [], "removed": []}
+    if result["identical"]:
+        result["re_embed"] = []
+        return result
+
+    def changed_buckets(tree_a, tree_b):
+        return {(split, category) for split in SPLITS
+                if tree_a["splits"][split]["hash"] != tree_b["splits"][split]["hash"]
+                for category, h in tree_a["splits"][split]["categories"].items()
+                if tree_b["splits"][split]["categories"].get(category) != h}
+
+    new_buckets = changed_buckets(new_tree, old_tree)
+    old_buckets = changed_buckets(old_tree, new_tree)
+    result["changed_subtrees"] = sorted(f"{split}/{category}" for split, category in new_buckets | old_buckets)
+
+    old_by_file, old_by_sha = {}, {}
+    for split in SPLITS:
+        for item in old["splits"].get(split, []):
+            old_by_file[item["file"]] = (split, item)
+            if item.get("sha"):
+                old_by_sha.setdefault(item["sha"], (split, item))
+
+    new_shas = {item.get("sha") for split in SPLITS for item in new["splits"].get(split, [])}
+    new_files = set()
+    for split in SPLITS:
+        for item in new["splits"].get(split, []):
+            new_files.add(item["file"])
+            if (split, item["category"]) not in new_buckets:
+                continue
+            sha = item.get("sha")
+            before = old_by_file.get(item["file"])
+            if before and (not sha or before[1].get("sha") == sha):
+                old_split, old_item = before
+            elif sha and sha in old_by_sha:
+                old_split, old_item = old_by_sha[sha]
+                if old_item["file"] != item["file"]:
+                    result["renamed"].append({"file": item["file"], "was": old_item["file"]})
+            else:
+                edited = before is not None and before[1].get("sha") not in new_shas
+                result["changed" if edited else "added"].append(item["file"])
+                continue
+            if (old_split, old_item["category"], old_item.get("group")) != (split, item["category"], item.get("group")):
+                result["re_split"].append({"file": item["file"], "split": [old_split, split],
+                                           "category": [old_item["category"], item["category"]]})
+
+    for split, category in old_buckets:
+        result["removed"].extend(item["file"] for item in old["splits"].get(split, [])
+                                 if item["category"] == category and item["file"] not in new_files)
+    result["removed"].sort()
+    result["re_embed"] = result["added"] + result["changed"]
+    return result
+
+
+def summarize_diff(diff):
+    if diff["identical"]:
+        return f"identical (dataset hash {diff['new_hash'][:12]})"
+    return (f"{len(diff['re_embed'])} to re-embed ({len(diff['added'])} added, {len(diff['changed'])} changed), "
+            f"{len(diff['re_split'])} to re-split, {len(diff['renamed'])} renamed, "
+            f"{len(diff['removed'])} removed across {len(diff['changed_subtrees'])} split/category subtrees")
+
+
+def default_manifest_path(directory=None):
+    """The packed manifest in ``directory`` (default: reports), or a JSON one if only that exists."""
+    directory = Path(directory or PATHS["reports"])
+    if not (directory / MANIFEST_NAME).exists() and (directory / JSON_MANIFEST_NAME).exists():
+        return directory / JSON_MANIFEST_NAME
+    return directory / MANIFEST_NAME
+
+
+def load_manifest(path):
+    """A packed (memory-mapped) or JSON manifest, as {"metadata", "splits"}."""
+    from packed_manifest import is_packed, load_packed
+
+    if is_packed(path):
+        return load_packed(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """Write a manifest packed, or as JSON when ``path`` ends in .json."""
+    from packed_manifest import write_packed, export_json
+
+    return export_json(manifest, path) if Path(path).suffix == ".json" else write_packed(manifest, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two training manifests, or upgrade one to version 2")
+    parser.add_argument("manifests", nargs="*", type=Path, metavar="MANIFEST", help="old and new manifest")
+    parser.add_argument("--stamp", type=Path, metavar="MANIFEST",
+                        help="add content hashes and the Merkle tree to a manifest in place")
+    parser.add_argument("--data-dir", type=Path, default=PATHS["training_data"],
+                        help="where manifest files live (for --stamp)")
+    parser.add_argument("--list", action="store_true", help="print every affected file")
+    parser.add_argument("--output", type=Path, help="write the full diff as JSON")
+    args = parser.parse_args(argv)
+    if not args.stamp and len(args.manifests) != 2:
+        parser.error("give an old and a new manifest, or --stamp MANIFEST")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stamp:
+        from packed_manifest import to_json_dict
+
+        manifest = stamp(to_json_dict(load_manifest(args.stamp)), args.data_dir)
+        save_manifest(manifest, args.stamp)
+        print(f"✓ {args.stamp}: version {MANIFEST_VERSION}, dataset hash {manifest['metadata']['dataset_hash']}")
+        if not args.manifests:
+            return 0
+
+    old, new = (load_manifest(path) for path in args.manifests)
+    diff = diff_manifests(old, new)
+    print(f"{args.manifests[0]} -> {args.manifests[1]}: {summarize_diff(diff)}")
+    if args.list:
+        for key in ("added", "changed"):
+            for file in diff[key]:
+                print(f"  re-embed ({key}): {file}")
+        for entry in diff["re_split"]:
+            print(f"  re-split: {entry['file']} {entry['split'][0]}/{entry['category'][0]} "
+                  f"-> {entry['split'][1]}/{entry['category'][1]}")
+        for entry in diff["renamed"]:
+            print(f"  renamed: {entry['was']} -> {entry['file']}")
+        for file in diff["removed"]:
+            print(f"  removed: {file}")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(diff, f, indent=2)
+        print(f"✓ Diff: {args.output}")
+    return 0 if diff["identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
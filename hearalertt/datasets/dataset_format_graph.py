@@ -12,6 +12,10 @@ import numpy as np
 from pathlib import Path
 import yaml
 import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from paths import PATHS
 
 def load_dataset_info():
     """Load information about all datasets"""
@@ -31,7 +35,7 @@ def load_dataset_info():
     }
     
     # HearAlert Custom Datasets (from YAML files)
-    yaml_dir = Path('/Users/abu/hearalert_version_1.1/hearalertt/mobile_app/assets/datasets')
+    yaml_dir = PATHS['app_datasets']
     
     custom_datasets = {
         'Baby Crying': {'file_count': 80, 'priority': 10},
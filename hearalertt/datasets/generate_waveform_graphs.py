@@ -12,9 +12,13 @@ import struct
 from pathlib import Path
 import pandas as pd
 from matplotlib.backends.backend_pdf import PdfPages
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from paths import PATHS
+
 def read_wav_file(filepath):
     """Read WAV file and return audio data and parameters"""
     try:
@@ -97,8 +101,8 @@ def plot_waveform_single(filepath, ax, title_override=None):
 
 def get_esc50_samples():
     """Get representative samples from ESC-50 dataset"""
-    csv_path = Path('/Users/abu/hearalert_version_1.1/hearalertt/datasets/ESC-50/meta/esc50.csv')
-    audio_dir = Path('/Users/abu/hearalert_version_1.1/hearalertt/datasets/ESC-50/audio')
+    csv_path = PATHS['esc50'] / 'meta' / 'esc50.csv'
+    audio_dir = PATHS['esc50'] / 'audio'
     
     if not csv_path.exists():
         return []
@@ -132,8 +136,8 @@ def get_custom_samples():
     # These would be from your custom generated audio files
     # For now, we'll use ESC-50 samples that match HearAlert categories
     
-    csv_path = Path('/Users/abu/hearalert_version_1.1/hearalertt/datasets/ESC-50/meta/esc50.csv')
-    audio_dir = Path('/Users/abu/hearalert_version_1.1/hearalertt/datasets/ESC-50/audio')
+    csv_path = PATHS['esc50'] / 'meta' / 'esc50.csv'
+    audio_dir = PATHS['esc50'] / 'audio'
     
     if not csv_path.exists():
         return []
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Detection Post-Processing for HearAlert
+=======================================
+Turns a stream of per-window class scores into alerts. Thresholding single
+windows flickers (a siren dips below threshold for one window and is
+alerted again), so scores are first smoothed with a median of the last k
+windows and an exponential moving average, then each category goes through
+a hysteresis gate (on at its threshold, off below ``release`` x threshold)
+and a cooldown before it may alert again.
+
+Per-category thresholds, priorities and cooldowns come from the generated
+``*_dataset.yaml`` files in mobile_app/assets/datasets. Both layouts are
+understood:
+
+    detection: {confidence_threshold, priority, alert_type}   (convert_raw_to_dataset)
+    realtime_config: {min_confidence}, classification: {priority, alert_type}
+
+and ``hearalert_dataset.yaml`` supplies the global ``min_confidence``, the
+per-tier ``repeat_interval_sec`` (cooldown) and ``max_alerts_per_minute``.
+
+Every ``update()`` does a fixed amount of vectorised work over the
+categories using preallocated arrays, independent of stream length.
+
+Usage:
+    python detection_postprocess.py recording.wav --model hearalert_end_to_end.tflite
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paths import PATHS
+from yaml_io import load_yaml, YAMLError
+
+DATASETS_DIR = PATHS["app_datasets"]
+MASTER_YAML = "hearalert_dataset.yaml"
+
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_COOLDOWN_SEC = 5.0
+
+
+def _read_yaml(path):
+    try:
+        return load_yaml(path) or {}
+    except (OSError, YAMLError) as e:
+        print(f"  Skipping unreadable {path.name}: {e}", file=sys.stderr)
+        return {}
+
+
+def load_detection_config(labels, datasets_dir=DATASETS_DIR):
+    """
+    Per-category detection settings for ``labels``.
+
+    Returns {"categories": {label: {threshold, priority, alert_type,
+    cooldown_sec}}, "max_alerts_per_minute": int or None}.
+    """
+    datasets_dir = Path(datasets_dir)
+    master = _read_yaml(datasets_dir / MASTER_YAML) if (datasets_dir / MASTER_YAML).exists() else {}
+
+    realtime = master.get("realtime_config") or {}
+    legacy = (master.get("real_time_config") or {}).get("detection") or {}
+    default_threshold = realtime.get("min_confidence", legacy.get("min_confidence", DEFAULT_THRESHOLD))
+    cooldowns = {tier: settings.get("repeat_interval_sec", DEFAULT_COOLDOWN_SEC)
+                 for tier, settings in (master.get("alert_settings") or {}).items()}
+    master_categories = {c.get("id"): c for c in master.get("categories") or [] if isinstance(c, dict)}
+
+    per_file = {}
+    for path in sorted(datasets_dir.glob("*_dataset.yaml")):
+        if path.name == MASTER_YAML:
+            continue
+        data = _read_yaml(path)
+        detection = data.get("detection") or {}
+        classification = data.get("classification") or {}
+        name = classification.get("category_id") or path.stem[:-len("_dataset")]
+        per_file[name] = {
+            "threshold": detection.get("confidence_threshold",
+                                       (data.get("realtime_config") or {}).get("min_confidence")),
+            "priority": detection.get("priority", classification.get("priority")),
+            "alert_type": detection.get("alert_type", classification.get("alert_type")),
+        }
+
+    categories = {}
+    for label in labels:
+        entry = per_file.get(label, {})
+        fallback = master_categories.get(label, {})
+        alert_type = entry.get("alert_type") or fallback.get("alert_type") or "medium"
+        threshold = entry.get("threshold")
+        categories[label] = {
+            "threshold": float(threshold if threshold is not None else default_threshold),
+            "priority": int(entry.get("priority") or fallback.get("priority") or 5),
+            "alert_type": alert_type,
+            "cooldown_sec": float(cooldowns.get(alert_type, DEFAULT_COOLDOWN_SEC)),
+        }
+
+    return {"categories": categories, "max_alerts_per_minute": realtime.get("max_alerts_per_minute")}
+
+
+class DetectionPostProcessor:
+    """
+    Median-of-k + EMA smoothing, per-category hysteresis and cooldown.
+
+    ``update(scores, time_sec)`` takes one window's class scores and
+    returns the alerts (rising edges that passed the cooldown and the
+    global rate limit) as dicts.
+    """
+
+    def __init__(self, labels, config=None, median_k=3, ema_alpha=0.5, release=0.7):
+        config = config or load_detection_config(labels)
+        categories = config["categories"]
+        n = len(labels)
+        self.labels = list(labels)
+        self.on = np.array([categories[l]["threshold"] for l in labels], dtype=np.float32)
+        self.off = self.on * release
+        self.cooldown = np.array([categories[l]["cooldown_sec"] for l in labels])
+        self.priority = np.array([categories[l]["priority"] for l in labels])
+        self.alert_type = [categories[l]["alert_type"] for l in labels]
+        self.ema_alpha = ema_alpha
+
+        self._history = np.zeros((max(median_k, 1), n), dtype=np.float32)
+        self._seen = 0
+        self._ema = np.zeros(n, dtype=np.float32)
+        self.active = np.zeros(n, dtype=bool)
+        self._last_alert = np.full(n, -np.inf)
+
+        max_per_minute = config.get("max_alerts_per_minute")
+        self._recent = np.full(int(max_per_minute), -np.inf) if max_per_minute else None
+        self._recent_pos = 0
+        self.suppressed = 0
+
+    def smooth(self, scores):
+        """Push one window of scores and return the smoothed scores."""
+        k = len(self._history)
+        self._history[self._seen % k] = scores
+        self._seen += 1
+        median = np.median(self._history[:min(self._seen, k)], axis=0)
+        if self._seen == 1:
+            self._ema[:] = median
+        else:
+            self._ema += self.ema_alpha * (median - self._ema)
+        return self._ema
+
+    def update(self, scores, time_sec):
+        """Process one window; returns a list of alert dicts."""
+        smoothed = self.smooth(np.asarray(scores, dtype=np.float32))
+
+        rising = ~self.active & (smoothed >= self.on)
+        self.active |= rising
+        self.active &= smoothed >= self.off
+
+        alerts = []
+        for i in np.flatnonzero(rising & (time_sec - self._last_alert >= self.cooldown)):
+            if self._recent is not None:
+                if time_sec - self._recent[self._recent_pos] < 60:
+                    self.suppressed += 1
+                    continue
+                self._recent[self._recent_pos] = time_sec
+                self._recent_pos = (self._recent_pos + 1) % len(self._recent)
+            self._last_alert[i] = time_sec
+            alerts.append({
+                "time_sec": round(float(time_sec), 3),
+                "label": self.labels[i],
+                "score": float(smoothed[i]),
+                "priority": int(self.priority[i]),
+                "alert_type": self.alert_type[i],
+            })
+        return alerts
+
+
+def raw_detections(scores, thresholds):
+    """Count single-window threshold crossings (what the app alerts on today)."""
+    above = np.asarray(scores) >= thresholds
+    return int(np.sum(above[0]) + np.sum(above[1:] & ~above[:-1]))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Smooth HearAlert window scores into alerts")
+    parser.add_argument("inputs", nargs="+", type=Path, help="WAV files to score window by window")
+    parser.add_argument("--model", type=Path, help="TFLite model (default: streaming classifier default)")
+    parser.add_argument("--labels", type=Path, help="labels file (default: next to the model)")
+    parser.add_argument("--yamnet", help="YAMNet handle or .tflite for embedding heads")
+    parser.add_argument("--datasets-dir", type=Path, default=DATASETS_DIR,
+                        help="directory holding the *_dataset.yaml files")
+    parser.add_argument("--median-k", type=int, default=3, help="median filter length in windows")
+    parser.add_argument("--ema-alpha", type=float, default=0.5, help="EMA weight of the newest window")
+    parser.add_argument("--release", type=float, default=0.7,
+                        help="hysteresis release level as a fraction of the threshold")
+    parser.add_argument("--output", type=Path, help="write alerts as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from streaming_classifier import (StreamingClassifier, load_backend, load_labels,
+                                      iter_wav_chunks, DEFAULT_MODEL, YAMNET_HANDLE)
+
+    args = parse_args(argv)
+    model = args.model or DEFAULT_MODEL
+    backend = load_backend(model, args.yamnet or YAMNET_HANDLE)
+    labels = load_labels(model, args.labels)
+    if not labels:
+        print("Labels are required to look up per-category settings", file=sys.stderr)
+        return 1
+    config = load_detection_config(labels, args.datasets_dir)
+
+    report = []
+    for path in args.inputs:
+        engine = StreamingClassifier(backend, labels, batch_size=32)
+        processor = DetectionPostProcessor(labels, config, args.median_k, args.ema_alpha, args.release)
+        windows = []
+        for chunk in iter_wav_chunks(path):
+            windows.extend(engine.feed(chunk))
+        windows.extend(engine.flush())
+
+        alerts = []
+        for window in windows:
+            alerts.extend(processor.update(window["scores"], window["end_sec"]))
+        raw = raw_detections([w["scores"] for w in windows], processor.on) if windows else 0
+
+        print(f"▶ {path.name}: {len(windows)} windows, {raw} single-window detections -> "
+              f"{len(alerts)} alerts", file=sys.stderr)
+        for alert in alerts:
+            print(f"  [{alert['time_sec']:8.2f}s] {alert['label']:<20} {alert['score']:.2f} "
+                  f"({alert['alert_type']})", file=sys.stderr)
+        report.append({"source": str(path), "windows": len(windows), "raw_detections": raw,
+                       "alerts": alerts, "rate_limited": processor.suppressed})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
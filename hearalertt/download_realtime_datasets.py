@@ -3,22 +3,27 @@
 Download and Generate Real-Time Audio Datasets for HearAlert
 ============================================================
 Expands the dataset with new categories and real-world audio variations.
+
+ESC-50 is read from datasets/ under HEARALERT_BASE_DIR and the results go
+to realtime_audio/ under HEARALERT_SCRATCH_DIR (paths.py has the defaults).
 """
 
 import os
 import numpy as np
 import wave
 import struct
-from pathlib import Path
 import random
 import shutil
 import csv
 
-BASE_DIR = Path(__file__).parent
-DATASETS_DIR = BASE_DIR / "datasets"
-ESC50_DIR = DATASETS_DIR / "ESC-50"
-NEW_AUDIO_DIR = BASE_DIR / "realtime_audio"
-TRAINING_DATA_DIR = BASE_DIR / "training_data"
+from augment_audio_advanced import ConvolutionReverb, SKIP_COPY_ENV
+from lineage import LineageLog
+from paths import PATHS
+
+DATASETS_DIR = PATHS["datasets"]
+ESC50_DIR = PATHS["esc50"]
+NEW_AUDIO_DIR = PATHS["realtime_audio"]
+TRAINING_DATA_DIR = PATHS["training_data"]
 
 # New categories to add for real-time use cases
 NEW_REALTIME_CATEGORIES = {
@@ -320,6 +325,17 @@ def collect_esc50_for_category(category, esc_classes):
     return files
 
 
+# Room reverbs keyed by sample rate so RIR spectra are cached across files
+_ROOM_REVERBS = {}
+
+
+def get_room_reverb(sample_rate):
+    """Return the shared convolution reverb for ``sample_rate``."""
+    if sample_rate not in _ROOM_REVERBS:
+        _ROOM_REVERBS[sample_rate] = ConvolutionReverb.load_or_synthesize(sample_rate=sample_rate)
+    return _ROOM_REVERBS[sample_rate]
+
+
 def generate_synthetic_variation(samples, variation_type, sample_rate=44100):
     """Generate synthetic variation of audio samples."""
     samples = samples.astype(np.float32)
@@ -344,12 +360,8 @@ def generate_synthetic_variation(samples, variation_type, sample_rate=44100):
         samples = samples + noise * np.max(np.abs(samples))
     
     elif variation_type == "reverb":
-        # Simple reverb simulation
-        delay_samples = int(0.03 * sample_rate)
-        reverb = np.zeros(len(samples) + delay_samples)
-        reverb[:len(samples)] = samples
-        reverb[delay_samples:] += 0.5 * samples
-        samples = reverb[:len(samples)]
+        # Room impulse response convolution
+        samples = get_room_reverb(sample_rate).apply(samples, wet=0.5)
     
     elif variation_type == "volume_up":
         samples = samples * 1.3
@@ -632,6 +644,7 @@ def expand_with_augmentations(source_files, category, target_count=200):
     """Expand dataset with augmented versions."""
     cat_dir = NEW_AUDIO_DIR / category
     cat_dir.mkdir(parents=True, exist_ok=True)
+    lineage = LineageLog(cat_dir)
     
     variations = ["noise", "volume_up", "volume_down", "time_shift", "pitch_up", "pitch_down"]
     
@@ -645,6 +658,7 @@ def expand_with_augmentations(source_files, category, target_count=200):
         dest_path = cat_dir / f"{category}_{i:04d}.wav"
         try:
             shutil.copy2(src_path, dest_path)
+            lineage.record(dest_path, src_path, "copy")
             copied += 1
         except Exception as e:
             print(f"    Error copying {src_path}: {e}")
@@ -661,8 +675,10 @@ def expand_with_augmentations(source_files, category, target_count=200):
                     aug_samples = generate_synthetic_variation(samples, var, sr)
                     aug_path = cat_dir / f"{category}_{i:04d}_{var}.wav"
                     save_wav(aug_samples, sr, aug_path)
+                    lineage.record(aug_path, src_path, var)
                     augmented += 1
     
+    lineage.save()
     return copied, augmented
 
 
@@ -718,18 +734,22 @@ def main():
     print(f"Output directory: {NEW_AUDIO_DIR}")
     print("=" * 60)
     
-    # Copy to training_data directory
-    print("\nCopying to training_data directory...")
-    for category in NEW_REALTIME_CATEGORIES.keys():
-        src_dir = NEW_AUDIO_DIR / category
-        dest_dir = TRAINING_DATA_DIR / category
-        
-        if src_dir.exists():
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            for wav_file in src_dir.glob("*.wav"):
-                dest_file = dest_dir / wav_file.name
-                if not dest_file.exists():
-                    shutil.copy2(wav_file, dest_file)
+    # Copy to training_data directory (the pipeline runner skips this:
+    # train_audio_model collects realtime_audio itself)
+    if os.environ.get(SKIP_COPY_ENV):
+        print("\nSkipping copy to training_data")
+    else:
+        print("\nCopying to training_data directory...")
+        for category in NEW_REALTIME_CATEGORIES.keys():
+            src_dir = NEW_AUDIO_DIR / category
+            dest_dir = TRAINING_DATA_DIR / category
+            
+            if src_dir.exists():
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                for wav_file in src_dir.glob("*.wav"):
+                    dest_file = dest_dir / wav_file.name
+                    if not dest_file.exists():
+                        shutil.copy2(wav_file, dest_file)
     
     print("Done! Run train_audio_model.py to retrain with new data.")
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+YAMNet Embedding Cache for HearAlert
+====================================
+Stores YAMNet embeddings on disk keyed by the audio file's content hash, so
+a clip is embedded once and every later training, evaluation or sweep run
+reads the cached features instead of re-running the network.
+
+Each cache namespace (e.g. ``yamnet_mean-<model version>``, see
+train_audio_model.embedding_namespace) is a single ``.npz`` holding the
+keys, per-key row offsets and one stacked (rows, 1024) float32 matrix.
+Long runs ``flush()`` new entries to small ``<namespace>.part-NNNNN.npz``
+files instead of rewriting the whole cache; ``save()`` merges them back.
+"""
+
+import os
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+
+def file_key(file_path):
+    """Content hash of an audio file, used as its cache key."""
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache; every entry is a (rows, dims) float32 array."""
+
+    def __init__(self, cache_dir, namespace):
+        self.path = Path(cache_dir) / f"{namespace}.npz"
+        self.namespace = namespace
+        self._entries = {}
+        self._unflushed = []
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _parts(self):
+        # Temporary files end in ".tmp", but skip older "*.tmp.npz" leftovers too
+        return sorted(path for path in self.path.parent.glob(f"{self.namespace}.part-*.npz")
+                      if not path.name.endswith(".tmp.npz"))
+
+    def _read(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            keys = data["keys"]
+            offsets = data["offsets"]
+            rows = data["rows"]
+        for i, key in enumerate(keys):
+            self._entries[str(key)] = rows[offsets[i]:offsets[i + 1]]
+
+    def _load(self):
+        parts = self._parts()
+        # Part files are folded into the main file by the next save()
+        self._dirty = bool(parts)
+        for path in ([self.path] if self.path.exists() else []) + parts:
+            try:
+                self._read(path)
+            except Exception as e:
+                print(f"  Ignoring unreadable embedding cache {path}: {e}")
+                if path == self.path:
+                    self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached embedding rows for ``key`` or None."""
+        rows = self._entries.get(key)
+        if rows is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rows
+
+    def put(self, key, embedding):
+        """Store an embedding (1-D vector or 2-D frame matrix)."""
+        self._entries[key] = np.atleast_2d(np.asarray(embedding, dtype=np.float32))
+        self._unflushed.append(key)
+        self._dirty = True
+
+    def matrix(self):
+        """Stack every cached row into one (rows, dims) array."""
+        if not self._entries:
+            return np.zeros((0, 1024), dtype=np.float32)
+        return np.concatenate(list(self._entries.values()))
+
+    def _write(self, path, keys):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        counts = [len(self._entries[k]) for k in keys]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        rows = (np.concatenate([self._entries[k] for k in keys])
+                if keys else np.zeros((0, 1024), dtype=np.float32))
+        # Outside the part-file glob, so a crash mid-write leaves nothing to merge
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, keys=np.array(keys, dtype=str), offsets=offsets, rows=rows)
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """Append entries added since the last flush/save as a part file (cost: the new entries only)."""
+        keys = list(dict.fromkeys(self._unflushed))
+        if not keys:
+            return
+        parts = self._parts()
+        number = int(parts[-1].name.rsplit("-", 1)[1].split(".")[0]) + 1 if parts else 0
+        self._write(self.path.with_name(f"{self.namespace}.part-{number:05d}.npz"), keys)
+        self._unflushed = []
+
+    def save(self):
+        """Write the whole cache atomically if anything changed, folding in any part files."""
+        if not self._dirty:
+            return
+        parts = self._parts()
+        self._write(self.path, list(self._entries))
+        for path in parts:
+            path.unlink(missing_ok=True)
+        self._unflushed = []
+        self._dirty = False
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Test-Split Evaluation for HearAlert
+===================================
+Evaluates the trained classifier on the manifest's held-out ``test`` split:
+confusion matrix, per-class precision/recall/F1 and recall per alert tier
+(critical/high/medium/low), for both the Keras model and the exported
+TFLite model.
+
+Test embeddings come from the YAMNet embedding cache filled during
+training, so evaluation normally takes seconds; only uncached files are
+embedded (decoded exactly as in training) and added to the cache.
+``train_model`` runs this automatically after export.
+
+Usage:
+    python evaluate_model.py
+    python evaluate_model.py --embedding-mode frames --output report.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paths import PATHS
+from dataset_manifest import load_manifest, default_manifest_path
+
+PROCESSED_DIR = PATHS["training_data"]
+REPORTS_DIR = PATHS["reports"]  # Dev-only; not bundled with the app
+MODEL_OUTPUT = PATHS["app_models"]
+FEATURE_CACHE_DIR = PATHS["feature_cache"]
+REPORT_NAME = "evaluation_report.json"
+
+
+def confusion_matrix(y_true, y_pred, num_classes):
+    """(true, predicted) count matrix."""
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(y_true * num_classes + y_pred,
+                       minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def classification_report(cm, categories, tiers=None):
+    """
+    Accuracy, per-class precision/recall/F1 and per-tier recall from a
+    confusion matrix. ``tiers`` maps category -> alert tier.
+    """
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+
+    report = {
+        "accuracy": float(tp.sum() / max(cm.sum(), 1)),
+        "macro_recall": float(recall[support > 0].mean()) if (support > 0).any() else 0.0,
+        "per_class": {
+            category: {
+                "precision": round(float(precision[i]), 4),
+                "recall": round(float(recall[i]), 4),
+                "f1": round(float(f1[i]), 4),
+                "support": int(support[i]),
+            }
+            for i, category in enumerate(categories)
+        },
+        "confusion_matrix": cm.tolist(),
+    }
+
+    if tiers:
+        per_tier = {}
+        for tier in sorted(set(tiers.values())):
+            idx = [i for i, c in enumerate(categories) if tiers.get(c) == tier]
+            tier_support = int(support[idx].sum())
+            per_tier[tier] = {
+                "recall": round(float(tp[idx].sum() / tier_support), 4) if tier_support else None,
+                "support": tier_support,
+            }
+        report["per_tier"] = per_tier
+    return report
+
+
+def evaluate_models(X, y, categories, keras_model=None, tflite_model=None, tiers=None,
+                    batch_size=1024):
+    """Evaluate a Keras model and/or TFLite flatbuffer on (X, y) in large batches."""
+    from model_export import predict_tflite
+
+    X = np.asarray(X, dtype=np.float32).reshape(-1, 1024)
+    y = np.asarray(y)
+    results = {"samples": int(len(X))}
+    if not len(X):
+        return results
+
+    if keras_model is not None:
+        start = time.perf_counter()
+        predictions = keras_model.predict(X, batch_size=batch_size, verbose=0).argmax(axis=1)
+        results["keras"] = classification_report(
+            confusion_matrix(y, predictions, len(categories)), categories, tiers)
+        results["keras"]["seconds"] = round(time.perf_counter() - start, 3)
+
+    if tflite_model is not None:
+        start = time.perf_counter()
+        predictions = predict_tflite(tflite_model, X, batch_size=batch_size).argmax(axis=1)
+        results["tflite"] = classification_report(
+            confusion_matrix(y, predictions, len(categories)), categories, tiers)
+        results["tflite"]["seconds"] = round(time.perf_counter() - start, 3)
+    return results
+
+
+def print_report(results, categories):
+    """Print a compact summary of ``evaluate_models`` output."""
+    print(f"\n🧪 Test split evaluation ({results['samples']} samples)")
+    for name in ("keras", "tflite"):
+        if name not in results:
+            continue
+        report = results[name]
+        print(f"  {name}: accuracy {report['accuracy']:.2%}, macro recall {report['macro_recall']:.2%} "
+              f"({report['seconds']:.2f}s)")
+        for tier, entry in report.get("per_tier", {}).items():
+            if entry["recall"] is not None:
+                print(f"    {tier:<9} recall {entry['recall']:.2%} ({entry['support']} samples)")
+
+    report = results.get("tflite") or results.get("keras")
+    if report:
+        print(f"  {'class':<20} {'prec':>6} {'recall':>6} {'n':>5}")
+        for category in categories:
+            entry = report["per_class"][category]
+            print(f"  {category:<20} {entry['precision']:>6.2f} {entry['recall']:>6.2f} {entry['support']:>5}")
+
+
+_yamnet_model = None
+
+
+def _yamnet():
+    global _yamnet_model
+    if _yamnet_model is None:
+        from yamnet_store import load_yamnet
+
+        print("  Loading YAMNet for uncached files...")
+        _yamnet_model = load_yamnet()
+    return _yamnet_model
+
+
+def load_split_embeddings(manifest, split="test", embedding_mode="mean", return_index=False):
+    """
+    Embeddings of one manifest split from the cache, embedding any misses with YAMNet.
+
+    With ``return_index`` a fourth array maps each row to its item's
+    position in the split (frame mode yields several rows per item).
+    """
+    from embedding_cache import EmbeddingCache, file_key
+    from train_audio_model import load_clip, embed_clip, embedding_namespace
+
+    categories = [cat["name"] for cat in manifest["metadata"]["categories"]]
+    cache = EmbeddingCache(FEATURE_CACHE_DIR, embedding_namespace(embedding_mode))
+    X, y, index = [], [], []
+    for position, item in enumerate(manifest["splits"][split]):
+        file_path = PROCESSED_DIR / item["file"]
+        if not file_path.exists():
+            continue
+        key = item.get("sha") or file_key(file_path)
+        embedding = cache.get(key)
+        if embedding is None:
+            # Decode exactly as training does, so cached rows are interchangeable
+            waveform = load_clip(file_path, embedding_mode)
+            if waveform is None:
+                continue
+            embedding = embed_clip(_yamnet(), waveform, embedding_mode)
+            cache.put(key, embedding)
+        X.extend(embedding)
+        y.extend([categories.index(item["category"])] * len(embedding))
+        index.extend([position] * len(embedding))
+
+    cache.save()
+    print(f"  {split}: {len(X)} samples (embedding cache: {cache.hits} hits, {cache.misses} misses)")
+    X, y = np.array(X, dtype=np.float32).reshape(-1, 1024), np.array(y)
+    if return_index:
+        return X, y, categories, np.array(index, dtype=np.int64)
+    return X, y, categories
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the HearAlert classifier on the test split")
+    parser.add_argument("--manifest", type=Path, default=default_manifest_path(REPORTS_DIR))
+    parser.add_argument("--keras-model", type=Path, default=MODEL_OUTPUT / "best_model.keras")
+    parser.add_argument("--tflite-model", type=Path, default=MODEL_OUTPUT / "hearalert_classifier.tflite")
+    parser.add_argument("--embedding-mode", choices=["mean", "frames"], default="mean",
+                        help="embedding cache namespace the models were trained on")
+    parser.add_argument("--output", type=Path, default=REPORTS_DIR / REPORT_NAME,
+                        help="where to write the JSON report")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from train_audio_model import TRAINING_CATEGORIES
+
+    manifest = load_manifest(args.manifest)
+    X, y, categories = load_split_embeddings(manifest, "test", args.embedding_mode)
+    tiers = {c: TRAINING_CATEGORIES.get(c, {}).get("alert_type", "medium") for c in categories}
+
+    keras_model = None
+    if args.keras_model.exists():
+        import tensorflow as tf
+
+        keras_model = tf.keras.models.load_model(args.keras_model, compile=False)
+    tflite_model = args.tflite_model.read_bytes() if args.tflite_model.exists() else None
+
+    results = evaluate_models(X, y, categories, keras_model, tflite_model, tiers)
+    print_report(results, categories)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Evaluation report: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
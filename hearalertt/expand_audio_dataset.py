@@ -5,21 +5,24 @@ Expands the training dataset by:
 1. Using all available ESC-50 audio
 2. Augmenting existing audio with variations
 3. Generating synthetic audio samples
+
+ESC-50 and raw/ are read from the HEARALERT_BASE_DIR root and the output
+goes to augmented_audio/ under HEARALERT_SCRATCH_DIR (paths.py).
 """
 
 import os
 import shutil
 import numpy as np
-from pathlib import Path
 import wave
 import struct
 import random
 
-BASE_DIR = Path("/Users/abu/hearalert_version_1.1/hearalertt")
-ESC50_DIR = BASE_DIR / "datasets" / "ESC-50" / "audio"
-ESC50_META = BASE_DIR / "datasets" / "ESC-50" / "meta" / "esc50.csv"
-RAW_DIR = BASE_DIR / "raw"
-AUGMENTED_DIR = BASE_DIR / "augmented_audio"
+from paths import PATHS
+
+ESC50_DIR = PATHS["esc50"] / "audio"
+ESC50_META = PATHS["esc50"] / "meta" / "esc50.csv"
+RAW_DIR = PATHS["raw"]
+AUGMENTED_DIR = PATHS["augmented_audio"]
 
 # ESC-50 class names mapped to our categories
 ESC50_MAPPING = {
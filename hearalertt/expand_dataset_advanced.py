@@ -2,6 +2,9 @@
 """
 Advanced Audio Dataset Expansion for HearAlert
 Generates more audio samples through advanced augmentation for real-time deaf accessibility.
+
+Expands combined_audio/ into expanded_audio/, both under the scratch root
+that HEARALERT_SCRATCH_DIR (or hearalert_paths.yaml) selects; see paths.py.
 """
 
 import os
@@ -11,9 +14,11 @@ import wave
 import struct
 import random
 
-BASE_DIR = Path("/Users/abu/hearalert_version_1.1/hearalertt")
-COMBINED_DIR = BASE_DIR / "combined_audio"
-EXPANDED_DIR = BASE_DIR / "expanded_audio"
+from lineage import LineageLog
+from paths import PATHS
+
+COMBINED_DIR = PATHS["combined_audio"]
+EXPANDED_DIR = PATHS["expanded_audio"]
 
 # Target counts per category for better balance
 TARGET_COUNTS = {
@@ -117,6 +122,7 @@ def expand_category(category, target_count):
     # Create output directory
     cat_dir = EXPANDED_DIR / category
     cat_dir.mkdir(parents=True, exist_ok=True)
+    lineage = LineageLog(cat_dir)
     
     # Copy existing files
     for f in category_files:
@@ -125,6 +131,7 @@ def expand_category(category, target_count):
             samples, params = read_wav(f)
             if samples is not None:
                 write_wav(dest, samples, params)
+                lineage.record(dest, f, "copy")
     
     # Count current files
     current = len(list(cat_dir.glob("*.wav")))
@@ -150,11 +157,13 @@ def expand_category(category, target_count):
         output_path = cat_dir / f"{category}_aug_{idx:04d}_{aug_type}.wav"
         
         if write_wav(output_path, aug_samples, params):
+            lineage.record(output_path, src_file, aug_type)
             current += 1
         
         if current >= target_count:
             break
     
+    lineage.save()
     final_count = len(list(cat_dir.glob("*.wav")))
     print(f"  {category}: {final_count} files (target: {target_count})")
     return final_count
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Feature-Domain Augmentation for HearAlert
+==========================================
+GPU-free augmentation applied to cached YAMNet embeddings instead of raw
+waveforms, so augmented training samples never need another YAMNet pass.
+
+All functions take a 2-D (samples, 1024) embedding matrix and integer labels
+and are vectorised with numpy.
+"""
+
+import numpy as np
+
+
+def _rng(rng):
+    return rng if rng is not None else np.random.default_rng()
+
+
+def jitter(X, sigma=0.05, rng=None):
+    """Add Gaussian noise scaled by each dimension's spread."""
+    rng = _rng(rng)
+    scale = X.std(axis=0, keepdims=True) * sigma
+    return X + rng.standard_normal(X.shape).astype(X.dtype) * scale
+
+
+def feature_mask(X, rate=0.0625, rng=None):
+    """
+    Dropout-style masking of embedding dimensions.
+
+    Zeroes each dimension of each sample independently with probability
+    ``rate`` (about 64 of 1024 by default). YAMNet's embedding dimensions
+    have no frequency order, so a random subset is masked rather than a
+    contiguous band; they are ReLU outputs, so zero is "feature absent"
+    and the rest are not rescaled.
+    """
+    rng = _rng(rng)
+    return np.where(rng.random(X.shape) < rate, 0, X).astype(X.dtype)
+
+
+def same_class_partners(y, rng=None):
+    """Pick a random partner index with the same label for every sample."""
+    rng = _rng(rng)
+    order = np.argsort(y, kind='stable')
+    sorted_y = y[order]
+    starts = np.searchsorted(sorted_y, y, side='left')
+    ends = np.searchsorted(sorted_y, y, side='right')
+    picks = starts + (rng.random(len(y)) * (ends - starts)).astype(int)
+    return order[picks]
+
+
+def interpolate_same_class(X, y, alpha=0.4, rng=None):
+    """
+    Interpolate each sample towards a random sample of the same class.
+
+    The weight on the original sample is drawn from Beta(alpha, alpha) and
+    folded to >= 0.5, so labels stay hard.
+    """
+    rng = _rng(rng)
+    partners = same_class_partners(y, rng)
+    lam = rng.beta(alpha, alpha, size=len(y)).astype(X.dtype)
+    lam = np.maximum(lam, 1 - lam)[:, None]
+    return lam * X + (1 - lam) * X[partners]
+
+
+def augment_embeddings(X, y, copies=2, rng=None):
+    """
+    Produce ``copies`` augmented versions of every embedding.
+
+    Each copy is a same-class interpolation followed by jitter and
+    dimension masking. Returns (X_aug, y_aug) holding only the new rows.
+    """
+    rng = _rng(rng)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    X_aug, y_aug = [], []
+    for _ in range(copies):
+        aug = interpolate_same_class(X, y, rng=rng)
+        aug = jitter(aug, rng=rng)
+        aug = feature_mask(aug, rng=rng)
+        X_aug.append(aug)
+        y_aug.append(y)
+    return np.concatenate(X_aug), np.concatenate(y_aug)
+
+
+def make_tf_batch_augmenter(X_train, interp_alpha=0.4, mixup_alpha=0.2, sigma=0.05,
+                            mask_rate=0.0625):
+    """
+    Build a ``tf.data`` map function augmenting batches on the fly.
+
+    The function takes a batch of (embeddings, one-hot labels, sample
+    weights) and applies the same steps as ``augment_embeddings`` (same-class
+    interpolation, jitter, dimension masking) followed by cross-class mixup,
+    mixing labels and weights with the same coefficients. The cost is O(1)
+    per sample per epoch, and every epoch sees fresh augmentations.
+    """
+    import tensorflow as tf
+    
+    X_train = np.asarray(X_train, dtype=np.float32)
+    scale = tf.constant(X_train.std(axis=0) * sigma, dtype=tf.float32)
+    
+    def beta(shape, alpha):
+        g1 = tf.random.gamma(shape, alpha)
+        g2 = tf.random.gamma(shape, alpha)
+        return g1 / (g1 + g2)
+    
+    def augment(x, y, w):
+        y = tf.cast(y, tf.float32)
+        w = tf.cast(w, tf.float32)
+        n = tf.shape(x)[0]
+        
+        # Same-class interpolation: random partner among rows sharing the label
+        same = tf.matmul(y, y, transpose_b=True)
+        partners = tf.random.categorical(tf.math.log(same), 1)[:, 0]
+        lam = beta([n, 1], interp_alpha)
+        lam = tf.maximum(lam, 1 - lam)
+        x = lam * x + (1 - lam) * tf.gather(x, partners)
+        
+        # Jitter
+        x = x + tf.random.normal(tf.shape(x)) * scale
+        
+        # Dimension masking (random subset, see feature_mask)
+        x = tf.where(tf.random.uniform(tf.shape(x)) < mask_rate, tf.zeros_like(x), x)
+        
+        # Cross-class mixup with soft labels
+        perm = tf.random.shuffle(tf.range(n))
+        lam = beta([n, 1], mixup_alpha)
+        x = lam * x + (1 - lam) * tf.gather(x, perm)
+        y = lam * y + (1 - lam) * tf.gather(y, perm)
+        w = lam[:, 0] * w + (1 - lam[:, 0]) * tf.gather(w, perm)
+        return x, y, w
+    
+    return augment
@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
 import os
 import glob
-import yaml
 import wave
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from paths import PATHS
+from yaml_io import load_yaml, YAMLError
+
 # Configuration
 BASE_DIR = Path(__file__).parent
-DATASETS_DIR = BASE_DIR / "training_data"
-YAML_CONFIG = BASE_DIR / "mobile_app/assets/datasets/hearalert_dataset.yaml"
+DATASETS_DIR = PATHS["training_data"]
+YAML_CONFIG = PATHS["app_datasets"] / "hearalert_dataset.yaml"
 OUTPUT_FILE = BASE_DIR / "dataset_report.xlsx"
 
 def get_audio_info(file_path):
@@ -31,12 +33,11 @@ def load_yaml_config(yaml_path):
         print(f"Warning: YAML config not found at {yaml_path}")
         return {}
     
-    with open(yaml_path, 'r') as f:
-        try:
-            return yaml.safe_load(f)
-        except yaml.YAMLError as e:
-            print(f"Error parsing YAML: {e}")
-            return {}
+    try:
+        return load_yaml(yaml_path)
+    except YAMLError as e:
+        print(f"Error parsing YAML: {e}")
+        return {}
 
 def main():
     print(f"Starting dataset report generation...")
@@ -92,7 +93,7 @@ def main():
                     "Sample Rate": sample_rate,
                     "Channels": channels,
                     "Bit Depth": sampwidth * 8,
-                    "Path": str(file_path.relative_to(BASE_DIR))
+                    "Path": str(file_path.relative_to(DATASETS_DIR.parent))
                 }
                 data.append(row)
 
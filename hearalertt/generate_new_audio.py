@@ -2,18 +2,21 @@
 """
 Download and Generate More Audio for HearAlert
 Additional sound categories for deaf accessibility
+
+Writes new_audio/ and combined_audio/ under the scratch root
+(HEARALERT_SCRATCH_DIR or hearalert_paths.yaml; see paths.py).
 """
 
 import os
 import numpy as np
 import wave
 import struct
-from pathlib import Path
 import random
 
-BASE_DIR = Path("/Users/abu/hearalert_version_1.1/hearalertt")
-COMBINED_DIR = BASE_DIR / "combined_audio"
-NEW_AUDIO_DIR = BASE_DIR / "new_audio"
+from paths import PATHS
+
+COMBINED_DIR = PATHS["combined_audio"]
+NEW_AUDIO_DIR = PATHS["new_audio"]
 
 # Additional categories to add
 NEW_CATEGORIES = {
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Augmentation Lineage for HearAlert
+==================================
+Records which source recording each derived (copied or augmented) file came
+from, so splits can keep a recording and all of its derivatives on the same
+side.
+
+Every output directory gets one ``_lineage.json`` sidecar mapping a derived
+file's name to its parent's content hash (the same md5 the embedding cache
+keys on), the parent's path and the transform applied:
+
+    {"version": 1, "files": {"siren_0001_aug0.wav":
+        {"parent": "<md5>", "parent_path": "...", "transform": "aug0"}}}
+"""
+
+import os
+import json
+from pathlib import Path
+
+from embedding_cache import file_key
+
+LINEAGE_NAME = "_lineage.json"
+
+
+class LineageLog:
+    """Collects lineage entries for one output directory; ``save()`` merges them into its sidecar."""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / LINEAGE_NAME
+        self.files = load_lineage(directory)
+        self._parent_keys = {}
+
+    def record(self, child_path, parent_path, transform):
+        """Record that ``child_path`` was derived from ``parent_path``."""
+        parent_path = Path(parent_path)
+        key = self._parent_keys.get(parent_path)
+        if key is None:
+            key = self._parent_keys[parent_path] = file_key(parent_path)
+        self.files[Path(child_path).name] = {
+            "parent": key,
+            "parent_path": str(parent_path),
+            "transform": transform,
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": 1, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def load_lineage(directory):
+    """{file name: entry} from a directory's sidecar, or {} when it has none."""
+    path = Path(directory) / LINEAGE_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        print(f"  Ignoring unreadable {path}: {e}")
+        return {}
+
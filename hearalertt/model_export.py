@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+TFLite Model Export for HearAlert
+=================================
+Converts trained Keras models to TFLite (float, dynamic-range or full-integer
+int8) and compares a quantized export against the float model on held-out
+data: model size, single-window latency and accuracy. Also exports YAMNet's
+log-mel-patch body for the incremental streaming classifier.
+"""
+
+import time
+
+import numpy as np
+
+from yamnet_frontend import PATCH_FRAMES, MEL_BANDS
+
+QUANTIZATION_MODES = ["float", "dynamic", "int8"]
+
+# YAMNet window fed by the app's audio classifier (0.975 s at 16 kHz)
+WINDOW_SAMPLES = 15600
+
+
+def convert_tflite(model, quantization="dynamic", representative_data=None, max_samples=500):
+    """
+    Convert a Keras model to a TFLite flatbuffer.
+
+    ``int8`` performs full-integer post-training quantization calibrated on
+    ``representative_data`` (model inputs, e.g. training-clip embeddings).
+    Weights and activations are int8; the input/output tensors stay float32
+    so the app can keep feeding float embeddings.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization == "int8":
+        if representative_data is None or len(representative_data) == 0:
+            raise ValueError("int8 quantization needs representative data")
+        data = np.asarray(representative_data, dtype=np.float32)
+        if len(data) > max_samples:
+            data = data[np.random.choice(len(data), max_samples, replace=False)]
+
+        def representative_dataset():
+            for row in data:
+                yield [row[None, ...]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != "float":
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    return converter.convert()
+
+
+def quantize_input(x, detail):
+    """Quantize a float input for an int8/uint8 tensor (no-op for float tensors)."""
+    scale, zero_point = detail["quantization"]
+    if detail["dtype"] in (np.int8, np.uint8) and scale:
+        info = np.iinfo(detail["dtype"])
+        return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(detail["dtype"])
+    return x.astype(detail["dtype"])
+
+
+def dequantize_output(x, detail):
+    """Convert an int8/uint8 output tensor back to float."""
+    scale, zero_point = detail["quantization"]
+    if detail["dtype"] in (np.int8, np.uint8) and scale:
+        return (x.astype(np.float32) - zero_point) * scale
+    return x.astype(np.float32)
+
+
+class TFLiteRunner:
+    """
+    A reusable TFLite interpreter that accepts float batches of any size.
+
+    The input tensor is resized (and re-allocated) only when the batch size
+    changes; models with an unbatched 1-D input (the end-to-end waveform
+    model) are run as-is. int8/uint8 input/output tensors are (de)quantized
+    so callers always deal in float32.
+    """
+
+    def __init__(self, model_path=None, model_content=None, num_threads=None):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=str(model_path) if model_path else None,
+                                               model_content=model_content, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_shape = [int(d) for d in self.interpreter.get_input_details()[0]["shape"]]
+        self._batch = self.input_shape[0] if len(self.input_shape) > 1 else None
+
+    def run(self, X):
+        """Run a (batch, ...) float array and return the first output as float32."""
+        X = np.asarray(X, dtype=np.float32)
+        input_detail = self.interpreter.get_input_details()[0]
+        if self._batch is not None and self._batch != len(X):
+            self.interpreter.resize_tensor_input(input_detail["index"], [len(X), *X.shape[1:]])
+            self.interpreter.allocate_tensors()
+            self._batch = len(X)
+            input_detail = self.interpreter.get_input_details()[0]
+        output_detail = self.interpreter.get_output_details()[0]
+        self.interpreter.set_tensor(input_detail["index"], quantize_input(X, input_detail))
+        self.interpreter.invoke()
+        return dequantize_output(self.interpreter.get_tensor(output_detail["index"]), output_detail)
+
+
+def predict_tflite(tflite_model, X, batch_size=256, num_threads=None):
+    """Run a TFLite model over ``X`` in batches and return float outputs."""
+    runner = TFLiteRunner(model_content=tflite_model, num_threads=num_threads)
+    X = np.asarray(X, dtype=np.float32)
+    outputs = [runner.run(X[start:start + batch_size]) for start in range(0, len(X), batch_size)]
+    return np.concatenate(outputs) if outputs else np.zeros((0,))
+
+
+def measure_latency_ms(tflite_model, sample, runs=200, num_threads=None):
+    """Median single-window invoke latency in milliseconds."""
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_detail = interpreter.get_input_details()[0]
+    interpreter.set_tensor(input_detail["index"],
+                           quantize_input(np.asarray(sample, dtype=np.float32)[None, ...], input_detail))
+    interpreter.invoke()  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        interpreter.invoke()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def compare_models(float_model, quant_model, X_test, y_test):
+    """
+    Compare a quantized TFLite model against the float one.
+
+    Returns size, latency and accuracy of both plus the deltas.
+    """
+    report = {}
+    for name, tflite_model in [("float", float_model), ("quantized", quant_model)]:
+        entry = {"size_kb": round(len(tflite_model) / 1024, 1)}
+        if len(X_test):
+            predictions = predict_tflite(tflite_model, X_test).argmax(axis=1)
+            entry["accuracy"] = float(np.mean(predictions == np.asarray(y_test)))
+            entry["latency_ms"] = round(measure_latency_ms(tflite_model, X_test[0]), 4)
+        report[name] = entry
+
+    report["size_ratio"] = round(report["quantized"]["size_kb"] / report["float"]["size_kb"], 3)
+    if len(X_test):
+        report["accuracy_delta"] = report["quantized"]["accuracy"] - report["float"]["accuracy"]
+        report["latency_speedup"] = round(
+            report["float"]["latency_ms"] / max(report["quantized"]["latency_ms"], 1e-6), 2)
+    report["test_samples"] = int(len(X_test))
+    return report
+
+
+def build_end_to_end_module(yamnet_model, head):
+    """
+    Fuse YAMNet and the dense head into one waveform-in graph.
+
+    The graph takes one 15600-sample float32 window (same 1-D input as the
+    app feeds YAMNet today), mean-pools YAMNet's frame embeddings and returns
+    the head's (1, num_classes) probabilities.
+    """
+    import tensorflow as tf
+
+    class WaveformClassifier(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self.yamnet = yamnet_model
+            self.head = head
+
+        @tf.function(input_signature=[tf.TensorSpec([WINDOW_SAMPLES], tf.float32, name="waveform")])
+        def __call__(self, waveform):
+            _, embeddings, _ = self.yamnet(waveform)
+            pooled = tf.reduce_mean(embeddings, axis=0, keepdims=True)
+            return self.head(pooled, training=False)
+
+    return WaveformClassifier()
+
+
+def convert_end_to_end(yamnet_model, head, quantization="dynamic", representative_waveforms=None,
+                       max_samples=200):
+    """
+    Convert the fused waveform -> YAMNet -> head graph to a single TFLite model.
+
+    ``int8`` calibrates on ``representative_waveforms`` (15600-sample windows);
+    ops without int8 kernels (e.g. the STFT front end) stay float.
+    """
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    # Freeze YAMNet's and the head's variables into constants first; Keras 3
+    # variables are otherwise left as uninitialised resource variables
+    module = build_end_to_end_module(yamnet_model, head)
+    frozen = convert_variables_to_constants_v2(module.__call__.get_concrete_function())
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen])
+
+    if quantization == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization == "int8":
+        if representative_waveforms is None or len(representative_waveforms) == 0:
+            raise ValueError("int8 quantization needs representative waveforms")
+        windows = np.asarray(representative_waveforms, dtype=np.float32)[:max_samples]
+
+        def representative_dataset():
+            for window in windows:
+                yield [window]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                                               tf.lite.OpsSet.TFLITE_BUILTINS]
+    elif quantization != "float":
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    return converter.convert()
+
+
+# YAMNet body (MobileNet v1): (kind, stride, filters) per layer; all kernels are 3x3
+YAMNET_LAYERS = [
+    ("conv", 2, 32),
+    ("separable", 1, 64), ("separable", 2, 128), ("separable", 1, 128),
+    ("separable", 2, 256), ("separable", 1, 256), ("separable", 2, 512),
+    ("separable", 1, 512), ("separable", 1, 512), ("separable", 1, 512),
+    ("separable", 1, 512), ("separable", 1, 512), ("separable", 2, 1024),
+    ("separable", 1, 1024),
+]
+YAMNET_BN_EPSILON = 1e-4
+
+
+def _tracked_variables(obj):
+    """Variables reachable from a restored SavedModel object."""
+    import tensorflow as tf
+
+    variables = list(getattr(obj, "variables", None) or [])
+    if variables:
+        return variables
+    seen, stack = set(), [obj]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, tf.Variable):
+            variables.append(node)
+        elif hasattr(node, "_trackable_children"):
+            stack.extend(node._trackable_children().values())
+    return variables
+
+
+def yamnet_weights(yamnet_model):
+    """
+    YAMNet's body weights as ``{"layer1/conv/kernel": array, ...}``, read
+    from the variables of the loaded SavedModel (they keep the Keras layer
+    names of the model garden's ``yamnet.py``).
+    """
+    weights = {}
+    for variable in _tracked_variables(yamnet_model):
+        name = variable.name.split(":")[0]
+        # Keep the name from the first "layerN/" on, whatever scope precedes it
+        parts = name.split("/")
+        starts = [i for i, part in enumerate(parts) if part.startswith("layer")]
+        if starts:
+            weights["/".join(parts[starts[0]:])] = variable.numpy()
+    missing = [name for name in _yamnet_weight_names() if name not in weights]
+    if missing:
+        raise ValueError(f"YAMNet model lacks {len(missing)} body weights, e.g. {missing[:3]}")
+    return weights
+
+
+def _yamnet_weight_names():
+    names = []
+    for i, (kind, _, _) in enumerate(YAMNET_LAYERS, 1):
+        convs = ["conv"] if kind == "conv" else ["depthwise_conv", "pointwise_conv"]
+        for conv in convs:
+            names.append(f"layer{i}/{conv}/{'depthwise_kernel' if conv == 'depthwise_conv' else 'kernel'}")
+            names += [f"layer{i}/{conv}/bn/{v}" for v in ("beta", "moving_mean", "moving_variance")]
+    return names
+
+
+def build_patch_module(yamnet_model):
+    """
+    YAMNet's body as a log-mel-patch-in graph: (batch, 96, 64) log-mel
+    patches (yamnet_frontend.py) in, (batch, 1024) embeddings out.
+
+    The SavedModel only takes waveforms, so its weights are copied into
+    the same layers (3x3 conv / depthwise-separable convs, batch norm with
+    epsilon 1e-4 and no scale, ReLU, global average pool) built from plain
+    TensorFlow ops.
+    """
+    import tensorflow as tf
+
+    weights = yamnet_weights(yamnet_model)
+
+    def batch_norm_relu(net, name):
+        scale = 1.0 / np.sqrt(weights[f"{name}/bn/moving_variance"] + YAMNET_BN_EPSILON)
+        if f"{name}/bn/gamma" in weights:
+            scale = scale * weights[f"{name}/bn/gamma"]
+        shift = weights[f"{name}/bn/beta"] - weights[f"{name}/bn/moving_mean"] * scale
+        return tf.nn.relu(net * scale.astype(np.float32) + shift.astype(np.float32))
+
+    class YamnetPatchBody(tf.Module):
+        @tf.function(input_signature=[tf.TensorSpec([None, PATCH_FRAMES, MEL_BANDS], tf.float32,
+                                                    name="patches")])
+        def __call__(self, patches):
+            net = patches[..., None]
+            for i, (kind, stride, _) in enumerate(YAMNET_LAYERS, 1):
+                strides = [1, stride, stride, 1]
+                if kind == "conv":
+                    net = tf.nn.conv2d(net, weights[f"layer{i}/conv/kernel"], strides, "SAME")
+                    net = batch_norm_relu(net, f"layer{i}/conv")
+                else:
+                    net = tf.nn.depthwise_conv2d(net, weights[f"layer{i}/depthwise_conv/depthwise_kernel"],
+                                                 strides, "SAME")
+                    net = batch_norm_relu(net, f"layer{i}/depthwise_conv")
+                    net = tf.nn.conv2d(net, weights[f"layer{i}/pointwise_conv/kernel"], 1, "SAME")
+                    net = batch_norm_relu(net, f"layer{i}/pointwise_conv")
+            return tf.reduce_mean(net, axis=[1, 2])
+
+    return YamnetPatchBody()
+
+
+def convert_patch_model(yamnet_model, quantization="float"):
+    """Convert YAMNet's log-mel-patch body (``build_patch_module``) to TFLite."""
+    import tensorflow as tf
+
+    module = build_patch_module(yamnet_model)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions(
+        [module.__call__.get_concrete_function()], module)
+    if quantization == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization != "float":
+        raise ValueError(f"Unknown quantization mode for the patch model: {quantization}")
+    return converter.convert()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Packed Columnar Training Manifest for HearAlert
+===============================================
+``training_manifest.json`` holds one indented dict per file, which gets slow
+to write and parse (and large in the app's asset bundle) at hundreds of
+thousands of files. The packed manifest stores the same data column by
+column in one binary file that is memory-mapped on load:
+
+    b"HAMANIF\\x01" | uint64 header size | JSON header | 64-byte aligned columns
+
+The header holds the manifest metadata, the row range of each split (rows
+are stored split by split) and the dtype, shape and offset of each column:
+
+    * ``category``, ``group``, ``transform``: dictionary-encoded - integer
+      codes plus the distinct values as a string heap
+    * ``file``, ``source``: string heaps (uint64 offsets + UTF-8 bytes)
+    * ``duration_ms``, ``sample_rate``: int32
+    * ``sha``, ``parent``: raw 16-byte md5 digests (all zero when absent)
+
+``load_packed`` returns the usual ``{"metadata", "splits"}`` mapping whose
+splits are lazy sequences over the mapped columns, so existing readers work
+unchanged while nothing is decoded until it is used. JSON stays available
+as an export format.
+
+Usage:
+    python packed_manifest.py training_manifest.bin training_manifest.json   # export JSON
+    python packed_manifest.py training_manifest.json training_manifest.bin   # pack a JSON manifest
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+from pathlib import Path
+from collections.abc import Sequence
+
+import numpy as np
+
+MAGIC = b"HAMANIF\x01"
+ALIGN = 64
+SPLITS = ("train", "validation", "test")
+DICT_COLUMNS = ("category", "group", "transform")
+STRING_COLUMNS = ("file", "source")
+INT_COLUMNS = ("duration_ms", "sample_rate")
+DIGEST_COLUMNS = ("sha", "parent")
+
+
+def _heap(strings):
+    """(uint64 offsets, uint8 bytes) for a list of strings."""
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _codes(values, dictionary=()):
+    """Dictionary-encode ``values``; ``dictionary`` fixes the order of known values."""
+    index = {value: code for code, value in enumerate(dictionary)}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    dtype = np.uint16 if len(index) <= np.iinfo(np.uint16).max else np.uint32
+    return np.array(codes, dtype=dtype), list(index)
+
+
+def _digests(values):
+    raw = bytes.fromhex("".join(value or "0" * 32 for value in values))
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(values), 16)
+
+
+def write_packed(manifest, path):
+    """Write ``manifest`` (a JSON-style dict or a loaded packed manifest) to ``path`` atomically."""
+    items, ranges = [], {}
+    for split in SPLITS:
+        start = len(items)
+        items.extend(manifest["splits"].get(split, []))
+        ranges[split] = [start, len(items)]
+
+    columns = {}
+    known = [cat["name"] for cat in manifest["metadata"].get("categories", [])]
+    for name in DICT_COLUMNS:
+        codes, dictionary = _codes([item.get(name) or "" for item in items], known if name == "category" else ())
+        columns[name] = codes
+        columns[f"{name}.dict.offsets"], columns[f"{name}.dict.data"] = _heap(dictionary)
+    for name in STRING_COLUMNS:
+        columns[f"{name}.offsets"], columns[f"{name}.data"] = _heap([item.get(name) or "" for item in items])
+    for name in INT_COLUMNS:
+        columns[name] = np.array([item.get(name, 0) for item in items], dtype=np.int32)
+    for name in DIGEST_COLUMNS:
+        columns[name] = _digests([item.get(name) for item in items])
+
+    specs, offset = {}, 0
+    for name, array in columns.items():
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"metadata": manifest["metadata"], "rows": len(items),
+                         "splits": ranges, "columns": specs}).encode()
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in columns.items():
+            data = np.ascontiguousarray(array).tobytes()
+            f.write(data + b"\0" * (-len(data) % ALIGN))
+    os.replace(tmp_path, path)
+    return path
+
+
+class _Columns:
+    """The memory-mapped columns of one packed manifest file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a packed HearAlert manifest")
+        (size,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._map[start:start + size]))
+        data_start = start + size
+        self.arrays = {}
+        for name, spec in self.header["columns"].items():
+            count = int(np.prod(spec["shape"]))
+            if count:
+                array = np.frombuffer(self._map, dtype=spec["dtype"], count=count,
+                                      offset=data_start + spec["offset"])
+            else:
+                array = np.zeros(0, dtype=spec["dtype"])
+            self.arrays[name] = array.reshape(spec["shape"])
+        self._dictionaries = {}
+
+    def strings(self, name, start=0, stop=None):
+        """Decode rows ``start:stop`` of a string heap."""
+        offsets = self.arrays[f"{name}.offsets"]
+        offsets = offsets[start:(len(offsets) if stop is None else stop + 1)].tolist()
+        blob = self.arrays[f"{name}.data"][offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        return [blob[a - base:b - base].decode() for a, b in zip(offsets, offsets[1:])]
+
+    def dictionary(self, name):
+        if name not in self._dictionaries:
+            self._dictionaries[name] = self.strings(f"{name}.dict")
+        return self._dictionaries[name]
+
+    def items(self, start, stop):
+        """Item dicts for rows ``start:stop``, decoding each column in one pass."""
+        arrays = self.arrays
+        categories, groups, transforms = (self.dictionary(name) for name in DICT_COLUMNS)
+        digests = {name: [d.hex() if any(d) else None for d in map(bytes, arrays[name][start:stop])]
+                   for name in DIGEST_COLUMNS}
+        rows = zip(self.strings("file", start, stop), arrays["category"][start:stop].tolist(),
+                   arrays["duration_ms"][start:stop].tolist(), arrays["sample_rate"][start:stop].tolist(),
+                   arrays["group"][start:stop].tolist(), self.strings("source", start, stop),
+                   digests["sha"], digests["parent"], arrays["transform"][start:stop].tolist())
+        for file, category, duration_ms, sample_rate, group, source, sha, parent, transform in rows:
+            item = {"file": file, "category": categories[category], "duration_ms": duration_ms,
+                    "sample_rate": sample_rate, "group": groups[group], "source": source}
+            if sha:
+                item["sha"] = sha
+            if parent:
+                item["parent"] = parent
+            if transforms[transform]:
+                item["transform"] = transforms[transform]
+            yield item
+
+
+class PackedSplit(Sequence):
+    """One split of a packed manifest: a lazy sequence of item dicts plus columnar accessors."""
+
+    def __init__(self, columns, start, stop):
+        self._columns = columns
+        self.start, self.stop = start, stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("manifest split index out of range")
+        row = self.start + index
+        return next(self._columns.items(row, row + 1))
+
+    def __iter__(self):
+        return self._columns.items(self.start, self.stop)
+
+    def files(self):
+        return self._columns.strings("file", self.start, self.stop)
+
+    def category_codes(self):
+        """Codes into ``categories`` (a memory-mapped view, nothing decoded)."""
+        return self._columns.arrays["category"][self.start:self.stop]
+
+    @property
+    def categories(self):
+        return self._columns.dictionary("category")
+
+    def digests(self, name="sha"):
+        return self._columns.arrays[name][self.start:self.stop]
+
+
+def load_packed(path):
+    """{"metadata", "splits": {split: PackedSplit}} backed by a memory map of ``path``."""
+    columns = _Columns(path)
+    return {
+        "metadata": columns.header["metadata"],
+        "splits": {split: PackedSplit(columns, *columns.header["splits"][split]) for split in SPLITS},
+    }
+
+
+def is_packed(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def to_json_dict(manifest):
+    """A plain JSON-serializable copy of a (packed or JSON) manifest."""
+    return {"metadata": manifest["metadata"],
+            "splits": {split: list(manifest["splits"].get(split, [])) for split in SPLITS}}
+
+
+def export_json(manifest, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(to_json_dict(manifest), f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a training manifest between packed and JSON form")
+    parser.add_argument("source", type=Path, help="packed (.bin) or JSON manifest")
+    parser.add_argument("target", type=Path, help="output; .json exports JSON, anything else is packed")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from dataset_manifest import load_manifest
+
+    args = parse_args(argv)
+    start = time.perf_counter()
+    manifest = load_manifest(args.source)
+    if args.target.suffix == ".json":
+        export_json(manifest, args.target)
+    else:
+        write_packed(manifest, args.target)
+    rows = sum(len(manifest["splits"].get(split, [])) for split in SPLITS)
+    print(f"✓ {args.target}: {rows} items, {args.target.stat().st_size / 1024:.1f} KB "
+          f"(from {args.source.stat().st_size / 1024:.1f} KB) in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
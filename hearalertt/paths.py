@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Shared Directory Configuration for HearAlert
+============================================
+Every script finds its input, intermediate and output directories here
+instead of hard-coding them, so the pipeline runs the same on a laptop, a
+Linux build worker or with its scratch data on a RAM disk.
+
+Directories hang off three roots:
+
+    * ``base``    inputs: raw/, datasets/ (ESC-50, room impulse responses),
+                  models/yamnet (default: the directory holding the scripts)
+    * ``scratch`` intermediate data: augmented/expanded/combined/new/realtime
+                  audio, training_data/, feature_cache/, pipeline state and
+                  logs, and reports/ (training manifest, evaluation, sweep
+                  and cross-validation reports, profiles) that are not
+                  shipped with the app (default: ``base``) - point it at
+                  fast local storage
+    * ``output``  app assets: datasets/ (dataset and training YAML) and
+                  models/ (default: ``base``/mobile_app/assets)
+
+Each is taken, in order of precedence, from the ``HEARALERT_BASE_DIR`` /
+``HEARALERT_SCRATCH_DIR`` / ``HEARALERT_OUTPUT_DIR`` environment variables,
+then from the config file (``HEARALERT_PATHS_CONFIG``, else
+``hearalert_paths.yaml`` next to this file, if present), then the default.
+The config file may also move single directories:
+
+    base: /data/hearalert
+    scratch: /mnt/ramdisk/hearalert
+    dirs:
+      feature_cache: /ssd/hearalert/feature_cache
+
+Relative paths in the config file are relative to the file itself.
+Only pipeline.py (and this script) take ``--base-dir``, ``--scratch-dir``,
+``--output-dir`` and ``--paths-config``; the pipeline exports them to every
+stage. The stage scripts resolve their directories at import time, so
+when run directly they are moved with the environment variables.
+
+Usage:
+    python paths.py                                   # show the resolved directories
+    HEARALERT_SCRATCH_DIR=/dev/shm/hearalert python pipeline.py
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+CODE_DIR = Path(__file__).resolve().parent
+CONFIG_ENV = "HEARALERT_PATHS_CONFIG"
+CONFIG_NAME = "hearalert_paths.yaml"
+ROOT_ENV = {
+    "base": "HEARALERT_BASE_DIR",
+    "scratch": "HEARALERT_SCRATCH_DIR",
+    "output": "HEARALERT_OUTPUT_DIR",
+}
+
+# name: (root, path under the root)
+DIRS = {
+    "raw": ("base", "raw"),
+    "datasets": ("base", "datasets"),
+    "esc50": ("base", "datasets/ESC-50"),
+    "rir": ("base", "datasets/rir"),
+    "yamnet_store": ("base", "models/yamnet"),
+    "processed_dataset": ("scratch", "processed_dataset"),
+    "augmented_audio": ("scratch", "augmented_audio"),
+    "expanded_audio": ("scratch", "expanded_audio"),
+    "combined_audio": ("scratch", "combined_audio"),
+    "new_audio": ("scratch", "new_audio"),
+    "realtime_audio": ("scratch", "realtime_audio"),
+    "training_data": ("scratch", "training_data"),
+    "feature_cache": ("scratch", "feature_cache"),
+    "pipeline_logs": ("scratch", "pipeline_logs"),
+    "reports": ("scratch", "reports"),
+    "app_datasets": ("output", "datasets"),
+    "app_models": ("output", "models"),
+}
+
+
+def _read_config(path):
+    from yaml_io import load_yaml
+
+    config = load_yaml(path) or {}
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: expected a mapping of roots/dirs, got {type(config).__name__}")
+    unknown = set(config.get("dirs") or {}) - set(DIRS)
+    if unknown:
+        raise ValueError(f"{path}: unknown directories {sorted(unknown)} (known: {', '.join(DIRS)})")
+    return config
+
+
+def load_paths(config_path=None, environ=None):
+    """{name: Path} for the three roots and every entry of ``DIRS``."""
+    environ = os.environ if environ is None else environ
+    config_path = config_path or environ.get(CONFIG_ENV)
+    if config_path is None and (CODE_DIR / CONFIG_NAME).exists():
+        config_path = CODE_DIR / CONFIG_NAME
+    config, config_dir = {}, CODE_DIR
+    if config_path:
+        config_path = Path(config_path).expanduser().resolve()
+        config, config_dir = _read_config(config_path), config_path.parent
+
+    def from_config(value):
+        return config_dir / Path(value).expanduser()
+
+    roots = {}
+    for root in ("base", "scratch", "output"):
+        if environ.get(ROOT_ENV[root]):
+            roots[root] = Path(environ[ROOT_ENV[root]]).expanduser()
+        elif config.get(root):
+            roots[root] = from_config(config[root])
+    roots.setdefault("base", CODE_DIR)
+    roots.setdefault("scratch", roots["base"])
+    roots.setdefault("output", roots["base"] / "mobile_app" / "assets")
+
+    overrides = config.get("dirs") or {}
+    paths = dict(roots)
+    for name, (root, rel) in DIRS.items():
+        paths[name] = from_config(overrides[name]) if name in overrides else roots[root] / rel
+    return paths
+
+
+PATHS = load_paths()
+
+
+def configure(base=None, scratch=None, output=None, config_path=None):
+    """
+    Re-resolve ``PATHS`` in place with explicit (CLI) roots; they are also
+    exported to the environment so child processes resolve the same
+    directories. Returns the environment entries that were set.
+    """
+    exported = {}
+    if config_path:
+        exported[CONFIG_ENV] = str(Path(config_path).expanduser().resolve())
+    for root, value in (("base", base), ("scratch", scratch), ("output", output)):
+        if value:
+            exported[ROOT_ENV[root]] = str(Path(value).expanduser().resolve())
+    os.environ.update(exported)
+    PATHS.clear()
+    PATHS.update(load_paths())
+    return exported
+
+
+def add_path_arguments(parser):
+    group = parser.add_argument_group("directories (override environment and config file)")
+    group.add_argument("--base-dir", type=Path, help=f"input root (${ROOT_ENV['base']})")
+    group.add_argument("--scratch-dir", type=Path, help=f"intermediate-data root (${ROOT_ENV['scratch']})")
+    group.add_argument("--output-dir", type=Path, help=f"app asset root (${ROOT_ENV['output']})")
+    group.add_argument("--paths-config", type=Path, help=f"directory config file (${CONFIG_ENV})")
+    return parser
+
+
+def apply_path_arguments(args):
+    return configure(args.base_dir, args.scratch_dir, args.output_dir, args.paths_config)
+
+
+def main(argv=None):
+    parser = add_path_arguments(argparse.ArgumentParser(description="Show the resolved HearAlert directories"))
+    apply_path_arguments(parser.parse_args(argv))
+    for name, path in PATHS.items():
+        print(f"  {name:<18} {path}{'' if path.exists() else '  (missing)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
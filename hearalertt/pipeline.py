@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Dataset and Training Pipeline Runner for HearAlert
+==================================================
+Runs the dataset scripts and training as one dependency graph instead of a
+hand-remembered order. Each stage declares the directories/files it reads
+(``inputs``), writes (``outputs``) and the code it runs (``code``):
+
+    * a stage depends on every earlier stage that writes one of its inputs,
+      and on earlier stages writing the same outputs (so they never race)
+    * its fingerprint hashes the code, the arguments and a listing (path,
+      size, mtime) of every input file; a stage whose fingerprint matches
+      the last successful run and whose outputs exist is skipped
+    * stages whose dependencies are done run concurrently (``--jobs``),
+      each as its own process, with output in pipeline_logs/<stage>.log
+
+Stage paths name a directory from paths.py (optionally followed by a file
+under it), so moving the scratch or output root moves the whole pipeline;
+``--base-dir``/``--scratch-dir``/``--output-dir``/``--paths-config`` are
+passed on to every stage.
+
+Usage:
+    python pipeline.py                       # everything that is out of date
+    python pipeline.py train --dry-run       # what training would need to run
+    python pipeline.py augment --force augment
+    python pipeline.py --jobs 4 --train-args "--augment online --end-to-end"
+    python pipeline.py --scratch-dir /dev/shm/hearalert
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from augment_audio_advanced import SKIP_COPY_ENV
+from paths import PATHS, add_path_arguments, apply_path_arguments
+
+BASE_DIR = Path(__file__).parent
+STATE_NAME = "pipeline_state.json"  # Kept in the scratch root
+
+# Paths are "<paths.py directory>[/<file>]"; order is the tie-break for shared outputs
+STAGES = {
+    "convert_raw": {
+        "script": "convert_raw_to_dataset.py",
+        "inputs": ["raw"],
+        "outputs": ["processed_dataset", "app_datasets/dataset_summary.json"],
+        "code": ["paths.py", "yaml_io.py"],
+    },
+    "augment": {
+        "script": "augment_audio_advanced.py",
+        "inputs": ["esc50", "rir"],
+        "outputs": ["augmented_audio"],
+        "code": ["lineage.py", "embedding_cache.py", "paths.py"],
+    },
+    "expand_esc50": {
+        "script": "expand_audio_dataset.py",
+        "inputs": ["esc50", "raw"],
+        "outputs": ["augmented_audio"],
+        "code": ["paths.py"],
+    },
+    "generate_new": {
+        "script": "generate_new_audio.py",
+        "inputs": [],
+        "outputs": ["new_audio", "combined_audio"],
+        "code": ["paths.py"],
+    },
+    "expand_combined": {
+        "script": "expand_dataset_advanced.py",
+        "inputs": ["combined_audio"],
+        "outputs": ["expanded_audio"],
+        "code": ["lineage.py", "embedding_cache.py", "paths.py"],
+    },
+    "realtime": {
+        "script": "download_realtime_datasets.py",
+        "inputs": ["esc50"],
+        "outputs": ["realtime_audio"],
+        "code": ["augment_audio_advanced.py", "lineage.py", "embedding_cache.py", "paths.py"],
+    },
+    "train": {
+        "script": "train_audio_model.py",
+        "inputs": ["raw", "esc50", "augmented_audio", "realtime_audio", "expanded_audio"],
+        "outputs": ["training_data", "app_models/hearalert_classifier.tflite",
+                    "reports/training_manifest.bin"],
+        "code": ["data_splits.py", "lineage.py", "embedding_cache.py", "feature_augment.py",
+                 "model_export.py", "evaluate_model.py", "yamnet_store.py", "audio_io.py",
+                 "stage_profiler.py", "paths.py", "dataset_manifest.py",
+                 "packed_manifest.py", "yaml_io.py", "yamnet_frontend.py"],
+    },
+}
+
+
+def resolve(entry):
+    """Absolute path of a stage path: a paths.py directory name, optionally with a file under it."""
+    name, _, rest = entry.partition("/")
+    return PATHS[name] / rest if rest else PATHS[name]
+
+
+def _overlaps(a, b):
+    """True when one stage path contains the other (compared after resolving)."""
+    a, b = resolve(a).resolve().parts, resolve(b).resolve().parts
+    return a[:len(b)] == b or b[:len(a)] == a
+
+
+def dependencies(stages=STAGES):
+    """{stage: set of earlier stages it must wait for}."""
+    names = list(stages)
+    deps = {}
+    for i, name in enumerate(names):
+        stage = stages[name]
+        deps[name] = {
+            earlier for earlier in names[:i]
+            if any(_overlaps(out, path) for out in stages[earlier]["outputs"]
+                   for path in stage["inputs"] + stage["outputs"])
+        }
+    return deps
+
+
+def with_upstream(targets, deps):
+    """``targets`` plus everything they transitively depend on."""
+    selected, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(deps[name])
+    return selected
+
+
+def fingerprint(stage, args):
+    """Hash of the stage's code, arguments and input file listing (path, size, mtime)."""
+    digest = hashlib.md5()
+    for name in [stage["script"]] + stage["code"]:
+        digest.update(name.encode())
+        digest.update((BASE_DIR / name).read_bytes())
+    digest.update(json.dumps(args).encode())
+    for entry in stage["inputs"]:
+        root = resolve(entry)
+        if root.is_file():
+            entries = [root]
+        elif root.is_dir():
+            entries = sorted(p for p in root.rglob("*") if p.is_file() and "__pycache__" not in p.parts)
+        else:
+            entries = []
+        digest.update(f"{entry}:{root}:{len(entries)}".encode())
+        for path in entries:
+            st = path.stat()
+            digest.update(f"{path.relative_to(root) if path != root else ''}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def outputs_exist(stage):
+    for entry in stage["outputs"]:
+        path = resolve(entry)
+        if not path.exists() or (path.is_dir() and not any(path.iterdir())):
+            return False
+    return True
+
+
+def load_state():
+    path = PATHS["scratch"] / STATE_NAME
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    path = PATHS["scratch"] / STATE_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_stage(name, stage, args):
+    """Run one stage's script in its own process; returns (exit code, seconds)."""
+    PATHS["pipeline_logs"].mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, **{SKIP_COPY_ENV: "1"})
+    start = time.perf_counter()
+    with open(PATHS["pipeline_logs"] / f"{name}.log", 'w') as log:
+        code = subprocess.run([sys.executable, stage["script"], *args], cwd=BASE_DIR, env=env,
+                              stdout=log, stderr=subprocess.STDOUT).returncode
+    return code, time.perf_counter() - start
+
+
+def run_pipeline(targets=None, force=(), jobs=3, stage_args=None, dry_run=False):
+    """Run ``targets`` (default: all stages) and their upstream stages; returns {stage: status}."""
+    deps = dependencies()
+    selected = with_upstream(targets or list(STAGES), deps)
+    order = [name for name in STAGES if name in selected]
+    stage_args = stage_args or {}
+    state = load_state()
+    status = {}
+
+    def ready(name):
+        return all(status.get(dep) in ("done", "skipped") for dep in deps[name] if dep in selected)
+
+    def blocked(name):
+        return any(status.get(dep) in ("failed", "blocked") for dep in deps[name] if dep in selected)
+
+    # A ready stage's inputs are final (every stage writing them has
+    # finished), so it is hashed once, not on every wake-up while it queues
+    fingerprints = {}
+
+    def up_to_date(name):
+        if name in force:
+            return False
+        stage = STAGES[name]
+        if name not in fingerprints:
+            fingerprints[name] = fingerprint(stage, stage_args.get(name, []))
+        previous = state.get(name, {}).get("fingerprint")
+        return previous == fingerprints[name] and outputs_exist(stage)
+
+    if dry_run:
+        # Without running, only stages whose upstream is current can be judged
+        for name in order:
+            stale_upstream = any(status.get(dep) == "run" for dep in deps[name] if dep in selected)
+            status[name] = "run" if stale_upstream or not up_to_date(name) else "skipped"
+            after = ", ".join(sorted(deps[name] & selected)) or "-"
+            print(f"  {name:<16} {status[name]:<8} after: {after}")
+        return status
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while len(status) < len(order):
+            for name in order:
+                if name in status or name in running.values():
+                    continue
+                if blocked(name):
+                    status[name] = "blocked"
+                    print(f"  ✗ {name}: blocked by a failed dependency")
+                elif ready(name):
+                    if up_to_date(name):
+                        status[name] = "skipped"
+                        print(f"  ✓ {name}: up to date")
+                    elif len(running) < max(1, jobs):
+                        print(f"  ▶ {name}: running {STAGES[name]['script']} (log: {PATHS['pipeline_logs'] / name}.log)")
+                        future = pool.submit(run_stage, name, STAGES[name], stage_args.get(name, []))
+                        running[future] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                code, seconds = future.result()
+                if code == 0:
+                    status[name] = "done"
+                    state[name] = {
+                        # Re-hash: the stage itself may have touched its inputs
+                        "fingerprint": fingerprint(STAGES[name], stage_args.get(name, [])),
+                        "finished": datetime.now().isoformat(),
+                        "wall_sec": round(seconds, 1),
+                    }
+                    save_state(state)
+                    print(f"  ✓ {name}: done in {seconds:.1f}s")
+                else:
+                    status[name] = "failed"
+                    print(f"  ✗ {name}: exit code {code} after {seconds:.1f}s (see {PATHS['pipeline_logs'] / name}.log)")
+    return status
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the HearAlert dataset/training pipeline")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"stages to bring up to date, with their upstream "
+                             f"(default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", nargs="*", metavar="STAGE",
+                        help="re-run these stages (all selected stages if none are named)")
+    parser.add_argument("--jobs", type=int, default=3, help="stages run concurrently")
+    parser.add_argument("--train-args", default="", help="extra arguments for train_audio_model.py")
+    parser.add_argument("--dry-run", action="store_true", help="show the plan without running anything")
+    add_path_arguments(parser)
+    args = parser.parse_args(argv)
+    for name in args.stages + (args.force or []):
+        if name not in STAGES:
+            parser.error(f"unknown stage {name!r} (choose from {', '.join(STAGES)})")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Exported to the environment, so every stage resolves the same directories
+    apply_path_arguments(args)
+    targets = args.stages or list(STAGES)
+    force = set(args.force) if args.force else set()
+    if args.force == []:
+        force = with_upstream(targets, dependencies())
+
+    selected = with_upstream(targets, dependencies())
+    print(f"{'Plan' if args.dry_run else 'Running'}: {', '.join(n for n in STAGES if n in selected)}")
+    start = time.perf_counter()
+    status = run_pipeline(targets, force, args.jobs, {"train": shlex.split(args.train_args)}, args.dry_run)
+    if not args.dry_run:
+        print(f"\nPipeline finished in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{name} {result}" for name, result in status.items()))
+    return 1 if any(result in ("failed", "blocked") for result in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
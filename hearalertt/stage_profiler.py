@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Stage Profiler for HearAlert
+============================
+Records, for each stage of a pipeline run (collect, prepare, embed, fit,
+...): wall time, CPU time (this process plus finished child processes),
+peak RSS while the stage ran, bytes read and files/s. Optionally each
+stage is also run under ``cProfile`` (a ``.prof`` dump plus the top
+functions in the report) and/or ``tracemalloc`` (peak traced memory and
+the top allocation sites).
+
+Stages are opened with ``begin(name)`` and closed with ``end(files=...)``
+(or the ``stage()`` context manager); beginning a stage ends the open one,
+so long linear functions can be instrumented without re-indenting them.
+``write()`` saves the JSON report and compares it with the previous report
+at the same path, so regressions between runs stand out.
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import platform
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+# Stages whose wall time moved by more than this fraction (and at least
+# MIN_CHANGE_SEC) between runs are reported
+REGRESSION_RATIO = 0.2
+MIN_CHANGE_SEC = 1.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def bytes_read():
+    """Bytes this process has read through read() calls so far (Linux), else None."""
+    try:
+        with open("/proc/self/io", 'r') as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_seconds():
+    """User + system CPU time of this process and its reaped children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class _RssSampler(threading.Thread):
+    """Polls the RSS while a stage runs; ru_maxrss only gives the lifetime peak."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb() or 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        rss = current_rss_mb()
+        return max(self.peak, rss or 0.0)
+
+
+class StageProfiler:
+    """Collects per-stage resource usage for one run."""
+
+    def __init__(self, profile=False, trace_memory=False, dump_dir=None, top=15):
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.dump_dir = Path(dump_dir) if dump_dir else None
+        self.top = top
+        self.stages = []
+        self.started = time.time()
+        self._open = None
+
+    def begin(self, name):
+        """Start timing stage ``name`` (ending any stage still open)."""
+        if self._open is not None:
+            self.end()
+        state = {
+            "name": name,
+            "wall": time.perf_counter(),
+            "cpu": cpu_seconds(),
+            "read": bytes_read(),
+            "rss": current_rss_mb(),
+            "sampler": _RssSampler(),
+        }
+        state["sampler"].start()
+        if self.trace_memory:
+            import tracemalloc
+
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        if self.profile:
+            import cProfile
+
+            state["profiler"] = cProfile.Profile()
+            state["profiler"].enable()
+        self._open = state
+
+    def end(self, files=None, **extra):
+        """Close the open stage; ``files`` enables files/s, ``extra`` is stored as-is."""
+        state, self._open = self._open, None
+        if state is None:
+            return None
+        if "profiler" in state:
+            state["profiler"].disable()
+        wall = time.perf_counter() - state["wall"]
+        cpu = cpu_seconds() - state["cpu"]
+        read = bytes_read()
+
+        record = {
+            "stage": state["name"],
+            "wall_sec": round(wall, 3),
+            "cpu_sec": round(cpu, 3),
+            "cpu_utilization": round(cpu / wall, 2) if wall > 0 else None,
+            "peak_rss_mb": round(state["sampler"].stop(), 1),
+            "rss_start_mb": round(state["rss"], 1) if state["rss"] is not None else None,
+            "bytes_read": read - state["read"] if read is not None and state["read"] is not None else None,
+        }
+        if files is not None:
+            record["files"] = int(files)
+            record["files_per_sec"] = round(files / wall, 2) if wall > 0 else None
+        record.update(extra)
+
+        if "profiler" in state:
+            record["cprofile"] = self._dump_profile(state["name"], state["profiler"])
+        if self.trace_memory:
+            record["tracemalloc"] = self._memory_snapshot()
+        self.stages.append(record)
+        print(f"  ⏱ {state['name']}: {wall:.2f}s wall, {cpu:.2f}s CPU, "
+              f"peak RSS {record['peak_rss_mb']:.0f} MB")
+        return record
+
+    @contextmanager
+    def stage(self, name):
+        """``with profiler.stage(name) as counts: counts["files"] = n``"""
+        counts = {}
+        self.begin(name)
+        try:
+            yield counts
+        finally:
+            self.end(**counts)
+
+    def _dump_profile(self, name, profiler):
+        import io
+        import pstats
+
+        summary = {}
+        if self.dump_dir is not None:
+            self.dump_dir.mkdir(parents=True, exist_ok=True)
+            path = self.dump_dir / f"profile_{name}.prof"
+            profiler.dump_stats(str(path))
+            summary["path"] = str(path)
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        summary["top_cumulative"] = [
+            {"function": f"{Path(file).name}:{line}({func})", "calls": calls,
+             "cumulative_sec": round(cumulative, 3)}
+            for (file, line, func), (_, calls, _, cumulative, _) in
+            sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:self.top]
+        ]
+        return summary
+
+    def _memory_snapshot(self):
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:self.top]
+        return {
+            "peak_traced_mb": round(peak / (1024 * 1024), 1),
+            "top_allocations": [{"site": str(stat.traceback[0]), "size_mb": round(stat.size / (1024 * 1024), 2)}
+                                for stat in top],
+        }
+
+    def report(self):
+        if self._open is not None:
+            self.end()
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "command": " ".join(sys.argv),
+            "total_wall_sec": round(sum(s["wall_sec"] for s in self.stages), 3),
+            "process_peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": self.stages,
+        }
+
+    def write(self, path):
+        """Write the report, annotating each stage with the previous run's wall time."""
+        path = Path(path)
+        report = self.report()
+        previous = {}
+        if path.exists():
+            try:
+                with open(path, 'r') as f:
+                    previous = {s["stage"]: s for s in json.load(f).get("stages", [])}
+            except (OSError, ValueError):
+                previous = {}
+
+        for stage in report["stages"]:
+            before = previous.get(stage["stage"])
+            if not before or not before.get("wall_sec"):
+                continue
+            stage["previous_wall_sec"] = before["wall_sec"]
+            change = stage["wall_sec"] / before["wall_sec"] - 1
+            if abs(change) > REGRESSION_RATIO and abs(stage["wall_sec"] - before["wall_sec"]) >= MIN_CHANGE_SEC:
+                print(f"  {'⚠️ slower' if change > 0 else '✓ faster'}: {stage['stage']} "
+                      f"{before['wall_sec']:.2f}s -> {stage['wall_sec']:.2f}s ({change:+.0%})")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
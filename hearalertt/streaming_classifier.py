@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Streaming Classifier for HearAlert
+==================================
+Python reference of the app's sliding-window classifier
+(``audio_classifier_service.dart``): 16 kHz audio is accumulated in a
+ring buffer and every 15600-sample window at 75% overlap (a 3900-sample
+hop) is classified, so offline runs reproduce what the phone sees.
+
+Windows are queued and classified in batches (``--batch``); with batch 1
+each window is scored as soon as it is complete, like the app.
+``--incremental`` follows YAMNet's 0.48 s patch grid instead: log-mel
+frames and patch embeddings are computed once and reused by every window
+they fall in (see ``IncrementalStreamingClassifier``). It needs the
+log-mel-patch YAMNet exported by ``yamnet_store.py --export-patch``.
+
+Backends:
+    * an end-to-end waveform model (``hearalert_end_to_end.tflite``)
+    * YAMNet (local SavedModel store, TF-Hub, or a YAMNet ``.tflite`` with
+      an embedding output; see yamnet_store.py)
+      followed by the embedding head (``hearalert_classifier.tflite``),
+      run as one batched interpreter call per flush
+
+Usage:
+    python streaming_classifier.py recording.wav                 # real time
+    python streaming_classifier.py recording.wav --speed 0       # as fast as possible
+    python yamnet_store.py --export-patch && python streaming_classifier.py recording.wav --incremental
+    arecord -f S16_LE -r 16000 -c 1 | python streaming_classifier.py --stdin
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from audio_io import read_wav, StreamResampler, SAMPLE_RATE, WINDOW_SAMPLES
+from model_export import TFLiteRunner
+from yamnet_frontend import (LogMelFrontend, STFT_HOP, PATCH_FRAMES, PATCH_HOP_FRAMES, MEL_BANDS,
+                             frames_for, samples_for)
+from yamnet_store import load_yamnet, YAMNET_HANDLE, DEFAULT_PATCH_MODEL
+from paths import PATHS
+
+MODEL_DIR = PATHS["app_models"]
+DEFAULT_MODEL = MODEL_DIR / "hearalert_classifier.tflite"
+
+# Same overlap as the app's sliding window
+OVERLAP_RATIO = 0.75
+
+# Audio delivered per callback when replaying (100 ms, like the mic stream)
+CHUNK_SAMPLES = 1600
+
+
+def hop_samples(window=WINDOW_SAMPLES, overlap=OVERLAP_RATIO):
+    """Hop between windows, computed like the app's ``_slideLength``."""
+    return int(window * (1 - overlap))
+
+
+class RingBuffer:
+    """
+    Preallocated float32 ring of samples (or of ``dims``-shaped rows, e.g.
+    log-mel frames).
+
+    Every item is written twice (at ``i`` and ``i + capacity``) so the
+    most recent ``n`` items are always one contiguous slice, read
+    without wrapping or copying.
+    """
+
+    def __init__(self, capacity, dims=()):
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, *dims), dtype=np.float32)
+        self._pos = 0
+        self.total = 0
+
+    def write(self, samples):
+        """Append items, overwriting the oldest ones."""
+        self.total += len(samples)
+        samples = samples[-self.capacity:]
+        while len(samples):
+            n = min(len(samples), self.capacity - self._pos)
+            self._data[self._pos:self._pos + n] = samples[:n]
+            self._data[self._pos + self.capacity:self._pos + self.capacity + n] = samples[:n]
+            self._pos = (self._pos + n) % self.capacity
+            samples = samples[n:]
+
+    def latest(self, n):
+        """View of the ``n`` most recent items (valid until the next write)."""
+        if n > self.capacity:
+            raise ValueError(f"Cannot read {n} items from a {self.capacity}-item ring")
+        start = (self._pos - n) % self.capacity
+        return self._data[start:start + n]
+
+
+class WaveformBackend:
+    """End-to-end TFLite model: one 15600-sample window in, class scores out."""
+
+    def __init__(self, model_path, num_threads=None):
+        self.runner = TFLiteRunner(model_path, num_threads=num_threads)
+
+    def classify(self, windows):
+        # The fused graph has a fixed unbatched [15600] input
+        return np.concatenate([self.runner.run(window) for window in windows])
+
+
+class YamnetEmbedder:
+    """
+    Waveform YAMNet (SavedModel store/TF-Hub or a ``.tflite`` with a 1024-d
+    embedding output).
+
+    The SavedModel takes one unbatched waveform, so a batch of windows is
+    mapped over it with ``tf.vectorized_map`` inside one ``tf.function``:
+    YAMNet's ops then run once on the whole batch instead of once per
+    window. The ``.tflite`` graph has a fixed [15600] input and is still
+    invoked per window.
+    """
+
+    def __init__(self, yamnet=YAMNET_HANDLE, num_threads=None):
+        if str(yamnet).endswith(".tflite"):
+            import tensorflow as tf
+
+            self._interpreter = tf.lite.Interpreter(model_path=str(yamnet), num_threads=num_threads)
+            self._interpreter.allocate_tensors()
+            outputs = self._interpreter.get_output_details()
+            matches = [d for d in outputs if d["shape"][-1] == 1024]
+            if not matches:
+                raise ValueError(f"{yamnet} has no 1024-d embedding output")
+            self._embedding_index = matches[0]["index"]
+            self._input_index = self._interpreter.get_input_details()[0]["index"]
+            self._yamnet = None
+        else:
+            self._yamnet = load_yamnet(yamnet)
+            self._embed_batch = self._batched(self._yamnet)
+            # Trace now, so the first windows do not pay for it in latency
+            self._embed_batch(np.zeros((1, WINDOW_SAMPLES), dtype=np.float32))
+
+    @staticmethod
+    def _batched(yamnet):
+        import tensorflow as tf
+
+        @tf.function(input_signature=[tf.TensorSpec([None, None], tf.float32)])
+        def embed_batch(windows):
+            return tf.vectorized_map(lambda window: tf.reduce_mean(yamnet(window)[1], axis=0), windows)
+
+        return embed_batch
+
+    def embed(self, windows):
+        """Mean YAMNet embedding of each window, as an (n, 1024) array."""
+        windows = np.asarray(windows, dtype=np.float32)
+        if self._yamnet is not None:
+            return self._embed_batch(windows).numpy()
+        embeddings = np.empty((len(windows), 1024), dtype=np.float32)
+        for i, window in enumerate(windows):
+            self._interpreter.set_tensor(self._input_index, window)
+            self._interpreter.invoke()
+            frames = self._interpreter.get_tensor(self._embedding_index)
+            embeddings[i] = frames.reshape(-1, 1024).mean(axis=0)
+        return embeddings
+
+
+class PatchEmbedder:
+    """
+    YAMNet body taking log-mel patches: a TFLite model with a (96, 64) or
+    (batch, 96, 64) input and a 1024-d embedding output, as exported by
+    ``python yamnet_store.py --export-patch``.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.runner = TFLiteRunner(model_path, num_threads=num_threads)
+        if self.runner.input_shape[-2:] != [PATCH_FRAMES, MEL_BANDS]:
+            raise ValueError(f"{model_path} does not take ({PATCH_FRAMES}, {MEL_BANDS}) log-mel patches")
+
+    def embed(self, patches):
+        """(n, 96, 64) log-mel patches -> (n, 1024) embeddings."""
+        if len(self.runner.input_shape) == 2:
+            return np.concatenate([self.runner.run(patch).reshape(1, -1) for patch in patches])
+        return self.runner.run(patches).reshape(len(patches), -1)
+
+
+class YamnetHeadBackend:
+    """YAMNet embeddings followed by the embedding-input classifier head."""
+
+    def __init__(self, head_path, yamnet=YAMNET_HANDLE, num_threads=None):
+        self.head = TFLiteRunner(head_path, num_threads=num_threads)
+        self.embedder = YamnetEmbedder(yamnet, num_threads)
+
+    def classify(self, windows):
+        return self.head.run(self.embedder.embed(windows))
+
+
+def load_backend(model_path, yamnet=YAMNET_HANDLE, num_threads=None):
+    """Pick the backend from the model's input: waveform or 1024-d embedding."""
+    runner = TFLiteRunner(model_path, num_threads=num_threads)
+    if int(np.prod(runner.input_shape)) == WINDOW_SAMPLES:
+        return WaveformBackend(model_path, num_threads)
+    return YamnetHeadBackend(model_path, yamnet, num_threads)
+
+
+def load_labels(model_path, labels_path=None):
+    """Read class labels, by default ``hearalert_labels.txt`` next to the model."""
+    labels_path = Path(labels_path) if labels_path else Path(model_path).parent / "hearalert_labels.txt"
+    if not labels_path.exists():
+        return None
+    with open(labels_path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class StreamingClassifier:
+    """
+    Sliding-window classifier over a live sample stream.
+
+    ``feed()`` accepts audio in arbitrary chunk sizes and returns the
+    results of any windows classified as a consequence. A window is
+    emitted at every hop once the first full window has been buffered;
+    windows are queued in a preallocated batch and classified when
+    ``batch_size`` are pending (or on ``flush()``).
+    """
+
+    def __init__(self, backend, labels=None, window=WINDOW_SAMPLES, overlap=OVERLAP_RATIO,
+                 batch_size=1):
+        self.backend = backend
+        self.labels = labels
+        self.window = window
+        self.hop = hop_samples(window, overlap)
+        self.batch_size = batch_size
+        self.ring = RingBuffer(window)
+        self._next_end = window
+        self._batch = np.zeros((batch_size, window), dtype=np.float32)
+        self._batch_ends = np.zeros(batch_size, dtype=np.int64)
+        self._batch_ready = np.zeros(batch_size)
+        self._pending = 0
+        self.latencies_ms = []
+
+    def _queue(self, slot):
+        """Copy the window that just completed into batch slot ``slot``."""
+        self._batch[slot] = self.ring.latest(self.window)
+
+    def _score(self, n):
+        """Class scores for the first ``n`` queued windows."""
+        return self.backend.classify(self._batch[:n])
+
+    def feed(self, samples):
+        """Add samples to the stream; returns a list of window results."""
+        samples = np.asarray(samples, dtype=np.float32)
+        arrival = time.perf_counter()
+        results = []
+        while len(samples):
+            take = min(len(samples), self._next_end - self.ring.total)
+            self.ring.write(samples[:take])
+            samples = samples[take:]
+            if self.ring.total == self._next_end:
+                self._queue(self._pending)
+                self._batch_ends[self._pending] = self._next_end
+                self._batch_ready[self._pending] = arrival
+                self._pending += 1
+                self._next_end += self.hop
+                if self._pending == self.batch_size:
+                    results.extend(self.flush())
+        return results
+
+    def flush(self):
+        """Classify any queued windows."""
+        if not self._pending:
+            return []
+        n = self._pending
+        scores = self._score(n)
+        done = time.perf_counter()
+        self._pending = 0
+
+        results = []
+        for i in range(n):
+            top = int(np.argmax(scores[i]))
+            latency_ms = (done - self._batch_ready[i]) * 1000
+            self.latencies_ms.append(latency_ms)
+            end = int(self._batch_ends[i])
+            results.append({
+                "start_sec": round((end - self.window) / SAMPLE_RATE, 4),
+                "end_sec": round(end / SAMPLE_RATE, 4),
+                "label": self.labels[top] if self.labels and top < len(self.labels) else str(top),
+                "score": float(scores[i][top]),
+                "scores": scores[i],
+                "latency_ms": latency_ms,
+            })
+        return results
+
+
+class IncrementalStreamingClassifier(StreamingClassifier):
+    """
+    Streaming classifier that reuses work across overlapping windows.
+
+    Windows follow YAMNet's own patch grid: a 96-frame patch every 48
+    frames (7680 samples, 0.48 s), so the hop is fixed at 7680 samples and
+    each hop completes exactly one new patch. What is reused:
+
+        * log-mel frames: kept in a frame ring, each hop computes only its
+          48 new frames;
+        * patch embeddings: each patch goes through the YAMNet CNN once
+          and is kept in an embedding ring.
+
+    A window scores the mean embedding of its last ``context_patches``
+    patches, which is what YAMNet returns for those samples (it pools the
+    same 0.48 s grid, as in training), so one CNN pass per hop serves a
+    window of any length. With one patch of context the saving over the
+    plain classifier is the frontend reuse and the coarser hop; the CNN
+    still runs once per window.
+    """
+
+    def __init__(self, embedder, head, labels=None, batch_size=1, context_patches=1):
+        window = samples_for(PATCH_FRAMES + (context_patches - 1) * PATCH_HOP_FRAMES)
+        super().__init__(None, labels, window, 0.0, batch_size)
+        self.embedder = embedder
+        self.head = head
+        self.hop = PATCH_HOP_FRAMES * STFT_HOP
+        self.context_patches = context_patches
+
+        self.frontend = LogMelFrontend()
+        self.frames = RingBuffer(frames_for(window), (MEL_BANDS,))
+        self.embeddings = RingBuffer(context_patches, (1024,))
+        # The first window brings all its patches, later ones one each
+        self._patches = np.zeros((batch_size + context_patches - 1, PATCH_FRAMES, MEL_BANDS), dtype=np.float32)
+        self._patch_counts = np.zeros(batch_size, dtype=np.int64)
+        self._queued_patches = 0
+        self._pooled = np.zeros((batch_size, 1024), dtype=np.float32)
+        self.frames_computed = 0
+        self.patches_embedded = 0
+
+    def _queue(self, slot):
+        """Compute the frames completed since the last window and queue their new patches."""
+        count = frames_for(self.ring.total) - self.frames.total
+        frames = self.frontend.frames(self.ring.latest(samples_for(count)))
+        self.frames.write(frames)
+        self.frames_computed += len(frames)
+
+        done = self._queued_patches + self.patches_embedded
+        total = 1 + (self.frames.total - PATCH_FRAMES) // PATCH_HOP_FRAMES
+        for patch in range(done, total):
+            offset = self.frames.total - patch * PATCH_HOP_FRAMES
+            self._patches[self._queued_patches] = self.frames.latest(offset)[:PATCH_FRAMES]
+            self._queued_patches += 1
+        self._patch_counts[slot] = total - done
+
+    def _score(self, n):
+        """Embed the queued patches, pool each window's context and score the head in one call."""
+        embeddings = self.embedder.embed(self._patches[:self._queued_patches])
+        self.patches_embedded += self._queued_patches
+        self._queued_patches = 0
+        start = 0
+        for i in range(n):
+            self.embeddings.write(embeddings[start:start + self._patch_counts[i]])
+            start += self._patch_counts[i]
+            self._pooled[i] = self.embeddings.latest(self.context_patches).mean(axis=0)
+        return self.head.run(self._pooled[:n])
+
+
+def iter_wav_chunks(path, chunk=CHUNK_SAMPLES):
+    """Yield a WAV file as 16 kHz chunks."""
+    samples = read_wav(path)
+    for start in range(0, len(samples), chunk):
+        yield samples[start:start + chunk]
+
+
+def iter_stdin_chunks(chunk=CHUNK_SAMPLES, sample_rate=SAMPLE_RATE):
+    """Yield raw signed 16-bit little-endian mono PCM from stdin as 16 kHz chunks."""
+    read_size = int(chunk * sample_rate / SAMPLE_RATE) * 2
+    resample = StreamResampler(sample_rate)
+    while True:
+        data = sys.stdin.buffer.read(read_size)
+        if len(data) < 2:
+            break
+        samples = np.frombuffer(data[:len(data) // 2 * 2], dtype='<i2').astype(np.float32) / 32768
+        yield resample(samples)
+    yield resample(np.zeros(0, dtype=np.float32), last=True)
+
+
+def replay(engine, chunks, speed=1.0, on_result=None):
+    """
+    Feed chunks through ``engine``, paced at ``speed`` x real time
+    (0 = as fast as possible). Returns a stats dict.
+    """
+    audio_samples = 0
+    windows = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    for chunk in chunks:
+        audio_samples += len(chunk)
+        if speed > 0:
+            # A chunk is only "captured" once its last sample has been recorded
+            due = wall_start + audio_samples / SAMPLE_RATE / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        for result in engine.feed(chunk):
+            windows += 1
+            if on_result:
+                on_result(result)
+    for result in engine.flush():
+        windows += 1
+        if on_result:
+            on_result(result)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    audio_sec = audio_samples / SAMPLE_RATE
+    latencies = np.array(engine.latencies_ms)
+    stats = {
+        "audio_sec": round(audio_sec, 3),
+        "windows": windows,
+        "hop_samples": engine.hop,
+        "batch_size": engine.batch_size,
+        "wall_sec": round(wall, 3),
+        "realtime_factor": round(audio_sec / wall, 2) if wall else None,
+        "cpu_sec": round(cpu, 3),
+        "cpu_per_audio_sec": round(cpu / audio_sec, 4) if audio_sec else None,
+        # None when no window was classified (empty or sub-window audio)
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+        "latency_max_ms": round(float(latencies.max()), 3) if len(latencies) else None,
+    }
+    if isinstance(engine, IncrementalStreamingClassifier):
+        stats["frames_computed"] = engine.frames_computed
+        stats["frames_per_window"] = round(engine.frames_computed / max(windows, 1), 2)
+        stats["patches_embedded"] = engine.patches_embedded
+    return stats
+
+
+def describe(stats):
+    """One-line summary of ``replay`` stats; values that are None read "n/a"."""
+    def fmt(key, spec):
+        return "n/a" if stats.get(key) is None else format(stats[key], spec)
+
+    return (f"{stats['windows']} windows, {fmt('realtime_factor', '')}x real time, "
+            f"CPU {fmt('cpu_per_audio_sec', '.3f')} s per audio second, "
+            f"latency p50 {fmt('latency_p50_ms', '.1f')} ms / p95 {fmt('latency_p95_ms', '.1f')} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay audio through the HearAlert streaming classifier")
+    parser.add_argument("inputs", nargs="*", type=Path, help="WAV files to replay")
+    parser.add_argument("--stdin", action="store_true",
+                        help="read raw 16-bit mono PCM from stdin instead of WAV files")
+    parser.add_argument("--stdin-rate", type=int, default=SAMPLE_RATE, help="sample rate of stdin PCM")
+    parser.add_argument("--model", type=Path, default=DEFAULT_MODEL,
+                        help="embedding head or end-to-end waveform TFLite model")
+    parser.add_argument("--labels", type=Path, help="labels file (default: next to the model)")
+    parser.add_argument("--yamnet", default=YAMNET_HANDLE,
+                        help="YAMNet TF-Hub handle/path or YAMNet .tflite (embedding heads only)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="classify on YAMNet's 0.48 s patch grid, reusing log-mel frames and "
+                             "patch embeddings across windows")
+    parser.add_argument("--patch-model", type=Path, default=DEFAULT_PATCH_MODEL,
+                        help="YAMNet .tflite taking (96, 64) log-mel patches (incremental mode; "
+                             "export with yamnet_store.py --export-patch)")
+    parser.add_argument("--context-patches", type=int, default=1,
+                        help="patch embeddings pooled per window in incremental mode")
+    parser.add_argument("--overlap", type=float, default=OVERLAP_RATIO,
+                        help="window overlap ratio (incremental mode always hops 0.48 s)")
+    parser.add_argument("--batch", type=int, default=1, help="windows per interpreter call")
+    parser.add_argument("--threads", type=int, help="interpreter threads")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed as a multiple of real time (0 = unthrottled)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="score needed to print a detection")
+    parser.add_argument("--output", type=Path, help="write per-window results and stats as JSON")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.stdin:
+        parser.error("give WAV files or --stdin")
+    if args.context_patches < 1:
+        parser.error("--context-patches must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.incremental:
+        if not args.patch_model.exists():
+            raise SystemExit(f"--incremental needs the log-mel-patch YAMNet ({args.patch_model} not found); "
+                             "export it with: python yamnet_store.py --export-patch")
+        embedder = PatchEmbedder(args.patch_model, args.threads)
+        head = TFLiteRunner(args.model, num_threads=args.threads)
+        if int(np.prod(head.input_shape)) == WINDOW_SAMPLES:
+            raise SystemExit("--incremental needs the embedding head, not the fused waveform model")
+    else:
+        backend = load_backend(args.model, args.yamnet, args.threads)
+    labels = load_labels(args.model, args.labels)
+
+    report = {"model": str(args.model), "sources": []}
+    sources = [("stdin", iter_stdin_chunks(sample_rate=args.stdin_rate))] if args.stdin else \
+        [(str(path), iter_wav_chunks(path)) for path in args.inputs]
+
+    for name, chunks in sources:
+        if args.incremental:
+            engine = IncrementalStreamingClassifier(embedder, head, labels, batch_size=args.batch,
+                                                    context_patches=args.context_patches)
+        else:
+            engine = StreamingClassifier(backend, labels, overlap=args.overlap, batch_size=args.batch)
+        windows = []
+
+        def on_result(result):
+            windows.append({k: v for k, v in result.items() if k != "scores"})
+            if result["score"] >= args.threshold:
+                print(f"  [{result['end_sec']:8.2f}s] {result['label']:<20} "
+                      f"{result['score']:.2f}  ({result['latency_ms']:.1f} ms)", file=sys.stderr)
+
+        print(f"▶ {name}", file=sys.stderr)
+        stats = replay(engine, chunks, args.speed, on_result)
+        print(f"  {describe(stats)}", file=sys.stderr)
+        report["sources"].append({"source": name, "stats": stats, "windows": windows})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
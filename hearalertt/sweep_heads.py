@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Classifier Head Hyperparameter Sweep for HearAlert
+==================================================
+Trains many small classifier-head configurations on the same YAMNet
+embeddings and ranks them by validation accuracy and training time.
+
+Embeddings for the manifest's train/validation splits are loaded once
+(from the embedding cache, embedding only misses) and placed in shared
+memory; a spawn-based process pool then trains one configuration per task,
+each worker attaching to the shared arrays instead of copying them.
+
+Usage:
+    python sweep_heads.py
+    python sweep_heads.py --hidden 512,256,128 256,128 128 --lr 0.001 0.0003 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import multiprocessing as mp
+from pathlib import Path
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from paths import PATHS
+from dataset_manifest import load_manifest, default_manifest_path
+
+REPORTS_DIR = PATHS["reports"]
+LEADERBOARD_NAME = "sweep_leaderboard.json"
+
+# Arrays attached from shared memory in each worker
+_SHARED = {}
+
+
+def share_arrays(arrays):
+    """Copy arrays into new shared-memory blocks; returns (blocks, specs)."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _init_worker(specs, threads):
+    """Attach to the shared arrays and limit TensorFlow's thread pools."""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _SHARED[name] = (block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+
+
+def train_config(config):
+    """Worker: train one head configuration and report its best validation accuracy."""
+    from train_audio_model import fit_head
+
+    X_train, y_train = _SHARED["X_train"][1], _SHARED["y_train"][1]
+    X_val, y_val = _SHARED["X_val"][1], _SHARED["y_val"][1]
+
+    model, history, train_sec = fit_head(config, X_train, y_train, X_val, y_val)
+
+    val_accuracy = history.history['val_accuracy']
+    best = int(np.argmax(val_accuracy))
+    return {
+        "hidden_units": list(config["hidden_units"]),
+        "dropout": list(config["dropout"]),
+        "learning_rate": config["learning_rate"],
+        "batch_size": config["batch_size"],
+        "val_accuracy": round(float(val_accuracy[best]), 4),
+        "train_accuracy": round(float(history.history['accuracy'][best]), 4),
+        "best_epoch": best + 1,
+        "epochs_run": len(val_accuracy),
+        "train_sec": round(train_sec, 2),
+        "params": int(model.count_params()),
+    }
+
+
+def parse_floats(text):
+    return tuple(float(v) for v in text.split(","))
+
+
+def block_dropout(dropout, hidden_units):
+    """One dropout rate per hidden block; a single rate applies to every block."""
+    if len(dropout) == 1:
+        return tuple(dropout) * len(hidden_units)
+    if len(dropout) != len(hidden_units):
+        raise ValueError(f"{len(dropout)} dropout rates {tuple(dropout)} for {len(hidden_units)} "
+                         f"hidden layers {tuple(hidden_units)}; give one rate per layer or a single rate")
+    return tuple(dropout)
+
+
+def check_dropouts(hidden, dropouts):
+    """Reject per-block dropout lists that fit none of the hidden configs."""
+    for dropout in dropouts:
+        if len(dropout) > 1 and not any(len(units) == len(dropout) for units in hidden):
+            raise ValueError(f"{len(dropout)} dropout rates {tuple(dropout)} match no hidden config "
+                             f"({', '.join(str(tuple(units)) for units in hidden)})")
+
+
+def build_grid(hidden, dropouts, learning_rates, batch_sizes, num_classes, epochs, patience, seed=0):
+    """
+    Cartesian product of the sweep options as worker configs. A per-block
+    dropout list is only paired with hidden configs of the same depth; a
+    single rate goes with every config.
+    """
+    check_dropouts(hidden, dropouts)
+    grid = []
+    for units, dropout, lr, batch_size in itertools.product(hidden, dropouts, learning_rates, batch_sizes):
+        if len(dropout) not in (1, len(units)):
+            continue
+        grid.append({
+            "hidden_units": units,
+            "dropout": block_dropout(dropout, units),
+            "learning_rate": lr,
+            "batch_size": batch_size,
+            "num_classes": num_classes,
+            "epochs": epochs,
+            "patience": patience,
+            "seed": seed,
+        })
+    return grid
+
+
+def run_sweep(X_train, y_train, X_val, y_val, grid, workers=None):
+    """Train every config in ``grid`` in a process pool; returns the ranked leaderboard."""
+    workers = workers or max(1, min(len(grid), (os.cpu_count() or 2) // 2))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    blocks, specs = share_arrays({
+        "X_train": np.asarray(X_train, dtype=np.float32), "y_train": np.asarray(y_train, dtype=np.int64),
+        "X_val": np.asarray(X_val, dtype=np.float32), "y_val": np.asarray(y_val, dtype=np.int64),
+    })
+    shared_mb = sum(block.size for block in blocks) / (1024 * 1024)
+    print(f"🔬 Sweeping {len(grid)} configs on {workers} workers x {threads} threads "
+          f"({shared_mb:.1f} MB shared embeddings)")
+
+    results = []
+    try:
+        # TensorFlow is not fork-safe, so workers are spawned
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(specs, threads)) as pool:
+            futures = [pool.submit(train_config, config) for config in grid]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"  [{len(results)}/{len(grid)}] {result['hidden_units']} lr={result['learning_rate']} "
+                      f"val_acc={result['val_accuracy']:.2%} ({result['train_sec']:.1f}s)")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results.sort(key=lambda r: (-r["val_accuracy"], r["train_sec"]))
+    for rank, result in enumerate(results, 1):
+        result["rank"] = rank
+    return results
+
+
+def print_leaderboard(results, top=20):
+    print("\n" + "=" * 78)
+    print("🏆 SWEEP LEADERBOARD")
+    print("=" * 78)
+    print(f"{'#':>3} {'hidden':<16} {'dropout':<16} {'lr':>8} {'batch':>5} {'val_acc':>8} {'epoch':>5} {'time':>7}")
+    for result in results[:top]:
+        print(f"{result['rank']:>3} {','.join(map(str, result['hidden_units'])):<16} "
+              f"{','.join(map(str, result['dropout'])):<16} {result['learning_rate']:>8.5f} "
+              f"{result['batch_size']:>5} {result['val_accuracy']:>8.2%} {result['best_epoch']:>5} "
+              f"{result['train_sec']:>6.1f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep classifier-head hyperparameters on cached embeddings")
+    parser.add_argument("--manifest", type=Path, default=default_manifest_path(REPORTS_DIR))
+    parser.add_argument("--embedding-mode", choices=["mean", "frames"], default="mean")
+    parser.add_argument("--hidden", nargs="+", default=["512,256,128", "256,128", "512", "128"],
+                        help="hidden layer sizes per config, comma separated")
+    parser.add_argument("--dropout", nargs="+", default=["0.4,0.3,0.2", "0.2"],
+                        help="dropout per block (comma separated; used with configs of that depth) "
+                             "or one rate for all blocks")
+    parser.add_argument("--lr", nargs="+", type=float, default=[0.001, 0.0003])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[32])
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--patience", type=int, default=10, help="early-stopping patience")
+    parser.add_argument("--workers", type=int, help="parallel training processes")
+    parser.add_argument("--output", type=Path, default=REPORTS_DIR / LEADERBOARD_NAME)
+    args = parser.parse_args(argv)
+    try:
+        check_dropouts([tuple(int(u) for u in h.split(",")) for h in args.hidden],
+                       [parse_floats(d) for d in args.dropout])
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    from evaluate_model import load_split_embeddings
+
+    args = parse_args(argv)
+    manifest = load_manifest(args.manifest)
+
+    print("Loading embeddings (once)...")
+    X_train, y_train, categories = load_split_embeddings(manifest, "train", args.embedding_mode)
+    X_val, y_val, _ = load_split_embeddings(manifest, "validation", args.embedding_mode)
+
+    hidden = [tuple(int(u) for u in h.split(",")) for h in args.hidden]
+    dropouts = [parse_floats(d) for d in args.dropout]
+    grid = build_grid(hidden, dropouts, args.lr, args.batch_size, len(categories),
+                      args.epochs, args.patience)
+
+    start = time.perf_counter()
+    results = run_sweep(X_train, y_train, X_val, y_val, grid, args.workers)
+    elapsed = time.perf_counter() - start
+    print_leaderboard(results)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({"configs": len(grid), "wall_sec": round(elapsed, 1),
+                   "train_samples": int(len(X_train)), "val_samples": int(len(X_val)),
+                   "leaderboard": results}, f, indent=2)
+    print(f"\n✓ Leaderboard: {args.output} ({elapsed:.1f}s total)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
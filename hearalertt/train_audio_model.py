@@ -5,6 +5,11 @@ HearAlert Audio Dataset Training Pipeline
 Downloads, processes, and trains model on audio datasets for real-time classification.
 
 Target: 1000+ WAV audio files with YAML configuration for training.
+
+Directories come from paths.py: sources under HEARALERT_BASE_DIR and
+HEARALERT_SCRATCH_DIR, training_data/, feature_cache/ and reports/ (the
+manifest and evaluation report) under the scratch root, and the YAML and
+models under HEARALERT_OUTPUT_DIR (or hearalert_paths.yaml for all three).
 """
 
 import os
@@ -12,23 +17,46 @@ import sys
 import shutil
 import wave
 import json
-import yaml
+import time
+import argparse
 import subprocess
 from pathlib import Path
 from datetime import datetime
 import hashlib
 import random
+import importlib
+
+from paths import PATHS
+from yaml_io import write_yaml
 
 # Paths
 BASE_DIR = Path(__file__).parent
-RAW_DIR = BASE_DIR / "raw"
-DATASETS_DIR = BASE_DIR / "datasets"
-PROCESSED_DIR = BASE_DIR / "training_data"
-OUTPUT_DIR = BASE_DIR / "mobile_app" / "assets" / "datasets"
-MODEL_OUTPUT = BASE_DIR / "mobile_app" / "assets" / "models"
-AUGMENTED_DIR = BASE_DIR / "augmented_audio"  # Augmented audio directory
-EXPANDED_DIR = BASE_DIR / "expanded_audio"  # Expanded audio directory
-NEW_AUDIO_DIR = BASE_DIR / "realtime_audio"  # New generated audio directory
+RAW_DIR = PATHS["raw"]
+DATASETS_DIR = PATHS["datasets"]
+PROCESSED_DIR = PATHS["training_data"]
+OUTPUT_DIR = PATHS["app_datasets"]
+MODEL_OUTPUT = PATHS["app_models"]
+AUGMENTED_DIR = PATHS["augmented_audio"]  # Augmented audio directory
+EXPANDED_DIR = PATHS["expanded_audio"]  # Expanded audio directory
+NEW_AUDIO_DIR = PATHS["realtime_audio"]  # New generated audio directory
+FEATURE_CACHE_DIR = PATHS["feature_cache"]  # Cached YAMNet embeddings
+REPORTS_DIR = PATHS["reports"]  # Manifest, evaluation report, profiles (not bundled)
+# Manifests older versions wrote to OUTPUT_DIR, and the dataset name they carry
+LEGACY_MANIFEST_NAMES = ("training_manifest.bin", "training_manifest.json")
+MANIFEST_DATASET_NAME = "hearalert_training_dataset"
+PROFILE_NAME = "training_profile.json"  # Stage timings, written next to training_config.yaml
+
+# "frames" mode: YAMNet patches (0.975 s every 0.48 s) quieter than the floor,
+# or this far below the clip's loudest patch, are silence padding or quiet
+# tails that do not contain the labelled sound and are not used as examples
+FRAME_FLOOR_DB = -60.0
+FRAME_RELATIVE_DB = -30.0
+PATCH_HOP_SAMPLES = 7680
+PATCH_SAMPLES = 15600
+
+# Embedding cache namespace per mode ("frames" rows are already filtered);
+# embedding_namespace() adds the YAMNet model version
+EMBEDDING_NAMESPACES = {"mean": "yamnet_mean", "frames": "yamnet_frames_active"}
 
 # Training categories for HearAlert - Deaf Accessibility Focus
 TRAINING_CATEGORIES = {
@@ -267,6 +295,42 @@ ESC50_CLASSES = {
     "train": 45, "church_bells": 46, "airplane": 47, "fireworks": 48, "hand_saw": 49
 }
 
+# Heavy dependencies, imported only by the stages that need them
+# (module -> pip package); collection, splitting and YAML never load them
+HEAVY_MODULES = {
+    "tensorflow": "tensorflow",
+    "tensorflow_hub": "tensorflow-hub",
+    "librosa": "librosa",
+    "sklearn": "scikit-learn",
+}
+IMPORT_BUDGET_SEC = 1.0
+
+
+def require(module):
+    """Import a heavy dependency on demand, failing with an install hint."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        package = HEAVY_MODULES.get(module.split(".")[0], module)
+        raise ImportError(f"{module} is required for this step: pip install {package}") from e
+
+
+def check_import_budget(budget_sec=IMPORT_BUDGET_SEC):
+    """
+    Import this module in a fresh interpreter and check that it stays light:
+    no heavy dependency may be loaded and the import must fit the budget.
+    Returns (ok, seconds, heavy modules loaded).
+    """
+    probe = (
+        "import sys, time, json; start = time.perf_counter(); import train_audio_model; "
+        "elapsed = time.perf_counter() - start; "
+        f"print(json.dumps([elapsed, sorted(m for m in {sorted(HEAVY_MODULES)!r} if m in sys.modules)]))"
+    )
+    output = subprocess.run([sys.executable, "-c", probe], cwd=BASE_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    elapsed, loaded = json.loads(output.strip().splitlines()[-1])
+    return elapsed <= budget_sec and not loaded, elapsed, loaded
+
 
 def get_audio_info(wav_path):
     """Extract audio information from WAV file."""
@@ -443,14 +507,27 @@ def collect_expanded_audio():
     return files_by_category
 
 
-def prepare_training_data(all_files):
-    """Prepare training data with train/val/test splits."""
+def prepare_training_data(all_files, seed=0):
+    """
+    Prepare training data with train/val/test splits.
+    
+    Splits are made per source recording: a recording and every copy or
+    augmentation derived from it (see data_splits.assign_groups) land in
+    the same split, so validation and test never contain siblings of
+    training files. The split is deterministic for a given ``seed``.
+    
+    Each item records its content hash, source file and lineage, and the
+    manifest gets a Merkle hash over all items (see dataset_manifest.py).
+    """
+    from data_splits import assign_groups, group_split
+    from dataset_manifest import stamp, MANIFEST_VERSION
+    
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
     
     training_manifest = {
         "metadata": {
-            "name": "hearalert_training_dataset",
-            "version": 1,
+            "name": MANIFEST_DATASET_NAME,
+            "version": MANIFEST_VERSION,
             "created": datetime.now().isoformat(),
             "total_files": 0,
             "categories": []
@@ -462,6 +539,17 @@ def prepare_training_data(all_files):
         }
     }
     
+    # Group and split all categories together: the same ESC-50 clip can
+    # feed several categories (e.g. car_horn and traffic)
+    entries = [(category, file_info) for category, files in all_files.items() for file_info in files]
+    labels = [category for category, _ in entries]
+    groups, records = assign_groups([file_info["path"] for _, file_info in entries], return_records=True)
+    split_names = group_split(labels, groups, seed)
+    print(f"  {len(entries)} files from {len(set(groups))} source recordings")
+    
+    assigned = {id(file_info): (group, str(split_name), record)
+                for (_, file_info), group, split_name, record in zip(entries, groups, split_names, records)}
+    
     for category, files in all_files.items():
         if not files:
             continue
@@ -469,36 +557,29 @@ def prepare_training_data(all_files):
         category_dir = PROCESSED_DIR / category
         category_dir.mkdir(parents=True, exist_ok=True)
         
-        # Shuffle and split: 80% train, 10% val, 10% test
-        random.shuffle(files)
-        n = len(files)
-        train_split = int(n * 0.8)
-        val_split = int(n * 0.9)
-        
-        splits = {
-            "train": files[:train_split],
-            "validation": files[train_split:val_split],
-            "test": files[val_split:]
-        }
-        
-        for split_name, split_files in splits.items():
-            for i, file_info in enumerate(split_files):
-                # Copy file with standardized name
-                new_name = f"{category}_{i:04d}.wav"
-                dest_path = category_dir / new_name
+        # One running index per category, so splits never overwrite each other's files
+        for index, file_info in enumerate(files):
+            group, split_name, record = assigned[id(file_info)]
+            
+            # Copy file with standardized name
+            new_name = f"{category}_{index:04d}.wav"
+            dest_path = category_dir / new_name
+            
+            try:
+                shutil.copy2(file_info["path"], dest_path)
                 
-                try:
-                    shutil.copy2(file_info["path"], dest_path)
-                    
-                    training_manifest["splits"][split_name].append({
-                        "file": str(dest_path.relative_to(PROCESSED_DIR)),
-                        "category": category,
-                        "duration_ms": file_info["duration_ms"],
-                        "sample_rate": file_info["sample_rate"]
-                    })
-                    training_manifest["metadata"]["total_files"] += 1
-                except Exception as e:
-                    print(f"Error copying {file_info['path']}: {e}")
+                training_manifest["splits"][split_name].append({
+                    "file": str(dest_path.relative_to(PROCESSED_DIR)),
+                    "category": category,
+                    "duration_ms": file_info["duration_ms"],
+                    "sample_rate": file_info["sample_rate"],
+                    "group": group,
+                    "source": str(file_info["path"]),
+                    **record
+                })
+                training_manifest["metadata"]["total_files"] += 1
+            except Exception as e:
+                print(f"Error copying {file_info['path']}: {e}")
         
         training_manifest["metadata"]["categories"].append({
             "name": category,
@@ -509,7 +590,7 @@ def prepare_training_data(all_files):
         
         print(f"  {category}: {len(files)} files")
     
-    return training_manifest
+    return stamp(training_manifest)
 
 
 def generate_training_yaml(manifest):
@@ -565,14 +646,150 @@ def generate_training_yaml(manifest):
     return yaml_content
 
 
-def train_model(manifest):
+def embedding_namespace(embedding_mode="mean", yamnet=None):
+    """Cache namespace for ``embedding_mode`` embeddings from the YAMNet ``load_yamnet(yamnet)`` uses."""
+    from yamnet_store import model_version
+    
+    return f"{EMBEDDING_NAMESPACES[embedding_mode]}-{model_version(yamnet)}"
+
+
+def load_clip(file_path, embedding_mode="mean", target_sr=16000):
+    """
+    Load a clip the way the classifier is trained on it: mono at
+    ``target_sr`` (librosa resampling), trimmed or padded to 1 second, or in
+    "frames" mode kept whole and padded to at least one YAMNet window.
+    Returns None if the file cannot be decoded.
+    """
+    import numpy as np
+    librosa = require("librosa")
+    try:
+        waveform, sr = librosa.load(file_path, sr=target_sr, mono=True)
+        if embedding_mode == "frames":
+            # Keep the whole clip; pad to at least one YAMNet window
+            target_len = max(len(waveform), 15600)
+        else:
+            # Pad or trim to 1 second
+            target_len = target_sr
+        if len(waveform) < target_len:
+            waveform = np.pad(waveform, (0, target_len - len(waveform)))
+        else:
+            waveform = waveform[:target_len]
+        return waveform.astype(np.float32)
+    except Exception:
+        return None
+
+
+def active_patches(waveform, count, floor_db=FRAME_FLOOR_DB, relative_db=FRAME_RELATIVE_DB):
+    """
+    Boolean mask over the ``count`` YAMNet patches of ``waveform``: True for
+    patches whose RMS level is at least ``floor_db`` dBFS and within
+    ``relative_db`` of the loudest patch. The loudest patch is always kept.
+    """
+    import numpy as np
+    
+    starts = np.arange(count) * PATCH_HOP_SAMPLES
+    padded = np.pad(waveform, (0, max(0, int(starts[-1]) + PATCH_SAMPLES - len(waveform))))
+    patches = np.lib.stride_tricks.sliding_window_view(padded, PATCH_SAMPLES)[starts]
+    level_db = 10 * np.log10(np.mean(np.square(patches, dtype=np.float64), axis=1) + 1e-12)
+    keep = (level_db >= floor_db) & (level_db >= level_db.max() + relative_db)
+    keep[np.argmax(level_db)] = True
+    return keep
+
+
+def embed_clip(yamnet_model, waveform, embedding_mode="mean"):
+    """
+    YAMNet embeddings of a ``load_clip`` waveform as a (rows, 1024) array:
+    one mean-pooled row, or in "frames" mode one row per 0.48 s patch that
+    is loud enough to carry the clip's label (see ``active_patches``).
+    """
+    _, embeddings, _ = yamnet_model(waveform)
+    embeddings = embeddings.numpy()
+    if embedding_mode == "frames":
+        return embeddings[active_patches(waveform, len(embeddings))]
+    return embeddings.mean(axis=0, keepdims=True)
+
+
+def build_classifier(num_classes, hidden_units=(512, 256, 128), dropout=(0.4, 0.3, 0.2)):
+    """
+    Dense classifier head on 1024-d YAMNet embeddings.
+    
+    Each hidden block is Dense -> BatchNormalization -> ReLU -> Dropout;
+    ``dropout`` gives one rate per block.
+    """
+    import tensorflow as tf
+    
+    if len(dropout) != len(hidden_units):
+        raise ValueError(f"{len(dropout)} dropout rates for {len(hidden_units)} hidden layers")
+    
+    layers = [tf.keras.layers.Input(shape=(1024,))]
+    for units, rate in zip(hidden_units, dropout):
+        layers += [
+            tf.keras.layers.Dense(units, kernel_initializer='he_normal'),
+            tf.keras.layers.BatchNormalization(),
+            tf.keras.layers.Activation('relu'),
+            tf.keras.layers.Dropout(rate),
+        ]
+    
+    # Output layer
+    layers.append(tf.keras.layers.Dense(num_classes, activation='softmax'))
+    return tf.keras.Sequential(layers)
+
+
+def fit_head(config, X_train, y_train, X_val, y_val):
+    """
+    Train one head on cached embeddings, as the sweep (sweep_heads.py) and
+    cross-validation (crossval.py) do: seeded, Adam, balanced class weights
+    as in train_model, early stopping on validation accuracy.
+    
+    ``config`` holds seed, num_classes, hidden_units, dropout,
+    learning_rate, batch_size, epochs and patience. Returns the fitted
+    model, its history and the training time in seconds.
+    """
+    tf = require("tensorflow")
+    import numpy as np
+    
+    tf.keras.utils.set_random_seed(config["seed"])
+    model = build_classifier(int(config["num_classes"]), config["hidden_units"], config["dropout"])
+    model.compile(optimizer=tf.keras.optimizers.Adam(config["learning_rate"]),
+                  loss=tf.keras.losses.SparseCategoricalCrossentropy(),
+                  metrics=['accuracy'])
+    
+    classes, counts = np.unique(y_train, return_counts=True)
+    class_weight = {int(c): len(y_train) / (len(classes) * n) for c, n in zip(classes, counts)}
+    
+    start = time.perf_counter()
+    history = model.fit(
+        X_train, y_train,
+        validation_data=(X_val, y_val),
+        epochs=config["epochs"],
+        batch_size=config["batch_size"],
+        class_weight=class_weight,
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=config["patience"],
+                                                    restore_best_weights=True)],
+        verbose=0
+    )
+    return model, history, time.perf_counter() - start
+
+
+def train_model(manifest, augmentation="waveform", embedding_mode="mean", quantization="dynamic",
+                end_to_end=False, resume=False, checkpoint_every=500, yamnet_path=None,
+                profiler=None):
     """
     Train the audio classification model with enhanced accuracy techniques.
     
     Improvements:
     - Enhanced architecture with BatchNormalization and 3 Dense blocks
     - Class balancing with computed class weights
-    - On-the-fly audio augmentation
+    - On-the-fly audio augmentation: "waveform" re-embeds augmented audio,
+      "feature" augments cached embeddings without another YAMNet pass,
+      "online" embeds once and augments inside the tf.data pipeline each epoch
+    - Embedding mode: "mean" pools YAMNet frames of the first second,
+      "frames" embeds whole clips and keeps every 0.48 s frame that is not
+      silence or a quiet tail (``active_patches``) as an example
+    - TFLite export with dynamic-range or full-integer int8 quantization
+    - Optional single waveform-in TFLite model fusing YAMNet and the classifier
+    - YAMNet from the local SavedModel store (``yamnet_path`` or
+      HEARALERT_YAMNET_DIR, see yamnet_store.py), falling back to TF-Hub
     - Label smoothing to prevent overconfident predictions
     - Cosine learning rate decay with warmup
     - Extended training (100 epochs) with better early stopping
@@ -581,33 +798,28 @@ def train_model(manifest):
     print("TRAINING MODEL (Enhanced Accuracy Mode)")
     print("="*60)
     
-    try:
-        import tensorflow as tf
-        import tensorflow_hub as hub
-        import numpy as np
-    except ImportError:
-        print("Installing required packages...")
-        subprocess.run([sys.executable, "-m", "pip", "install", 
-                       "tensorflow", "tensorflow-hub", "numpy", "librosa", "scikit-learn", "-q"])
-        import tensorflow as tf
-        import tensorflow_hub as hub
-        import numpy as np
+    tf = require("tensorflow")
+    import numpy as np
     
-    try:
-        import librosa
-    except ImportError:
-        subprocess.run([sys.executable, "-m", "pip", "install", "librosa", "-q"])
-        import librosa
+    from embedding_cache import EmbeddingCache, file_key
+    from feature_augment import augment_embeddings, make_tf_batch_augmenter
+    from model_export import convert_tflite, compare_models, convert_end_to_end, WINDOW_SAMPLES
+    from evaluate_model import evaluate_models, print_report, REPORT_NAME
+    from yamnet_store import load_yamnet, load_stats
+    from stage_profiler import StageProfiler
     
-    try:
-        from sklearn.utils.class_weight import compute_class_weight
-    except ImportError:
-        subprocess.run([sys.executable, "-m", "pip", "install", "scikit-learn", "-q"])
-        from sklearn.utils.class_weight import compute_class_weight
+    # Per-stage timing; a throwaway profiler when the caller does not keep one
+    profiler = profiler or StageProfiler()
+    
+    # YAMNet is loaded on first use; a fully cached run never needs it
+    yamnet_model = None
     
-    # Load YAMNet
-    print("Loading YAMNet base model...")
-    yamnet_model = hub.load('https://tfhub.dev/google/yamnet/1')
+    def yamnet():
+        nonlocal yamnet_model
+        if yamnet_model is None:
+            print("Loading YAMNet base model...")
+            yamnet_model = load_yamnet(yamnet_path)
+        return yamnet_model
     
     # Prepare data
     categories = [cat["name"] for cat in manifest["metadata"]["categories"]]
@@ -615,19 +827,8 @@ def train_model(manifest):
     
     print(f"Training for {num_classes} classes: {categories}")
     
-    def load_audio(file_path, target_sr=16000):
-        """Load audio file and return waveform."""
-        try:
-            waveform, sr = librosa.load(file_path, sr=target_sr, mono=True)
-            # Pad or trim to 1 second
-            target_len = target_sr
-            if len(waveform) < target_len:
-                waveform = np.pad(waveform, (0, target_len - len(waveform)))
-            else:
-                waveform = waveform[:target_len]
-            return waveform.astype(np.float32)
-        except:
-            return None
+    def load_audio(file_path):
+        return load_clip(file_path, embedding_mode)
     
     def augment_waveform(waveform):
         """Apply on-the-fly audio augmentation for training."""
@@ -665,59 +866,170 @@ def train_model(manifest):
         return np.clip(augmented, -1.0, 1.0).astype(np.float32)
     
     def extract_embeddings(waveform):
-        """Extract YAMNet embeddings."""
-        scores, embeddings, spectrogram = yamnet_model(waveform)
-        return tf.reduce_mean(embeddings, axis=0).numpy()
+        return embed_clip(yamnet(), waveform, embedding_mode)
+    
+    # Plain (un-augmented) embeddings are cached by content hash
+    cache = EmbeddingCache(FEATURE_CACHE_DIR, embedding_namespace(embedding_mode, yamnet_path))
+    
+    def cached_embedding(file_path, key=None):
+        """
+        Return (embedding rows, waveform); waveform is only loaded on a cache
+        miss. ``key`` is the manifest's content hash, which saves re-hashing.
+        """
+        key = key or file_key(file_path)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, None
+        waveform = load_audio(file_path)
+        if waveform is None:
+            return None, None
+        embedding = extract_embeddings(waveform)
+        cache.put(key, embedding)
+        return embedding, waveform
     
     # Extract features with augmentation for training
-    print("Extracting features from training data (with augmentation)...")
+    print(f"Extracting features from training data ({augmentation} augmentation)...")
+    profiler.begin("embed")
     X_train, y_train = [], []
     X_val, y_val = [], []
     
     # Training: apply augmentation and extract more samples per file
     augmentations_per_sample = 2  # Create 2 augmented versions per sample
     
-    for idx, item in enumerate(manifest["splits"]["train"]):
+    def extract_train_item(item):
+        """Append one training file's embeddings (plus augmented copies)."""
         file_path = PROCESSED_DIR / item["file"]
-        waveform = load_audio(file_path)
-        if waveform is not None:
+        embedding, waveform = cached_embedding(file_path, item.get("sha"))
+        if embedding is not None:
+            label = categories.index(item["category"])
+            
             # Original embedding
-            embedding = extract_embeddings(waveform)
-            X_train.append(embedding)
-            y_train.append(categories.index(item["category"]))
+            X_train.extend(embedding)
+            y_train.extend([label] * len(embedding))
             
-            # Augmented embeddings
-            for _ in range(augmentations_per_sample):
-                aug_waveform = augment_waveform(waveform)
-                aug_embedding = extract_embeddings(aug_waveform)
-                X_train.append(aug_embedding)
-                y_train.append(categories.index(item["category"]))
-        
-        # Progress logging
-        if (idx + 1) % 500 == 0:
-            print(f"  Processed {idx + 1}/{len(manifest['splits']['train'])} training files...")
+            # Augmented embeddings (waveform mode re-runs YAMNet per copy)
+            if augmentation == "waveform":
+                if waveform is None:
+                    waveform = load_audio(file_path)
+                for _ in range(augmentations_per_sample):
+                    aug_waveform = augment_waveform(waveform)
+                    aug_embedding = extract_embeddings(aug_waveform)
+                    X_train.extend(aug_embedding)
+                    y_train.extend([label] * len(aug_embedding))
+    
+    # Extraction progress is checkpointed so a crash or Ctrl-C can resume.
+    # Each checkpoint appends only the rows extracted since the previous one
+    # as a shard; index.json lists the shards and the next manifest index.
+    # The fingerprint ties a checkpoint to the manifest, feature settings and YAMNet version.
+    train_items = manifest["splits"]["train"]
+    checkpoint_dir = FEATURE_CACHE_DIR / "extraction_checkpoint"
+    checkpoint_index = checkpoint_dir / "index.json"
+    fingerprint = hashlib.md5(json.dumps(
+        [augmentation, cache.namespace, [[item["file"], item.get("sha")] for item in train_items]]).encode()).hexdigest()
+    shards = []
+    start_index = 0
+    if resume and checkpoint_index.exists():
+        with open(checkpoint_index, 'r') as f:
+            index = json.load(f)
+        if index["fingerprint"] == fingerprint:
+            shards = index["shards"]
+            for shard in shards:
+                with np.load(checkpoint_dir / shard["name"], allow_pickle=False) as data:
+                    X_train.extend(data["X"])
+                    y_train.extend(data["y"].tolist())
+            start_index = index["next_index"]
+            print(f"  Resuming from checkpoint: {start_index}/{len(train_items)} files done "
+                  f"({len(shards)} shards)")
+        else:
+            print("  Checkpoint is from a different manifest or settings; starting over")
+    if not shards:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    saved_rows = len(X_train)
+    
+    def save_checkpoint(next_index):
+        """Append the rows extracted since the last checkpoint as a shard and update the index."""
+        nonlocal saved_rows
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        if len(X_train) > saved_rows:
+            name = f"shard-{len(shards):05d}.npz"
+            tmp_path = checkpoint_dir / f"{name}.tmp.npz"
+            np.savez(tmp_path, X=np.array(X_train[saved_rows:], dtype=np.float32).reshape(-1, 1024),
+                     y=np.array(y_train[saved_rows:], dtype=np.int64))
+            os.replace(tmp_path, checkpoint_dir / name)
+            shards.append({"name": name, "rows": len(X_train) - saved_rows, "next_index": next_index})
+            saved_rows = len(X_train)
+        tmp_path = checkpoint_index.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"fingerprint": fingerprint, "next_index": next_index, "shards": shards}, f)
+        os.replace(tmp_path, checkpoint_index)
+        cache.flush()
+    
+    idx = start_index
+    rows_before = len(X_train)
+    try:
+        for idx in range(start_index, len(train_items)):
+            rows_before = len(X_train)
+            extract_train_item(train_items[idx])
+            
+            # Progress logging
+            if (idx + 1) % checkpoint_every == 0:
+                save_checkpoint(idx + 1)
+                print(f"  Processed {idx + 1}/{len(train_items)} training files (checkpoint saved)...")
+    except KeyboardInterrupt:
+        # The interrupted file may be half-extracted, so drop its rows
+        del X_train[rows_before:]
+        del y_train[rows_before:]
+        save_checkpoint(idx)
+        print(f"\n  Interrupted; checkpoint saved at {idx}/{len(train_items)}. Re-run with --resume.")
+        raise
+    if start_index < len(train_items):
+        save_checkpoint(len(train_items))
     
     # Validation: no augmentation for fair evaluation
     for item in manifest["splits"]["validation"]:
         file_path = PROCESSED_DIR / item["file"]
-        waveform = load_audio(file_path)
-        if waveform is not None:
-            embedding = extract_embeddings(waveform)
-            X_val.append(embedding)
-            y_val.append(categories.index(item["category"]))
-    
-    X_train = np.array(X_train)
+        embedding, _ = cached_embedding(file_path, item.get("sha"))
+        if embedding is not None:
+            X_val.extend(embedding)
+            y_val.extend([categories.index(item["category"])] * len(embedding))
+    
+    # Test split: held out for the evaluation stage (cached like the rest)
+    X_test, y_test = [], []
+    for item in manifest["splits"]["test"]:
+        embedding, _ = cached_embedding(PROCESSED_DIR / item["file"], item.get("sha"))
+        if embedding is not None:
+            X_test.extend(embedding)
+            y_test.extend([categories.index(item["category"])] * len(embedding))
+    
+    cache.save()
+    print(f"  Embedding cache: {cache.hits} hits, {cache.misses} misses")
+    profiler.end(files=sum(len(manifest["splits"][split]) for split in ("train", "validation", "test")),
+                 cache_hits=cache.hits, cache_misses=cache.misses)
+    
+    X_train = np.array(X_train, dtype=np.float32).reshape(-1, 1024)
     y_train = np.array(y_train)
-    X_val = np.array(X_val)
+    X_val = np.array(X_val, dtype=np.float32).reshape(-1, 1024)
     y_val = np.array(y_val)
+    X_test = np.array(X_test, dtype=np.float32).reshape(-1, 1024)
+    y_test = np.array(y_test)
+    
+    # Feature mode: augment cached embeddings without another YAMNet pass
+    if augmentation == "feature" and len(X_train):
+        X_aug, y_aug = augment_embeddings(X_train, y_train, copies=augmentations_per_sample)
+        X_train = np.concatenate([X_train, X_aug])
+        y_train = np.concatenate([y_train, y_aug])
     
     print(f"\n📊 Dataset Statistics:")
-    print(f"  Training samples: {len(X_train)} (with augmentation)")
+    print(f"  Training samples: {len(X_train)} ({'augmented per epoch' if augmentation == 'online' else 'with augmentation'})")
     print(f"  Validation samples: {len(X_val)}")
+    print(f"  Test samples: {len(X_test)}")
+    print(f"  Embedding mode: {embedding_mode}")
     print(f"  Classes: {num_classes}")
     
     # Compute class weights for imbalanced data
+    profiler.begin("fit")
     print("\n⚖️ Computing class weights for balancing...")
+    compute_class_weight = require("sklearn.utils.class_weight").compute_class_weight
     class_weights = compute_class_weight(
         class_weight='balanced',
         classes=np.unique(y_train),
@@ -728,30 +1040,7 @@ def train_model(manifest):
     
     # Build enhanced classifier with BatchNormalization
     print("\n🏗️ Building enhanced model architecture...")
-    model = tf.keras.Sequential([
-        tf.keras.layers.Input(shape=(1024,)),
-        
-        # First block - 512 units
-        tf.keras.layers.Dense(512, kernel_initializer='he_normal'),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Dropout(0.4),
-        
-        # Second block - 256 units
-        tf.keras.layers.Dense(256, kernel_initializer='he_normal'),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Dropout(0.3),
-        
-        # Third block - 128 units
-        tf.keras.layers.Dense(128, kernel_initializer='he_normal'),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Dropout(0.2),
-        
-        # Output layer
-        tf.keras.layers.Dense(num_classes, activation='softmax')
-    ])
+    model = build_classifier(num_classes)
     
     model.summary()
     
@@ -798,10 +1087,16 @@ def train_model(manifest):
     final_schedule = WarmupSchedule(warmup_steps, initial_lr, lr_schedule)
     optimizer = tf.keras.optimizers.Adam(learning_rate=final_schedule)
     
+    # Online mode mixes labels, so it trains on one-hot targets
+    if augmentation == "online":
+        loss = tf.keras.losses.CategoricalCrossentropy(from_logits=False)
+    else:
+        loss = tf.keras.losses.SparseCategoricalCrossentropy(from_logits=False)
+    
     # Compile with label smoothing
     model.compile(
         optimizer=optimizer,
-        loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=False),
+        loss=loss,
         metrics=['accuracy']
     )
     
@@ -835,33 +1130,89 @@ def train_model(manifest):
     print(f"  Warmup epochs: {warmup_epochs}")
     print(f"  Using class weights: Yes")
     print(f"  Using BatchNormalization: Yes")
-    print(f"  On-the-fly augmentation: Applied ({augmentations_per_sample}x per sample)")
+    if augmentation == "online":
+        print(f"  On-the-fly augmentation: Applied (every batch, embed-once)")
+    else:
+        print(f"  On-the-fly augmentation: Applied ({augmentations_per_sample}x per sample, {augmentation})")
+    
+    if augmentation == "online":
+        # Embed-once training set; augmentation runs per batch in tf.data.
+        # Class weights become per-sample weights so mixup can blend them.
+        y_train_onehot = tf.keras.utils.to_categorical(y_train, num_classes)
+        sample_weights = class_weights[np.searchsorted(np.unique(y_train), y_train)]
+        train_ds = (
+            tf.data.Dataset.from_tensor_slices((X_train, y_train_onehot, sample_weights.astype(np.float32)))
+            .shuffle(len(X_train), reshuffle_each_iteration=True)
+            .batch(batch_size)
+            .map(make_tf_batch_augmenter(X_train), num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+        history = model.fit(
+            train_ds,
+            validation_data=(X_val, tf.keras.utils.to_categorical(y_val, num_classes)),
+            epochs=total_epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+    else:
+        history = model.fit(
+            X_train, y_train,
+            validation_data=(X_val, y_val),
+            epochs=total_epochs,
+            batch_size=batch_size,
+            callbacks=callbacks,
+            class_weight=class_weight_dict,
+            verbose=1
+        )
     
-    history = model.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
-        epochs=total_epochs,
-        batch_size=batch_size,
-        callbacks=callbacks,
-        class_weight=class_weight_dict,
-        verbose=1
-    )
+    profiler.end(samples=int(len(X_train)), epochs=len(history.history['loss']))
     
     # Save model
+    profiler.begin("export")
     MODEL_OUTPUT.mkdir(parents=True, exist_ok=True)
     
     # Convert to TFLite with quantization for mobile
-    print("\n📱 Converting to TFLite...")
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    
-    # Dynamic range quantization for smaller model size
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    tflite_model = converter.convert()
+    print(f"\n📱 Converting to TFLite ({quantization} quantization)...")
+    quantization_report = None
+    if quantization == "int8":
+        # Calibrate activations on embeddings of training_data/ clips
+        tflite_model = convert_tflite(model, "int8", representative_data=X_train)
+        quantization_report = compare_models(convert_tflite(model, "float"), tflite_model,
+                                             X_test, y_test)
+        print(f"  Size: {quantization_report['float']['size_kb']} KB float -> "
+              f"{quantization_report['quantized']['size_kb']} KB int8")
+        if quantization_report["test_samples"]:
+            print(f"  Latency: {quantization_report['float']['latency_ms']:.3f} ms float -> "
+                  f"{quantization_report['quantized']['latency_ms']:.3f} ms int8")
+            print(f"  Test accuracy: {quantization_report['float']['accuracy']:.2%} float -> "
+                  f"{quantization_report['quantized']['accuracy']:.2%} int8 "
+                  f"(delta {quantization_report['accuracy_delta']:+.2%})")
+    else:
+        tflite_model = convert_tflite(model, quantization)
     
     tflite_path = MODEL_OUTPUT / "hearalert_classifier.tflite"
     with open(tflite_path, 'wb') as f:
         f.write(tflite_model)
     
+    # Single-interpreter model: 15600-sample waveform -> YAMNet -> head
+    end_to_end_path = None
+    if end_to_end:
+        print(f"\n📱 Converting end-to-end waveform model ({quantization} quantization)...")
+        representative_waveforms = []
+        if quantization == "int8":
+            for item in random.sample(manifest["splits"]["train"], min(200, len(manifest["splits"]["train"]))):
+                waveform = load_audio(PROCESSED_DIR / item["file"])
+                if waveform is not None:
+                    representative_waveforms.append(np.pad(waveform, (0, max(0, WINDOW_SAMPLES - len(waveform))))[:WINDOW_SAMPLES])
+        end_to_end_model = convert_end_to_end(yamnet(), model, quantization, representative_waveforms)
+        end_to_end_path = MODEL_OUTPUT / "hearalert_end_to_end.tflite"
+        with open(end_to_end_path, 'wb') as f:
+            f.write(end_to_end_model)
+        print(f"✓ End-to-end model saved: {end_to_end_path} ({len(end_to_end_model) / 1024:.1f} KB)")
+    
+    # Features are no longer needed once the model is exported
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    
     # Save labels
     labels_path = MODEL_OUTPUT / "hearalert_labels.txt"
     with open(labels_path, 'w') as f:
@@ -872,6 +1223,22 @@ def train_model(manifest):
     print(f"✓ Labels saved: {labels_path}")
     print(f"✓ Model size: {os.path.getsize(tflite_path) / 1024:.1f} KB")
     
+    profiler.end()
+    
+    # Evaluate the held-out test split with both the Keras and TFLite models
+    profiler.begin("evaluate")
+    evaluation = evaluate_models(X_test, y_test, categories, model, tflite_model,
+                                 tiers={c: TRAINING_CATEGORIES[c]["alert_type"] for c in categories})
+    evaluation_path = None
+    if evaluation["samples"]:
+        print_report(evaluation, categories)
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        evaluation_path = REPORTS_DIR / REPORT_NAME
+        with open(evaluation_path, 'w') as f:
+            json.dump(evaluation, f, indent=2)
+        print(f"✓ Evaluation report: {evaluation_path}")
+    profiler.end(samples=evaluation["samples"])
+    
     # Training summary
     final_acc = max(history.history['accuracy'])
     final_val_acc = max(history.history['val_accuracy'])
@@ -886,25 +1253,121 @@ def train_model(manifest):
     print(f"  Total Epochs Run: {len(history.history['accuracy'])}")
     print("="*60)
     
-    return {
+    result = {
         "accuracy": final_acc,
         "val_accuracy": final_val_acc,
         "best_epoch": best_epoch,
         "model_path": str(tflite_path),
         "labels_path": str(labels_path),
         "categories": categories,
-        "model_size_kb": os.path.getsize(tflite_path) / 1024
+        "model_size_kb": os.path.getsize(tflite_path) / 1024,
+        "quantization": quantization
     }
+    if quantization_report is not None:
+        result["quantization_report"] = quantization_report
+    if yamnet_model is not None:
+        result["yamnet_load"] = load_stats(yamnet_path)
+    if end_to_end_path is not None:
+        result["end_to_end_model_path"] = str(end_to_end_path)
+    if evaluation_path is not None:
+        result["test_evaluation"] = {
+            "samples": evaluation["samples"],
+            "keras_accuracy": evaluation["keras"]["accuracy"],
+            "tflite_accuracy": evaluation["tflite"]["accuracy"],
+            "tier_recall": {tier: entry["recall"] for tier, entry in evaluation["tflite"]["per_tier"].items()},
+            "report_path": str(evaluation_path),
+        }
+    return result
 
 
-def main():
-    """Main training pipeline."""
-    print("="*60)
-    print("HearAlert Audio Dataset Training Pipeline")
-    print("="*60)
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="HearAlert audio dataset training pipeline")
+    parser.add_argument(
+        "--augment", choices=["waveform", "feature", "online"], default="waveform",
+        help="waveform: re-embed augmented audio (3x YAMNet cost); "
+             "feature: augment cached embeddings (1x YAMNet cost); "
+             "online: embed once, augment each batch in tf.data (1x cost and memory)"
+    )
+    parser.add_argument(
+        "--embedding-mode", choices=["mean", "frames"], default="mean",
+        help="mean: average YAMNet frames of the first second; "
+             "frames: embed whole clips, one training example per non-silent 0.48 s frame"
+    )
+    parser.add_argument(
+        "--quantize", choices=["dynamic", "int8"], default="dynamic",
+        help="dynamic: dynamic-range quantization; int8: full-integer quantization "
+             "calibrated on training_data/ clips, reported against the float model"
+    )
+    parser.add_argument(
+        "--end-to-end", action="store_true",
+        help="also export hearalert_end_to_end.tflite: one waveform-in model "
+             "fusing YAMNet and the classifier head"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="reuse the saved training manifest and continue feature extraction "
+             "from the last checkpoint instead of starting over"
+    )
+    parser.add_argument(
+        "--yamnet",
+        help="YAMNet SavedModel directory (default: $HEARALERT_YAMNET_DIR, then "
+             "models/yamnet, then TF-Hub)"
+    )
+    parser.add_argument(
+        "--export-json", action="store_true",
+        help="also write training_manifest.json (the packed training_manifest.bin "
+             "is what the pipeline reads)"
+    )
+    parser.add_argument(
+        "--prepare-only", action="store_true",
+        help="collect audio, split it and write the YAML and manifest, then stop "
+             "(never imports TensorFlow)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="run each stage under cProfile; .prof dumps go to profiles/ in the reports "
+             "directory and the top functions into the stage report"
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="trace Python allocations per stage with tracemalloc (slows the run)"
+    )
+    parser.add_argument(
+        "--check-imports", action="store_true",
+        help=f"check that importing this module loads no heavy dependency and takes "
+             f"under {IMPORT_BUDGET_SEC:g}s, then exit (non-zero on failure)"
+    )
+    return parser.parse_args(argv)
+
+
+def previous_manifest_path():
+    """
+    The last run's manifest: the one in the reports directory, else one an
+    older version left in the app assets. None if there is none.
+    """
+    from dataset_manifest import default_manifest_path
+    
+    for directory in (REPORTS_DIR, OUTPUT_DIR):
+        path = default_manifest_path(directory)
+        if path.exists():
+            return path
+    return None
+
+
+def prepare_run(yaml_path, manifest_path, profiler=None, export_json=False):
+    """
+    Collect audio, build the train/val/test split and save the YAML and the
+    packed manifest (plus a JSON export next to it with ``export_json``).
+    """
+    from stage_profiler import StageProfiler
+    from dataset_manifest import load_manifest, save_manifest, JSON_MANIFEST_NAME
+    
+    profiler = profiler or StageProfiler()
     
     # Step 1: Collect all audio files
     print("\n[1/4] Collecting audio files...")
+    profiler.begin("collect")
     
     raw_files = collect_raw_audio()
     esc50_files = collect_esc50_audio()
@@ -929,6 +1392,7 @@ def main():
     
     total_files = sum(len(f) for f in all_files.values())
     print(f"\nTotal audio files found: {total_files}")
+    profiler.end(files=total_files)
     
     if total_files < 100:
         print("Warning: Not enough audio files. Please ensure datasets are downloaded.")
@@ -936,48 +1400,132 @@ def main():
     
     # Step 2: Prepare training data
     print("\n[2/4] Preparing training data...")
+    profiler.begin("prepare")
     manifest = prepare_training_data(all_files)
+    profiler.end(files=manifest["metadata"]["total_files"])
     
     # Step 3: Generate YAML
     print("\n[3/4] Generating training YAML...")
+    profiler.begin("yaml")
     yaml_content = generate_training_yaml(manifest)
     
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    yaml_path = OUTPUT_DIR / "training_config.yaml"
-    with open(yaml_path, 'w') as f:
-        yaml.dump(yaml_content, f, default_flow_style=False, sort_keys=False)
+    write_yaml(yaml_path, yaml_content)
     
-    # Save manifest
-    manifest_path = OUTPUT_DIR / "training_manifest.json"
-    with open(manifest_path, 'w') as f:
-        json.dump(manifest, f, indent=2)
+    # Save manifest, reporting what changed since the previous one
+    previous_path = previous_manifest_path()
+    if previous_path is not None:
+        from dataset_manifest import diff_manifests, summarize_diff
+        
+        try:
+            previous = load_manifest(previous_path)
+            print(f"  Since the previous manifest: {summarize_diff(diff_manifests(previous, manifest))}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  Could not compare with the previous manifest: {e}")
+    save_manifest(manifest, manifest_path)
+    
+    # Manifests are not app assets; drop the ones an older version of this
+    # script wrote there (by exact name and manifest name), nothing else
+    for stale in (OUTPUT_DIR / name for name in LEGACY_MANIFEST_NAMES):
+        if not stale.exists() or stale.parent.resolve() == manifest_path.parent.resolve():
+            continue
+        try:
+            written_here = load_manifest(stale)["metadata"].get("name") == MANIFEST_DATASET_NAME
+        except (OSError, ValueError, KeyError):
+            written_here = False
+        if written_here:
+            stale.unlink()
+            print(f"  Removed stale manifest {stale}")
+        else:
+            print(f"  Left {stale} in place: not a manifest written by this script")
+    if export_json:
+        json_path = save_manifest(manifest, manifest_path.with_name(JSON_MANIFEST_NAME))
+    
+    profiler.end()
     
     print(f"✓ Training config: {yaml_path}")
     print(f"✓ Manifest: {manifest_path}")
+    if export_json:
+        print(f"✓ Manifest (JSON export): {json_path}")
+    
+    return manifest, yaml_content
+
+
+def main(argv=None):
+    """Main training pipeline."""
+    args = parse_args(argv)
+    
+    if args.check_imports:
+        ok, elapsed, loaded = check_import_budget()
+        print(f"Import time: {elapsed * 1000:.0f} ms (budget {IMPORT_BUDGET_SEC * 1000:.0f} ms)")
+        if loaded:
+            print(f"Heavy modules loaded at import: {', '.join(loaded)}")
+        print("✓ Import budget met" if ok else "✗ Import budget exceeded")
+        return 0 if ok else 1
+    
+    print("="*60)
+    print("HearAlert Audio Dataset Training Pipeline")
+    print("="*60)
+    
+    yaml_path = OUTPUT_DIR / "training_config.yaml"
+    profile_path = OUTPUT_DIR / PROFILE_NAME
+    
+    from stage_profiler import StageProfiler
+    from dataset_manifest import load_manifest, MANIFEST_NAME
+    
+    manifest_path = REPORTS_DIR / MANIFEST_NAME
+    
+    profiler = StageProfiler(profile=args.profile, trace_memory=args.trace_memory,
+                             dump_dir=REPORTS_DIR / "profiles")
+    
+    if args.resume and previous_manifest_path() is not None:
+        # Re-preparing would reshuffle the splits and invalidate the checkpoint
+        print("\n[1-3/4] Resuming with the existing training manifest...")
+        manifest = load_manifest(previous_manifest_path())
+        yaml_content = generate_training_yaml(manifest)
+    else:
+        manifest, yaml_content = prepare_run(yaml_path, manifest_path, profiler, args.export_json)
+    
+    if args.prepare_only:
+        loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+        if loaded:
+            print(f"Warning: preparation imported {', '.join(loaded)}")
+        print("\nPrepared only; skipping training.")
+        print(f"✓ Stage profile: {profiler.write(profile_path)}")
+        return 0
     
     # Step 4: Train model
     print("\n[4/4] Training model...")
     
     if manifest["metadata"]["total_files"] >= 50:
-        training_result = train_model(manifest)
+        training_result = train_model(manifest, augmentation=args.augment,
+                                      embedding_mode=args.embedding_mode,
+                                      quantization=args.quantize,
+                                      end_to_end=args.end_to_end,
+                                      resume=args.resume,
+                                      yamnet_path=args.yamnet,
+                                      profiler=profiler)
         
         # Update YAML with results
         yaml_content["training_results"] = training_result
-        with open(yaml_path, 'w') as f:
-            yaml.dump(yaml_content, f, default_flow_style=False, sort_keys=False)
+        write_yaml(yaml_path, yaml_content)
         
         print("\n" + "="*60)
         print("TRAINING COMPLETE!")
         print("="*60)
         print(f"Final Accuracy: {training_result['accuracy']:.2%}")
         print(f"Validation Accuracy: {training_result['val_accuracy']:.2%}")
+        if "test_evaluation" in training_result:
+            print(f"Test Accuracy (TFLite): {training_result['test_evaluation']['tflite_accuracy']:.2%}")
         print(f"Model: {training_result['model_path']}")
         print(f"Labels: {training_result['labels_path']}")
     else:
         print("Not enough training data. Skipping model training.")
     
+    print(f"✓ Stage profile: {profiler.write(profile_path)}")
     print("="*60)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
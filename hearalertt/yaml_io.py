@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+YAML Serialization for HearAlert
+================================
+One place to read and write the dataset/training YAML assets:
+
+    * libyaml's C loader and dumper (``CSafeLoader``/``CSafeDumper``) are
+      used when PyYAML was built with them, the pure-Python safe classes
+      otherwise - same documents, several times faster to emit and parse
+    * documents are written to a temporary file and moved into place, so
+      the app bundle and other readers never see a half-written asset
+    * tuples and numpy scalars/arrays (metrics, hidden layer sizes) are
+      written as plain YAML lists and numbers instead of python/* tags
+
+Usage:
+    from yaml_io import load_yaml, write_yaml
+    write_yaml(OUTPUT_DIR / "siren_dataset.yaml", content)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import yaml
+from yaml import YAMLError
+from yaml.representer import SafeRepresenter
+
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _BaseDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _BaseDumper
+    LIBYAML = False
+
+
+class _Dumper(_BaseDumper):
+    pass
+
+
+def _represent_other(dumper, data):
+    # numpy scalars and arrays; anything else is still an error
+    if hasattr(data, "tolist") and hasattr(data, "dtype"):
+        return dumper.represent_data(data.tolist())
+    return dumper.represent_undefined(data)
+
+
+_Dumper.add_representer(tuple, SafeRepresenter.represent_list)
+_Dumper.add_multi_representer(object, _represent_other)
+
+DUMP_OPTIONS = {"default_flow_style": False, "sort_keys": False, "allow_unicode": True}
+
+
+def load_yaml(path):
+    """Parse one YAML file (None for an empty document)."""
+    with open(path, 'r', encoding="utf-8") as f:
+        return yaml.load(f, Loader=_Loader)
+
+
+def dump_yaml(data, stream=None):
+    """YAML text of ``data`` (or write it to ``stream``) in the asset style: block, insertion order."""
+    return yaml.dump(data, stream, Dumper=_Dumper, **DUMP_OPTIONS)
+
+
+def write_yaml(path, data):
+    """Write ``data`` to ``path`` atomically; returns the path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        dump_yaml(data, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main(argv=None):
+    """Parse YAML files and report errors (a quick check of generated assets)."""
+    paths = [Path(p) for p in (sys.argv[1:] if argv is None else argv)]
+    print(f"libyaml: {'yes' if LIBYAML else 'no (pure-Python fallback)'}")
+    failed = 0
+    for path in paths:
+        try:
+            load_yaml(path)
+            print(f"  ✓ {path}")
+        except (OSError, YAMLError) as e:
+            failed += 1
+            print(f"  ✗ {path}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
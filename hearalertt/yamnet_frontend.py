@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+YAMNet Log-Mel Frontend for HearAlert
+=====================================
+Numpy reimplementation of YAMNet's feature extraction, so the streaming
+classifier can compute log-mel frames incrementally and reuse them across
+overlapping windows:
+
+    25 ms periodic-Hann frames every 10 ms (400 / 160 samples at 16 kHz),
+    512-point FFT magnitude, 64 HTK mel bands from 125 to 7500 Hz
+    (``tf.signal.linear_to_mel_weight_matrix``), log(mel + 0.001).
+
+A YAMNet patch is 96 consecutive frames (0.96 s) and patches start every
+48 frames (0.48 s), so one 15600-sample app window yields exactly one patch
+and each further 7680 samples one more.
+"""
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+STFT_WINDOW = 400
+STFT_HOP = 160
+FFT_LENGTH = 512
+MEL_BANDS = 64
+MEL_MIN_HZ = 125.0
+MEL_MAX_HZ = 7500.0
+LOG_OFFSET = 0.001
+PATCH_FRAMES = 96
+PATCH_HOP_FRAMES = 48
+
+
+def hertz_to_mel(hz):
+    """HTK mel scale, as used by ``tf.signal``."""
+    return 1127.0 * np.log1p(np.asarray(hz, dtype=np.float64) / 700.0)
+
+
+def mel_weight_matrix(num_mel_bins=MEL_BANDS, num_spectrogram_bins=FFT_LENGTH // 2 + 1,
+                      sample_rate=SAMPLE_RATE, lower_hz=MEL_MIN_HZ, upper_hz=MEL_MAX_HZ):
+    """(spectrogram_bins, mel_bins) matrix matching ``tf.signal.linear_to_mel_weight_matrix``."""
+    linear_hz = np.linspace(0.0, sample_rate / 2.0, num_spectrogram_bins)[1:]
+    spectrogram_mel = hertz_to_mel(linear_hz)[:, None]
+    edges = np.linspace(hertz_to_mel(lower_hz), hertz_to_mel(upper_hz), num_mel_bins + 2)
+    lower, center, upper = edges[:-2], edges[1:-1], edges[2:]
+    lower_slopes = (spectrogram_mel - lower) / (center - lower)
+    upper_slopes = (upper - spectrogram_mel) / (upper - center)
+    weights = np.maximum(0.0, np.minimum(lower_slopes, upper_slopes))
+    # The DC bin gets no weight
+    return np.pad(weights, [[1, 0], [0, 0]]).astype(np.float32)
+
+
+def frames_for(num_samples):
+    """Number of whole STFT frames in ``num_samples`` samples."""
+    return 0 if num_samples < STFT_WINDOW else 1 + (num_samples - STFT_WINDOW) // STFT_HOP
+
+
+def samples_for(num_frames):
+    """Samples needed to compute ``num_frames`` consecutive frames."""
+    return (num_frames - 1) * STFT_HOP + STFT_WINDOW if num_frames else 0
+
+
+class LogMelFrontend:
+    """Computes YAMNet log-mel frames for contiguous sample blocks."""
+
+    def __init__(self):
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(STFT_WINDOW) / STFT_WINDOW)).astype(np.float32)
+        self.mel_matrix = mel_weight_matrix()
+
+    def frames(self, samples):
+        """
+        Log-mel frames of ``samples`` as an (n, 64) float32 array.
+
+        Frame ``i`` covers ``samples[i * 160:i * 160 + 400]``; trailing
+        samples that do not fill a frame are ignored.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        n = frames_for(len(samples))
+        if n == 0:
+            return np.zeros((0, MEL_BANDS), dtype=np.float32)
+        strides = (samples.strides[0] * STFT_HOP, samples.strides[0])
+        framed = np.lib.stride_tricks.as_strided(samples, (n, STFT_WINDOW), strides)
+        magnitude = np.abs(np.fft.rfft(framed * self.window, FFT_LENGTH))
+        return np.log(magnitude.astype(np.float32) @ self.mel_matrix + LOG_OFFSET)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Local YAMNet Model Store for HearAlert
+======================================
+``hub.load('https://tfhub.dev/google/yamnet/1')`` needs the network (or a
+warm TF-Hub cache) and re-resolves the handle on every run. This keeps a
+copy of the YAMNet SavedModel in a local directory and loads it from there,
+so training, evaluation and the classifiers start fast and work offline.
+
+The store is, in order of precedence: an explicit path, the
+``HEARALERT_YAMNET_DIR`` environment variable, or ``models/yamnet`` under the
+base directory (see paths.py). When none of them holds a SavedModel the
+TF-Hub handle is used.
+
+Loaded models are kept per process and warmed with one silent window so
+the first real call does not pay for tracing; ``LOAD_STATS`` records where
+each model came from and how long loading and warm-up took.
+
+``--export-patch`` converts YAMNet's body to a TFLite model taking (96, 64)
+log-mel patches, as used by ``streaming_classifier.py --incremental``.
+
+Usage:
+    python yamnet_store.py --save                  # download once into models/yamnet
+    python yamnet_store.py --save /data/yamnet     # or into a directory of your choice
+    python yamnet_store.py --export-patch          # models/yamnet_patch.tflite
+    HEARALERT_YAMNET_DIR=/data/yamnet python train_audio_model.py
+"""
+
+import os
+import sys
+import time
+import hashlib
+import shutil
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from audio_io import WINDOW_SAMPLES
+from paths import PATHS
+
+YAMNET_HANDLE = 'https://tfhub.dev/google/yamnet/1'
+STORE_ENV = "HEARALERT_YAMNET_DIR"
+DEFAULT_STORE = PATHS["yamnet_store"]
+DEFAULT_PATCH_MODEL = DEFAULT_STORE.parent / "yamnet_patch.tflite"
+
+# Loaded models and their load statistics, keyed by resolved location
+_MODELS = {}
+LOAD_STATS = {}
+
+
+def is_saved_model(path):
+    return (Path(path) / "saved_model.pb").exists()
+
+
+def resolve(yamnet=None):
+    """
+    Where to load YAMNet from: a SavedModel directory when one is
+    configured, otherwise the TF-Hub handle. The default handle (or None)
+    prefers the local store.
+    """
+    if yamnet is not None and str(yamnet) != YAMNET_HANDLE:
+        return str(yamnet)
+    for candidate in (os.environ.get(STORE_ENV), DEFAULT_STORE):
+        if candidate and is_saved_model(candidate):
+            return str(candidate)
+    return YAMNET_HANDLE
+
+
+def load_yamnet(yamnet=None, warm=True):
+    """Load (once per process) and warm up YAMNet; see ``resolve`` for the lookup."""
+    location = resolve(yamnet)
+    if location in _MODELS:
+        return _MODELS[location]
+
+    start = time.perf_counter()
+    if is_saved_model(location):
+        import tensorflow as tf
+
+        model = tf.saved_model.load(location)
+        source = "local"
+    else:
+        import tensorflow_hub as hub
+
+        model = hub.load(location)
+        source = "tfhub"
+    load_sec = time.perf_counter() - start
+
+    warmup_sec = None
+    if warm:
+        start = time.perf_counter()
+        model(np.zeros(WINDOW_SAMPLES, dtype=np.float32))
+        warmup_sec = time.perf_counter() - start
+
+    LOAD_STATS[location] = {
+        "location": location,
+        "source": source,
+        "load_sec": round(load_sec, 3),
+        "warmup_sec": round(warmup_sec, 3) if warmup_sec is not None else None,
+    }
+    print(f"  YAMNet loaded from {location} ({source}) in {load_sec:.2f}s"
+          + (f", warm-up {warmup_sec:.2f}s" if warmup_sec is not None else ""))
+    _MODELS[location] = model
+    return model
+
+
+def model_version(yamnet=None):
+    """
+    Short identifier of the model ``load_yamnet(yamnet)`` uses, for cache
+    keys: a hash of a SavedModel's graph and variable index (which holds a
+    checksum per weight) or of a ``.tflite`` file, else of the TF-Hub handle,
+    whose versions are immutable. Reads files only; nothing is loaded.
+    """
+    location = resolve(yamnet)
+    digest = hashlib.md5()
+    if is_saved_model(location):
+        for name in ("saved_model.pb", "variables/variables.index"):
+            path = Path(location) / name
+            if path.exists():
+                digest.update(path.read_bytes())
+    elif Path(location).is_file():
+        digest.update(Path(location).read_bytes())
+    else:
+        digest.update(location.encode())
+    return digest.hexdigest()[:12]
+
+
+def load_stats(yamnet=None):
+    """Load statistics of the model ``load_yamnet(yamnet)`` returned, if loaded."""
+    return LOAD_STATS.get(resolve(yamnet))
+
+
+def save_yamnet(store_dir=None, handle=YAMNET_HANDLE):
+    """
+    Download YAMNet from TF-Hub (or its cache) and copy the SavedModel into the store.
+
+    An existing store is only replaced when it is empty or already holds a
+    SavedModel; the copy is written next to it and moved into place, so an
+    interrupted save leaves the old store intact.
+    """
+    import tensorflow_hub as hub
+
+    store_dir = Path(store_dir or os.environ.get(STORE_ENV) or DEFAULT_STORE)
+    if store_dir.exists() and not (store_dir.is_dir() and (is_saved_model(store_dir)
+                                                           or not any(store_dir.iterdir()))):
+        raise ValueError(f"{store_dir} exists and is not a SavedModel store; refusing to replace it")
+    source_dir = Path(hub.resolve(handle))
+    store_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = store_dir.with_name(store_dir.name + ".tmp")
+    old_dir = store_dir.with_name(store_dir.name + ".old")
+    for leftover in (tmp_dir, old_dir):
+        if leftover.exists():
+            shutil.rmtree(leftover)
+    shutil.copytree(source_dir, tmp_dir)
+    # os.replace cannot overwrite a non-empty directory: move the old store aside first
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    return store_dir
+
+
+def export_patch_model(output_path=DEFAULT_PATCH_MODEL, yamnet=None, quantization="float"):
+    """Write YAMNet's log-mel-patch body as a TFLite model (see model_export.build_patch_module)."""
+    from model_export import convert_patch_model
+
+    output_path = Path(output_path)
+    tflite_model = convert_patch_model(load_yamnet(yamnet, warm=False), quantization)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    tmp_path.write_bytes(tflite_model)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local YAMNet SavedModel store")
+    parser.add_argument("--save", nargs="?", const="", metavar="DIR",
+                        help=f"download YAMNet into DIR (default: ${STORE_ENV} or {DEFAULT_STORE})")
+    parser.add_argument("--handle", default=YAMNET_HANDLE, help="TF-Hub handle to download")
+    parser.add_argument("--export-patch", nargs="?", const=DEFAULT_PATCH_MODEL, type=Path, metavar="PATH",
+                        help=f"export the log-mel-patch YAMNet TFLite to PATH (default: {DEFAULT_PATCH_MODEL})")
+    parser.add_argument("--quantization", choices=["float", "dynamic"], default="float",
+                        help="patch model quantization")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store_dir = None
+    if args.save is not None:
+        try:
+            store_dir = save_yamnet(args.save or None, args.handle)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"✓ YAMNet saved to {store_dir}")
+        if args.save and Path(args.save) != DEFAULT_STORE:
+            print(f"  Use it with: export {STORE_ENV}={store_dir}")
+
+    # Verify the store just written, not whichever one resolve() would pick
+    load_yamnet(store_dir)
+    stats = load_stats(store_dir)
+    if stats["source"] != "local":
+        print(f"No local store found; set {STORE_ENV} or run with --save for offline use")
+    if args.export_patch:
+        patch_path = export_patch_model(args.export_patch, store_dir, args.quantization)
+        print(f"✓ Patch model: {patch_path} ({patch_path.stat().st_size / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())